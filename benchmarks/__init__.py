@@ -0,0 +1 @@
+"""Micro-benchmarks. Run each module directly, e.g. `python -m benchmarks.bench_logger`."""
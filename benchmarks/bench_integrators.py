@@ -0,0 +1,85 @@
+"""Integrator cost per particle and energy drift.
+
+Every particle sits in a harmonic well (a = -k (r - centre)), so total
+energy is known and should stay constant. For each integrator and
+timestep this reports the cost of one step per particle, both without
+forces (the drift-only path the engine takes today) and with the well, and
+the relative energy error after `--periods` oscillation periods.
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from simulation.integrators import INTEGRATORS, get_integrator
+from simulation.store import VX, X
+
+
+def make_well(k, centre):
+    def accel(state, out):
+        np.subtract(state[X:VX], centre, out=out)
+        out *= -k
+    return accel
+
+
+def energy(data, k, centre):
+    offset = data[X:VX] - centre
+    return 0.5 * (data[VX:] ** 2).sum() + 0.5 * k * (offset ** 2).sum()
+
+
+def start_state(particles, seed=0):
+    rng = np.random.default_rng(seed)
+    data = np.empty((4, particles))
+    data[X:VX] = rng.uniform(-1, 1, (2, particles)) + 50
+    data[VX:] = rng.uniform(-1, 1, (2, particles))
+    return data
+
+
+def cost_ns(integrator, data, dt, accel, repeat):
+    integrator.step(data, dt, accel)  # warm up the scratch arrays
+    started = time.perf_counter()
+    for _ in range(repeat):
+        integrator.step(data, dt, accel)
+    return (time.perf_counter() - started) / repeat / data.shape[1] * 1e9
+
+
+def drift(name, dt, k, periods, particles):
+    data = start_state(particles)
+    centre = np.full((2, 1), 50.0)
+    accel = make_well(k, centre)
+    integrator = get_integrator(name)
+    start = energy(data, k, centre)
+    for _ in range(round(periods * 2 * math.pi / math.sqrt(k) / dt)):
+        integrator.step(data, dt, accel)
+    return (energy(data, k, centre) - start) / start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--particles", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--k", type=float, default=1.0, help="well stiffness; period is 2*pi/sqrt(k)")
+    parser.add_argument("--dt", type=float, nargs="+", default=[0.01, 0.1, 0.5])
+    parser.add_argument("--periods", type=float, default=10)
+    parser.add_argument("--drift-particles", type=int, default=1000)
+    args = parser.parse_args()
+
+    centre = np.full((2, 1), 50.0)
+    accel = make_well(args.k, centre)
+    print(f"particles={args.particles} k={args.k} periods={args.periods}")
+    header = "".join(f"{'drift dt=' + str(dt):>16}" for dt in args.dt)
+    print(f"{'integrator':>14}{'no forces ns/p':>16}{'well ns/p':>12}{header}")
+    for name in INTEGRATORS:
+        integrator = get_integrator(name)
+        data = start_state(args.particles)
+        free = cost_ns(integrator, data, 0.01, None, args.repeat)
+        well = cost_ns(integrator, start_state(args.particles), 0.01, accel, args.repeat)
+        drifts = "".join(f"{drift(name, dt, args.k, args.periods, args.drift_particles):>16.2e}"
+                         for dt in args.dt)
+        print(f"{name:>14}{free:>16.2f}{well:>12.2f}{drifts}")
+
+
+if __name__ == "__main__":
+    main()
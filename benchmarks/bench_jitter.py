@@ -0,0 +1,82 @@
+"""Tick start jitter with and without web-style load on the event loop.
+
+Runs the engine on the event loop (`asyncio`) and on its own thread
+(`thread`) for `--seconds` each, once idle and once with `--clients` tasks
+that keep encoding a frame of `--frame-particles` particles to JSON the way
+SSE generators do, yielding between frames. Reports how late ticks started
+(p50/p99/max, from `TickStats`) and how many ticks ran against how many
+were due in the time that actually passed.
+
+The engine thread still shares the GIL with the loop, so its lateness is
+bounded by the interpreter switch interval (5ms by default) plus the
+longest C call that doesn't release the GIL (one `json.dumps`), not by
+how long the loop is busy. `--switch-ms` changes the switch interval
+for the run (`sys.setswitchinterval`).
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from communication.bus import EventBus
+from config import SimulationConfig
+from simulation.engine import SimulationEngine
+from simulation.threaded import ThreadedEngine
+
+ENGINES = {"asyncio": SimulationEngine, "thread": ThreadedEngine}
+
+
+async def encode_frames(snapshot, stop):
+    while not stop.is_set():
+        json.dumps(snapshot.to_dict())
+        await asyncio.sleep(0)
+
+
+async def measure(engine_class, args, clients):
+    config = SimulationConfig(tick_interval=args.tick_ms / 1000, particle_count=args.particles, seed=0)
+    engine = engine_class(bus=EventBus(queue_size=10), config=config)
+    frame = SimulationEngine(EventBus(queue_size=10), SimulationConfig(particle_count=args.frame_particles))
+    snapshot = frame._build_snapshot()
+    stop = asyncio.Event()
+    load = [asyncio.create_task(encode_frames(snapshot, stop)) for _ in range(clients)]
+    await engine.start()
+    started = time.perf_counter()
+    await asyncio.sleep(args.seconds)  # overshoots when the loop is busy
+    ticks = engine.tick
+    due = round((time.perf_counter() - started) * 1000 / args.tick_ms)
+    stop.set()
+    await asyncio.gather(*load)
+    await engine.stop()
+    return ticks, due, engine.tick_stats.summary()["start_jitter"]
+
+
+async def run(args):
+    print(f"tick={args.tick_ms}ms particles={args.particles} seconds={args.seconds} "
+          f"frame={args.frame_particles} particles switch={sys.getswitchinterval() * 1000:g}ms")
+    print(f"{'engine':>8}{'clients':>9}{'ticks':>8}{'due':>6}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name in args.engines:
+        for clients in (0, args.clients):
+            ticks, due, jitter = await measure(ENGINES[name], args, clients)
+            print(f"{name:>8}{clients:>9}{ticks:>8}{due:>6}{jitter['p50_ms']:>9.2f}"
+                  f"{jitter['p99_ms']:>9.2f}{jitter['max_ms']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument("--tick-ms", type=float, default=10.0)
+    parser.add_argument("--particles", type=int, default=10_000)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--frame-particles", type=int, default=2000)
+    parser.add_argument("--switch-ms", type=float, default=None)
+    args = parser.parse_args()
+    if args.switch_ms is not None:
+        sys.setswitchinterval(args.switch_ms / 1000)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
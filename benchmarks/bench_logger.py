@@ -0,0 +1,68 @@
+"""AsyncFileLogger throughput with and without rotation in flight.
+
+Feeds snapshot-sized records as fast as the queue accepts them and samples the
+committed-record counter every 50ms, splitting the samples by whether a
+rotated segment was being compressed at the time.
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from internal.logging import AsyncFileLogger
+
+
+def make_record(tick, particles):
+    return {"tick": tick, "sim_time_s": tick * 0.5,
+            "particles": [{"id": f"p{i:02d}", "x": 1.5 * i, "y": 2.5 * i, "vx": 0.1, "vy": -0.1}
+                          for i in range(particles)]}
+
+
+async def run(duration, particles, max_bytes):
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = AsyncFileLogger(str(Path(tmp) / "bench.log"), queue_size=4096,
+                                 max_bytes=max_bytes, backup_count=5)
+        record = make_record(0, particles)
+        await logger.start()
+
+        rates = {True: [], False: []}
+        end = time.perf_counter() + duration
+        last_written, last_time = 0, time.perf_counter()
+        next_sample = last_time + 0.05
+        while time.perf_counter() < end:
+            while logger.try_log("state", record):
+                pass
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            if now >= next_sample:
+                rotating = logger.get_stats()["compress_pending"] > 0
+                rates[rotating].append((logger.written - last_written) / (now - last_time))
+                last_written, last_time, next_sample = logger.written, now, now + 0.05
+        await logger.stop()
+        return logger.get_stats(), rates
+
+
+def summarize(label, samples):
+    if not samples:
+        return f"{label:>22}: no samples"
+    return f"{label:>22}: {sum(samples) / len(samples):>10,.0f} records/s over {len(samples)} samples"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--particles", type=int, default=100)
+    parser.add_argument("--max-bytes", type=int, default=8 * 1024 * 1024)
+    args = parser.parse_args()
+
+    stats, rates = asyncio.run(run(args.duration, args.particles, args.max_bytes))
+    print(f"particles/record={args.particles} max_bytes={args.max_bytes}")
+    print(summarize("idle compressor", rates[False]))
+    print(summarize("rotation in progress", rates[True]))
+    print(f"written={stats['written']} rotations={stats['rotations']} dropped={stats['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Admission control and staged load shedding for stream subscribers."""
+
+import asyncio
+from internal.logging import get_logger
+
+
+class ShedLevel:
+    NORMAL = "normal"
+    REDUCED = "reduced_rate"
+    SHEDDING = "shedding"
+
+
+# Escalation order; also the numeric level exported as a metric
+LEVELS = (ShedLevel.NORMAL, ShedLevel.REDUCED, ShedLevel.SHEDDING)
+
+
+class AdmissionController:
+    """Caps concurrent stream clients globally and per client IP."""
+
+    def __init__(self, max_clients=200, max_per_ip=10, retry_after=5):
+        self.max_clients = max_clients
+        self.max_per_ip = max_per_ip
+        self.retry_after = retry_after
+        self._per_ip = {}
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def try_acquire(self, ip):
+        """Reserve a slot for `ip`. Returns False when a cap is reached."""
+        if self.active >= self.max_clients or self._per_ip.get(ip, 0) >= self.max_per_ip:
+            self.rejected += 1
+            return False
+        self._per_ip[ip] = self._per_ip.get(ip, 0) + 1
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def release(self, ip):
+        count = self._per_ip.get(ip, 0)
+        if count <= 0:
+            return
+        if count == 1:
+            del self._per_ip[ip]
+        else:
+            self._per_ip[ip] = count - 1
+        self.active -= 1
+
+    def get_stats(self):
+        return {
+            "active": self.active,
+            "max_clients": self.max_clients,
+            "max_per_ip": self.max_per_ip,
+            "distinct_ips": len(self._per_ip),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+class LoadShedder:
+    """Degrades streaming in stages when the tick or the event loop falls behind.
+
+    NORMAL -> REDUCED lowers the stream rate (clients get every Nth frame),
+    REDUCED -> SHEDDING refuses new clients and evicts the lowest-priority
+    subscribers on every overloaded sample. Levels step back down one at a
+    time after `recover_after` calm samples. Loop lag is read from
+    `loop_monitor` (a LoopLagMonitor); without one only tick overrun and
+    subscriber backlog count.
+
+    With `worlds` (a WorldRegistry) every world counts: the worst tick
+    overrun of any world and the backlog summed over all of their buses, and
+    shedding evicts from the busiest buses first. Without it only `engine`
+    and `bus` are watched.
+    """
+
+    def __init__(self, bus, engine, overrun_threshold=0.25, lag_threshold=0.1, interval=0.5,
+                 reduced_stride=4, shed_batch=5, recover_after=3, loop_monitor=None, worlds=None,
+                 backlog_threshold=0.5):
+        self.bus = bus
+        self.engine = engine
+        self.worlds = worlds
+        self.loop_monitor = loop_monitor
+        self.backlog_threshold = backlog_threshold  # fraction of subscriber queue capacity filled
+        self.overrun_threshold = overrun_threshold
+        self.lag_threshold = lag_threshold
+        self.interval = interval
+        self.reduced_stride = reduced_stride
+        self.shed_batch = shed_batch
+        self.recover_after = recover_after
+        self.level = ShedLevel.NORMAL
+        self.loop_lag = 0.0
+        self.tick_overrun = 0.0
+        self.backlog = 0.0
+        self.shed_total = 0
+        self._calm = 0
+        self._seen = 0  # monitor samples already accounted for
+        self._task = None
+        self._stop = asyncio.Event()
+        self._log = get_logger()
+
+    @property
+    def stream_stride(self):
+        return 1 if self.level == ShedLevel.NORMAL else self.reduced_stride
+
+    @property
+    def accepting(self):
+        return self.level != ShedLevel.SHEDDING
+
+    async def start(self):
+        if self._task:
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+    async def sample(self, loop_lag):
+        """Feed one loop-lag measurement and adjust the shedding level."""
+        self.loop_lag = loop_lag
+        engines = self._engines()
+        self.tick_overrun = max(engine.tick_overrun / engine.config.tick_interval for engine in engines)
+        queued = capacity = 0
+        for bus in self._buses(engines):
+            bus_queued, bus_capacity = bus.backlog()
+            queued += bus_queued
+            capacity += bus_capacity
+        self.backlog = queued / capacity if capacity else 0.0
+        overloaded = (loop_lag > self.lag_threshold or self.tick_overrun > self.overrun_threshold
+                      or self.backlog > self.backlog_threshold)
+        index = LEVELS.index(self.level)
+
+        if overloaded:
+            self._calm = 0
+            if self.level == ShedLevel.SHEDDING:
+                budget = self.shed_batch
+                for bus in sorted(self._buses(engines), key=lambda bus: -bus.subscriber_count):
+                    if budget <= 0:
+                        break
+                    evicted = await bus.evict(budget)
+                    budget -= len(evicted)
+                    self.shed_total += len(evicted)
+            else:
+                self._set_level(LEVELS[index + 1])
+        elif self.level != ShedLevel.NORMAL:
+            self._calm += 1
+            if self._calm >= self.recover_after:
+                self._calm = 0
+                self._set_level(LEVELS[index - 1])
+
+    def _engines(self):
+        if self.worlds is None:
+            return [self.engine]
+        return self.worlds.engines or [self.engine]
+
+    def _buses(self, engines):
+        buses = [self.bus]
+        buses.extend(engine.bus for engine in engines
+                     if getattr(engine, "bus", None) is not None and engine.bus is not self.bus)
+        return buses
+
+    def _set_level(self, level):
+        self._log.warn("load level %s -> %s", self.level, level, loop_lag=round(self.loop_lag, 4),
+                       tick_overrun=round(self.tick_overrun, 3), backlog=round(self.backlog, 3))
+        self.level = level
+
+    def _loop_lag(self):
+        """Worst lag the monitor measured since the previous sample."""
+        monitor = self.loop_monitor
+        if monitor is None:
+            return 0.0
+        fresh = min(monitor.samples - self._seen, len(monitor.recent))
+        self._seen = monitor.samples
+        if not fresh:
+            return monitor.last_lag
+        return max(list(monitor.recent)[-fresh:])
+
+    async def _run(self):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.interval)
+                break
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.sample(self._loop_lag())
+            except Exception as exc:
+                self._log.error("load sample fail", err=exc)
+
+    def get_stats(self):
+        return {
+            "level": self.level,
+            "stream_stride": self.stream_stride,
+            "loop_lag_s": round(self.loop_lag, 4),
+            "tick_overrun": round(self.tick_overrun, 3),
+            "backlog": round(self.backlog, 3),
+            "shed_total": self.shed_total,
+        }
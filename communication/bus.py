@@ -3,38 +3,48 @@ import time
 from internal.logging import get_logger
 
 class Subscriber:
-    __slots__ = ("name", "queue", "topics", "created_at", "received", "dropped")
+    __slots__ = ("name", "queue", "topics", "priority", "created_at", "received", "dropped", "closed")
 
-    def __init__(self, name, queue, topics=None):
+    def __init__(self, name, queue, topics=None, priority=0):
         self.name = name
         self.queue = queue
         self.topics = topics or set()
+        self.priority = priority
         self.created_at = time.time()
         self.received = 0
         self.dropped = 0
+        self.closed = False
+
+STATE_TOPIC = "state"  # engine snapshots; events go out on the default "" topic
+
 
 class EventBus:
-    """Copy-on-write pub/sub. Publish path is lock-free."""
+    """Copy-on-write pub/sub. Publish path is lock-free.
+
+    A subscriber with `topics` only receives items published on one of them;
+    without topics it receives everything.
+    """
 
     def __init__(self, queue_size=50):
         self._lock = asyncio.Lock()
         self._subscribers = {}
         self._subscribers_snapshot = []
+        self._topics = frozenset()  # topics someone receives; None if anyone takes everything
         self._queue_size = queue_size
         self._log = get_logger()
         self.total_published = 0
         self.total_delivered = 0
         self.total_dropped = 0
 
-    async def subscribe(self, name, max_queue_size=None, topics=None):
+    async def subscribe(self, name, max_queue_size=None, topics=None, priority=0):
         async with self._lock:
             if name in self._subscribers:
                 return self._subscribers[name]
             subscriber = Subscriber(name, asyncio.Queue(maxsize=max_queue_size or self._queue_size),
-                                   set(topics) if topics else set())
+                                   set(topics) if topics else set(), priority)
             self._subscribers[name] = subscriber
-            self._subscribers_snapshot = list(self._subscribers.values())
-            self._log.info(f"sub+ {name}")
+            self._changed()
+            self._log.info("sub+ %s", name)
             return subscriber
 
     async def unsubscribe(self, name):
@@ -42,10 +52,70 @@ class EventBus:
             if name not in self._subscribers:
                 return False
             del self._subscribers[name]
-            self._subscribers_snapshot = list(self._subscribers.values())
-            self._log.info(f"sub- {name}")
+            self._changed()
+            self._log.info("sub- %s", name)
             return True
 
+    async def evict(self, count, max_priority=0):
+        """Drop up to `count` subscribers with priority <= max_priority, newest first.
+
+        Evicted subscribers are marked closed so their consumers can stop waiting.
+        """
+        async with self._lock:
+            candidates = [s for s in self._subscribers.values() if s.priority <= max_priority]
+            candidates.sort(key=lambda s: (s.priority, -s.created_at))
+            evicted = candidates[:count]
+            for subscriber in evicted:
+                subscriber.closed = True
+                del self._subscribers[subscriber.name]
+            if evicted:
+                self._changed()
+                self._log.warn("evicted %d subscribers", len(evicted))
+            return [subscriber.name for subscriber in evicted]
+
+    async def close(self):
+        """Drop every subscriber and mark it closed, e.g. when the bus's world goes away."""
+        async with self._lock:
+            closed = list(self._subscribers.values())
+            for subscriber in closed:
+                subscriber.closed = True
+            self._subscribers.clear()
+            self._changed()
+            if closed:
+                self._log.info("closed %d subscribers", len(closed))
+            return [subscriber.name for subscriber in closed]
+
+    def _changed(self):
+        snapshot = list(self._subscribers.values())
+        topics = set()
+        for subscriber in snapshot:
+            if not subscriber.topics:
+                topics = None
+                break
+            topics |= subscriber.topics
+        self._subscribers_snapshot = snapshot
+        self._topics = topics if topics is None else frozenset(topics)
+
+    def wants(self, topic):
+        """Whether any subscriber would receive an item published on `topic`."""
+        return self._topics is None or topic in self._topics
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers_snapshot)
+
+    @property
+    def has_subscribers(self):
+        return bool(self._subscribers_snapshot)
+
+    def backlog(self):
+        """(items queued, queue capacity) summed over every subscriber."""
+        queued = capacity = 0
+        for subscriber in self._subscribers_snapshot:
+            queued += subscriber.queue.qsize()
+            capacity += subscriber.queue.maxsize
+        return queued, capacity
+
     async def publish(self, item, topic=""):
         delivered = dropped = 0
         for subscriber in self._subscribers_snapshot:
@@ -67,7 +137,7 @@ class EventBus:
 
     def get_stats(self):
         return {
-            "subscriber_count": len(self._subscribers_snapshot),
+            "subscriber_count": self.subscriber_count,
             "total_published": self.total_published,
             "total_delivered": self.total_delivered,
             "total_dropped": self.total_dropped
@@ -76,6 +146,7 @@ class EventBus:
     async def get_subscriber_info(self):
         return [
             {   "name": subscriber.name,
+                "priority": subscriber.priority,
                 "queued": subscriber.queue.qsize(),
                 "received": subscriber.received,
                 "dropped": subscriber.dropped
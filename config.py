@@ -1,43 +1,112 @@
+import asyncio
 import json
 from pathlib import Path
 
+from internal.logging import get_logger
+
 _DEFAULT_CONFIG = Path(__file__).parent / "config.json"
 
 
 class SimulationConfig:
-    __slots__ = ("tick_interval", "world_width", "world_height", "particle_count")
+    __slots__ = ("tick_interval", "world_width", "world_height", "particle_count", "history_mb",
+                 "initializer", "initializer_options", "seed", "integrator", "boundary",
+                 "forces", "threaded")
     
-    def __init__(self, tick_interval=0.5, world_width=100, world_height=60, particle_count=20):
+    def __init__(self, tick_interval=0.5, world_width=100, world_height=60, particle_count=20, history_mb=16,
+                 initializer="uniform", initializer_options=None, seed=None, integrator="euler",
+                 boundary="reflect", forces=None, threaded=False):
         self.tick_interval = tick_interval
         self.world_width = world_width
         self.world_height = world_height
         self.particle_count = particle_count
+        self.history_mb = history_mb  # in-memory frame history budget, 0 = off
+        self.initializer = initializer  # uniform | clusters | lattice | ring | file
+        self.initializer_options = initializer_options or {}
+        self.seed = seed  # RNG seed; None picks one and logs it
+        self.integrator = integrator  # euler | semi_implicit | verlet | rk4
+        self.boundary = boundary  # reflect | periodic | absorb
+        self.forces = forces or []  # force field dicts, see simulation/forces.py
+        self.threaded = threaded  # tick on a dedicated thread instead of the event loop
 
 
 class ServerConfig:
-    __slots__ = ("host", "port")
+    __slots__ = ("host", "port", "max_clients", "max_clients_per_ip", "retry_after",
+                 "overrun_threshold", "lag_threshold", "lag_fail_threshold", "config_reload_interval")
     
-    def __init__(self, host="127.0.0.1", port=8080):
+    def __init__(self, host="127.0.0.1", port=8080, max_clients=200, max_clients_per_ip=10, retry_after=5,
+                 overrun_threshold=0.25, lag_threshold=0.1, lag_fail_threshold=1.0, config_reload_interval=1.0):
         self.host = host
         self.port = port
+        self.max_clients = max_clients
+        self.max_clients_per_ip = max_clients_per_ip
+        self.retry_after = retry_after
+        self.overrun_threshold = overrun_threshold  # fraction of tick_interval
+        self.lag_threshold = lag_threshold  # seconds, also the loop health DEGRADED threshold
+        self.lag_fail_threshold = lag_fail_threshold  # seconds, loop health FAIL threshold
+        self.config_reload_interval = config_reload_interval  # seconds between config file checks, 0 = off
 
 
 class LoggingConfig:
-    __slots__ = ("level", "file", "crash_file")
+    __slots__ = ("level", "file", "crash_file", "max_bytes", "rotate_interval", "backup_count",
+                 "max_total_bytes", "compress", "state_mode", "state_every", "state_delta_threshold",
+                 "state_budget")
     
-    def __init__(self, level="INFO", file="logs/simulator.log", crash_file="logs/crash.log"):
+    def __init__(self, level="INFO", file="logs/simulator.log", crash_file="logs/crash.log",
+                 max_bytes=64 * 1024 * 1024, rotate_interval=0, backup_count=10, max_total_bytes=0,
+                 compress=True, state_mode="full", state_every=1, state_delta_threshold=1.0,
+                 state_budget=0):
         self.level = level
         self.file = file
         self.crash_file = crash_file
+        self.max_bytes = max_bytes  # rotate past this size, 0 = never
+        self.rotate_interval = rotate_interval  # rotate after N seconds, 0 = never
+        self.backup_count = backup_count
+        self.max_total_bytes = max_total_bytes  # cap on retained segments, 0 = no cap
+        self.compress = compress
+        self.state_mode = state_mode  # full | summary | delta | events
+        self.state_every = state_every  # log every Nth tick
+        self.state_delta_threshold = state_delta_threshold
+        self.state_budget = state_budget  # max particles a state record looks at, 0 = no cap
+
+
+class RecordingConfig:
+    __slots__ = ("enabled", "dir", "queue_size")
+
+    def __init__(self, enabled=False, dir="recordings", queue_size=500):
+        self.enabled = enabled
+        self.dir = dir
+        self.queue_size = queue_size
+
+
+class CheckpointConfig:
+    __slots__ = ("dir", "interval", "keep")
+
+    def __init__(self, dir="checkpoints", interval=0, keep=3):
+        self.dir = dir
+        self.interval = interval  # seconds between periodic checkpoints, 0 = off
+        self.keep = keep
+
+
+class WorldsConfig:
+    __slots__ = ("park_after", "limit", "configs")
+
+    def __init__(self, park_after=60.0, limit=16, configs=None):
+        self.park_after = park_after  # seconds a running world may go unwatched before it is parked, 0 = never
+        self.limit = limit  # most worlds hosted at once, the default world included
+        self.configs = configs or {}  # world name -> simulation fields that differ from the simulation section
 
 
 class Config:
-    __slots__ = ("simulation", "server", "logging")
+    __slots__ = ("simulation", "server", "logging", "recording", "checkpoint", "worlds")
     
-    def __init__(self, simulation=None, server=None, logging=None):
+    def __init__(self, simulation=None, server=None, logging=None, recording=None, checkpoint=None,
+                 worlds=None):
         self.simulation = simulation or SimulationConfig()
         self.server = server or ServerConfig()
         self.logging = logging or LoggingConfig()
+        self.recording = recording or RecordingConfig()
+        self.checkpoint = checkpoint or CheckpointConfig()
+        self.worlds = worlds or WorldsConfig()
 
     @classmethod
     def from_dict(cls, d):
@@ -45,6 +114,9 @@ class Config:
             SimulationConfig(**d.get("simulation", {})),
             ServerConfig(**d.get("server", {})),
             LoggingConfig(**d.get("logging", {})),
+            RecordingConfig(**d.get("recording", {})),
+            CheckpointConfig(**d.get("checkpoint", {})),
+            WorldsConfig(**d.get("worlds", {})),
         )
 
 
@@ -56,3 +128,97 @@ def load_config(path=None):
     
     with open(config_path) as file:
         return Config.from_dict(json.load(file))
+
+
+def changed_fields(old, new):
+    """Dotted names ("simulation.tick_interval") of the fields that differ between two Configs."""
+    changed = []
+    for section in Config.__slots__:
+        old_section, new_section = getattr(old, section), getattr(new, section)
+        for name in type(old_section).__slots__:
+            if getattr(old_section, name) != getattr(new_section, name):
+                changed.append(f"{section}.{name}")
+    return changed
+
+
+class ConfigWatcher:
+    """Re-reads the config file when it changes on disk.
+
+    `poll()` compares the file's mtime and size with the last read and only
+    parses it when they differ, so polling every second costs one stat().
+    The background task hands each new Config to `on_change`; `changes`
+    names the fields that differ from the previous one.
+    """
+
+    def __init__(self, path=None, interval=1.0, config=None):
+        self.path = Path(path) if path else _DEFAULT_CONFIG
+        self.interval = interval
+        self.reloads = 0
+        self.skipped = 0
+        self.errors = 0
+        self.config = config if config is not None else load_config(self.path)
+        self.changes = []  # "section.field" names that differed at the last reload
+        self._stamp = self._stat()
+        self._task = None
+        self._stop = asyncio.Event()
+        self._log = get_logger()
+
+    def _stat(self):
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self, force=False):
+        """Return the new Config if the file changed (or `force`), else None.
+
+        Raises ValueError for a file that can't be parsed; the stamp is still
+        advanced so a broken file is reported once, not on every poll.
+        """
+        stamp = self._stat()
+        if stamp == self._stamp and not force:
+            self.skipped += 1
+            return None
+        self._stamp = stamp
+        if stamp is None:
+            return None
+        try:
+            with open(self.path) as file:
+                config = Config.from_dict(json.load(file))
+        except (ValueError, TypeError) as exc:
+            self.errors += 1
+            raise ValueError(f"invalid config {self.path}: {exc}") from exc
+        self.reloads += 1
+        self.changes = changed_fields(self.config, config)
+        self.config = config
+        return config
+
+    async def start(self, on_change):
+        if self._task or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run(on_change))
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+    async def _run(self, on_change):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.interval)
+                break
+            except asyncio.TimeoutError:
+                pass
+            try:
+                config = self.poll()
+                if config is not None:
+                    await on_change(config)
+            except Exception as exc:
+                self._log.warn("config reload failed", error=exc)
+
+    def get_stats(self):
+        return {"path": str(self.path), "reloads": self.reloads, "skipped": self.skipped, "errors": self.errors}
@@ -1,6 +1,12 @@
 import asyncio
+import sys
+import threading
 import time
+import traceback
+from collections import deque
 from enum import Enum
+from communication.admission import ShedLevel
+from internal.metrics import get_registry
 from utils.timestamp import format_timestamp
 
 class Status(Enum):
@@ -12,83 +18,251 @@ class Status(Enum):
 HealthStatus = Status
 
 class CheckResult:
-    __slots__ = ("name", "status", "msg")
+    __slots__ = ("name", "status", "msg", "latency_ms")
     
     def __init__(self, name, status, msg=""): 
         self.name = name
         self.status = status
         self.msg = msg
+        self.latency_ms = None
     
     def to_dict(self): 
         return {"name": self.name,
                 "status": self.status.value,
-                "msg": self.msg}
+                "msg": self.msg,
+                "latency_ms": self.latency_ms}
 
 class HealthReport:
-    __slots__ = ("status", "checks", "uptime", "timestamp")
+    __slots__ = ("status", "checks", "uptime", "timestamp", "checked_at")
     
     def __init__(self, status, checks, uptime=0):
         self.status = status
         self.checks = checks
         self.uptime = uptime
         self.timestamp = format_timestamp()
+        self.checked_at = time.time()
     
     def to_dict(self):
         return {"status": self.status.value,
                 "timestamp": self.timestamp,
+                "age_s": round(time.time() - self.checked_at, 3),
                 "uptime": round(self.uptime, 1),
                 "checks": [check.to_dict() for check in self.checks]}
 
 _checker = None
 
 class HealthChecker:
-    def __init__(self, ttl=1.0):
+    """Runs registered checks concurrently and serves the last report.
+
+    `start()` refreshes the report every `ttl` in the background. `check()`
+    returns the cached report straight away; if it is older than `ttl` a
+    refresh is kicked off for the next caller (stale-while-revalidate). Only
+    the very first call waits for the checks to run. The report is rebuilt as
+    each check finishes, so a hung check keeps its previous result until it
+    times out without holding back the others.
+    """
+
+    def __init__(self, ttl=1.0, timeout=5.0):
         self._checks = {}
         self._cache = None
-        self._cache_time = 0
+        self._results = {}
         self._ttl = ttl
+        self._timeout = timeout
         self._start_time = time.time()
+        self._refreshing = None
+        self._task = None
 
     def register(self, name, check_fn, critical=True):
         self._checks[name] = (check_fn, critical)
 
     async def check(self):
-        now = time.time()
-        if self._cache and now - self._cache_time < self._ttl:
-            return self._cache
+        if self._cache is None:
+            return await asyncio.shield(self._spawn_refresh())
+        if time.time() - self._cache.checked_at >= self._ttl:
+            self._spawn_refresh()
+        return self._cache
 
-        results = []
-        for name, (check_fn, is_critical) in self._checks.items():
-            try:
-                result = await asyncio.wait_for(check_fn(), timeout=5)
-            except asyncio.TimeoutError:
-                result = CheckResult(name, Status.FAIL, "timeout")
-            except Exception as exc:
-                result = CheckResult(name, Status.FAIL, str(exc))
-            results.append((result, is_critical))
+    def _spawn_refresh(self):
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._refresh())
+        return self._refreshing
 
+    async def _run_check(self, name, check_fn):
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(check_fn(), timeout=self._timeout)
+        except asyncio.TimeoutError:
+            result = CheckResult(name, Status.FAIL, "timeout")
+        except Exception as exc:
+            result = CheckResult(name, Status.FAIL, str(exc))
+        result.latency_ms = round((time.perf_counter() - started) * 1000, 3)
+        self._results[name] = result
+        if self._cache is not None:
+            self._publish()
+
+    def _publish(self):
         status = Status.OK
-        for result, is_critical in results:
+        results = []
+        for name, (_, is_critical) in self._checks.items():
+            result = self._results.get(name)
+            if result is None:
+                continue
+            results.append(result)
             if result.status == Status.FAIL and is_critical:
                 status = Status.FAIL
             elif result.status != Status.OK and status == Status.OK:
                 status = Status.DEGRADED
+        self._cache = HealthReport(status, results, time.time() - self._start_time)
 
-        self._cache = HealthReport(status, [result for result, _ in results], now - self._start_time)
-        self._cache_time = now
+    async def _refresh(self):
+        await asyncio.gather(*(self._run_check(name, check_fn) for name, (check_fn, _) in list(self._checks.items())))
+        self._publish()
         return self._cache
 
+    async def start(self):
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._refreshing):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._refreshing = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.shield(self._spawn_refresh())
+            except Exception:
+                pass
+            await asyncio.sleep(self._ttl)
+
 def get_health_checker():
     global _checker
     if not _checker:
         _checker = HealthChecker()
     return _checker
 
+class LoopLagMonitor:
+    """Measures how late the event loop runs a scheduled wake-up.
+
+    A task sleeps `interval` and records how much later than requested it
+    resumed. A watchdog thread notices when that wake-up is overdue by more
+    than `stall_threshold` and grabs the loop thread's stack while it is
+    still blocked, so the longest stalls come with the code that caused them.
+    """
+
+    def __init__(self, interval=0.1, degraded_lag=0.1, fail_lag=1.0, stall_threshold=None,
+                 window=50, keep_stalls=10, stack_depth=20, registry=None):
+        self.interval = interval
+        self.degraded_lag = degraded_lag
+        self.fail_lag = fail_lag
+        self.stall_threshold = degraded_lag if stall_threshold is None else stall_threshold
+        self.keep_stalls = keep_stalls
+        self.stack_depth = stack_depth
+        self.histogram = (registry or get_registry()).histogram(
+            "sim_loop_lag_seconds", "How late event loop wake-ups fire")
+        self.recent = deque(maxlen=window)
+        self.stalls = []  # longest first
+        self.samples = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._beat = 0.0
+        self._stack = None
+        self._loop_thread = None
+        self._task = None
+        self._watchdog = None
+        self._halt = threading.Event()
+
+    @property
+    def recent_max(self):
+        return max(self.recent, default=0.0)
+
+    async def start(self):
+        if self._task:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._halt.clear()
+        self._task = asyncio.create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._halt.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self._beat = now
+            self.record(max(0.0, now - expected))
+
+    def record(self, lag):
+        self.samples += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.recent.append(lag)
+        self.histogram.observe(lag)
+        stack, self._stack = self._stack, None
+        if lag >= self.stall_threshold:
+            self.stalls.append({"lag_s": round(lag, 4), "at": format_timestamp(), "stack": stack or []})
+            self.stalls.sort(key=lambda stall: -stall["lag_s"])
+            del self.stalls[self.keep_stalls:]
+
+    def _watch(self):
+        captured = None
+        while not self._halt.wait(max(0.01, self.stall_threshold / 2)):
+            beat = self._beat
+            if beat == captured or time.perf_counter() - beat < self.interval + self.stall_threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                self._stack = [f"{entry.filename}:{entry.lineno} {entry.name}"
+                               for entry in traceback.extract_stack(frame)[-self.stack_depth:]]
+            captured = beat
+
+    def get_stats(self):
+        return {
+            "samples": self.samples,
+            "last_lag_s": round(self.last_lag, 4),
+            "recent_max_lag_s": round(self.recent_max, 4),
+            "max_lag_s": round(self.max_lag, 4),
+            "stalls": self.stalls,
+        }
+
 # Checks
 async def check_event_loop():
     await asyncio.sleep(0)
     return CheckResult("loop", Status.OK)
 
+def create_loop_check(monitor):
+    async def check():
+        lag = monitor.recent_max
+        msg = f"lag={lag * 1000:.1f}ms"
+        if lag >= monitor.fail_lag:
+            return CheckResult("loop", Status.FAIL, msg)
+        if lag >= monitor.degraded_lag:
+            return CheckResult("loop", Status.DEGRADED, msg)
+        return CheckResult("loop", Status.OK, msg)
+    return check
+
 def create_bus_check(bus):
     async def check():
         stats = bus.get_stats()
@@ -108,22 +282,22 @@ def create_engine_check(engine, threshold=5.0):
     last_state = [None, time.time()]
     
     async def check():
-        snapshot = await engine.get_snapshot()
+        status = engine.status
         now = time.time()
-        state = engine.state
+        tick, state = status.tick, status.state
         
         if state == "stopped":
             return CheckResult("engine", Status.DEGRADED, "stopped")
         
         if state == "paused":
-            last_state[0], last_state[1] = snapshot.tick, now
-            return CheckResult("engine", Status.OK, f"paused@{snapshot.tick}")
+            last_state[0], last_state[1] = tick, now
+            return CheckResult("engine", Status.OK, f"paused@{tick}")
         
-        if last_state[0] is not None and snapshot.tick == last_state[0] and now - last_state[1] > threshold:
-            return CheckResult("engine", Status.FAIL, f"stuck@{snapshot.tick}")
+        if last_state[0] is not None and tick == last_state[0] and now - last_state[1] > threshold:
+            return CheckResult("engine", Status.FAIL, f"stuck@{tick}")
         
-        last_state[0], last_state[1] = snapshot.tick, now
-        return CheckResult("engine", Status.OK, f"t{snapshot.tick}")
+        last_state[0], last_state[1] = tick, now
+        return CheckResult("engine", Status.OK, f"t{tick}")
     return check
 
 def create_logger_check(logger):
@@ -135,3 +309,12 @@ def create_logger_check(logger):
         
         return CheckResult("log", Status.OK)
     return check
+
+def create_shedding_check(shedder):
+    async def check():
+        stats = shedder.get_stats()
+        msg = f"{stats['level']} lag={stats['loop_lag_s']}s overrun={stats['tick_overrun']}"
+        if stats["level"] != ShedLevel.NORMAL:
+            return CheckResult("load", Status.DEGRADED, msg)
+        return CheckResult("load", Status.OK, msg)
+    return check
@@ -1,12 +1,21 @@
 import asyncio
+import atexit
+import glob
+import gzip
 import json
 import os
+import queue
+import shutil
 import sys
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from enum import IntEnum
 from utils.ksuid import generate_ksuid
 from utils.timestamp import format_timestamp, now_micros
 
+
 class LogLevel(IntEnum):
     DEBUG = 10
     INFO = 20
@@ -17,37 +26,103 @@ _logger = None
 _logger_lock = threading.Lock()
 
 class StructuredLogger:
-    def __init__(self, level=LogLevel.INFO):
+    """JSON-lines logger whose callers only enqueue.
+
+    A daemon thread formats queued records and writes them to stderr in
+    batches, so a slow stderr pipe never stalls the caller. Messages use
+    %-style args (`log.info("tick=%s", tick)`) that are only formatted on the
+    writer thread, and records below `level` are dropped before any work is
+    done. When the queue is full, records are dropped and counted.
+    """
+
+    def __init__(self, level=LogLevel.INFO, queue_size=10000, batch_size=256):
         self.level = level
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._thread_lock = threading.Lock()
 
-    def _emit(self, level, message, error=None, **kwargs):
+    def _emit(self, level, message, args, error=None, **kwargs):
         if level < self.level:
             return
         try:
-            record = {"timestamp": format_timestamp(), "level": level.name, "msg": message, **kwargs}
-            if error:
-                record["err"] = str(error)
-            print(json.dumps(record, default=str), file=sys.stderr, flush=True)
+            self._queue.put_nowait((now_micros(), level, message, args, error, kwargs))
+        except queue.Full:
+            self.dropped += 1
+            return
         except Exception:
-            pass
+            return
+        if self._thread is None:
+            self._start_writer()
+
+    def debug(self, message, *args, **kwargs):
+        self._emit(LogLevel.DEBUG, message, args, **kwargs)
 
-    def debug(self, message, **kwargs):
-        self._emit(LogLevel.DEBUG, message, **kwargs)
+    def info(self, message, *args, **kwargs):
+        self._emit(LogLevel.INFO, message, args, **kwargs)
 
-    def info(self, message, **kwargs):
-        self._emit(LogLevel.INFO, message, **kwargs)
+    def warn(self, message, *args, error=None, **kwargs):
+        self._emit(LogLevel.WARN, message, args, error, **kwargs)
 
-    def warn(self, message, error=None, **kwargs):
-        self._emit(LogLevel.WARN, message, error, **kwargs)
+    def error(self, message, *args, error=None, **kwargs):
+        self._emit(LogLevel.ERROR, message, args, error, **kwargs)
 
-    def error(self, message, error=None, **kwargs):
-        self._emit(LogLevel.ERROR, message, error, **kwargs)
+    def flush(self, timeout=1.0):
+        """Wait (up to `timeout` seconds) until queued records are written."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+    def _start_writer(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, name="structured-logger", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            for record in batch:
+                try:
+                    lines.append(self._format(*record))
+                except Exception:
+                    pass
+            try:
+                if lines:
+                    sys.stderr.write("\n".join(lines) + "\n")
+                    sys.stderr.flush()
+            except Exception:
+                pass
+            for _ in batch:
+                self._queue.task_done()
+
+    @staticmethod
+    def _format(epoch_us, level, message, args, error, kwargs):
+        if args:
+            message = message % args
+        record = {"timestamp": format_timestamp(epoch_us), "level": level.name, "msg": message, **kwargs}
+        if error:
+            record["err"] = str(error)
+        return json.dumps(record, default=str)
+
+    def get_stats(self):
+        return {"queued": self._queue.qsize(), "dropped": self.dropped}
 
     @classmethod
     def configure(cls, min_level=LogLevel.INFO):
         global _logger
         with _logger_lock:
-            _logger = cls(min_level)
+            previous, _logger = _logger, cls(min_level)
+        if previous:
+            previous.flush()
 
 def get_logger():
     global _logger
@@ -59,13 +134,48 @@ def get_logger():
 
 
 class AsyncFileLogger:
-    def __init__(self, file_path, queue_size=1000):
+    """Queue-backed file logger with group commit.
+
+    Pending records are drained into one batch, and each batch is encoded and
+    written by a worker thread as a single buffered write. A batch is committed
+    when it reaches `batch_size` records or `flush_interval` seconds after its
+    first record. Deletion of the log file is detected by comparing inodes
+    every `inode_check_interval` seconds instead of stat-ing per record.
+
+    The file is rotated once it exceeds `max_bytes` or is older than
+    `rotate_interval` seconds (0 disables either trigger). Rotated segments are
+    gzipped on a background thread while ingestion continues, and only the
+    newest `backup_count` segments (and at most `max_total_bytes` of them, if
+    set) are retained.
+    """
+
+    def __init__(self, file_path, queue_size=1000, batch_size=256, flush_interval=0.2,
+                 inode_check_interval=1.0, max_bytes=0, rotate_interval=0, backup_count=10,
+                 max_total_bytes=0, compress=True):
         self.path = file_path
         self.queue = asyncio.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.inode_check_interval = inode_check_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.max_total_bytes = max_total_bytes
+        self.compress = compress
         self._task = None
         self._stop = asyncio.Event()
+        self._file = None
+        self._file_missing = False
+        self._next_inode_check = 0.0
+        self._size = 0
+        self._opened_at = 0.0
+        self._compressor = None
+        self._compress_pending = 0
+        self._compress_lock = threading.Lock()  # pending is updated from writer and compressor threads
         self.written = 0
         self.dropped = 0
+        self.batches = 0
+        self.rotations = 0
 
     def try_log(self, kind, data):
         try:
@@ -83,6 +193,9 @@ class AsyncFileLogger:
         dir_path = os.path.dirname(self.path)
         if dir_path:
             os.makedirs(dir_path, exist_ok=True)
+        self._open()
+        self._file_missing = False
+        self._next_inode_check = time.monotonic() + self.inode_check_interval
         self._stop.clear()
         self._task = asyncio.create_task(self._run())
 
@@ -91,47 +204,155 @@ class AsyncFileLogger:
         if self._task:
             await self._task
             self._task = None
+        if self._compressor:
+            await asyncio.to_thread(self._compressor.shutdown, True)
+            self._compressor = None
 
     def get_stats(self):
         return {
             "queued": self.queue.qsize(),
             "written": self.written,
-            "dropped": self.dropped
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "rotations": self.rotations,
+            "compress_pending": self._compress_pending,
         }
 
+    def _open(self):
+        self._file = open(self.path, "ab", buffering=1 << 16)
+        self._size = self._file.tell()
+        self._opened_at = time.monotonic()
+
     async def _run(self):
-        file = open(self.path, "a")
-        self._file_missing_logged = False
+        loop = asyncio.get_running_loop()
+        batch = []
+        deadline = 0.0
         try:
             while not self._stop.is_set():
+                timeout = max(0.0, deadline - loop.time()) if batch else self.flush_interval
                 try:
-                    # Check if log file was deleted
-                    if not os.path.exists(self.path):
-                        if not self._file_missing_logged:
-                            get_logger().warn("Log file deleted, logging disabled", path=self.path)
-                            self._file_missing_logged = True
-                        # Drain queue to prevent memory buildup
-                        try:
-                            await asyncio.wait_for(self.queue.get(), timeout=0.5)
-                            self.dropped += 1
-                        except asyncio.TimeoutError:
-                            pass
-                        continue
-                    
-                    record = await asyncio.wait_for(self.queue.get(), timeout=0.5)
-                    file.write(json.dumps(record, default=str) + "\n")
-                    file.flush()
-                    self.written += 1
+                    record = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+                    if not batch:
+                        deadline = loop.time() + self.flush_interval
+                    batch.append(record)
+                    self._drain_into(batch, self.batch_size)
                 except asyncio.TimeoutError:
                     pass
                 except Exception:
                     pass
-            while not self.queue.empty():
+
+                if batch and (len(batch) >= self.batch_size or loop.time() >= deadline):
+                    await self._commit(batch)
+                    batch = []
+
+            self._drain_into(batch, None)
+            if batch:
+                await self._commit(batch)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def _drain_into(self, batch, limit):
+        """Move already-queued records into `batch` without awaiting."""
+        while limit is None or len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+
+    async def _commit(self, batch):
+        try:
+            written = await asyncio.to_thread(self._write_batch, batch)
+        except Exception:
+            written = 0
+        self.written += written
+        self.dropped += len(batch) - written
+        self.batches += 1
+
+    def _write_batch(self, batch):
+        """Encode and write one batch. Runs on a worker thread."""
+        now = time.monotonic()
+        if now >= self._next_inode_check:
+            self._next_inode_check = now + self.inode_check_interval
+            missing = not self._same_file()
+            if missing and not self._file_missing:
+                get_logger().warn("Log file deleted, logging disabled", path=self.path)
+            self._file_missing = missing
+        if self._file_missing:
+            return 0
+
+        lines = []
+        for record in batch:
+            try:
+                lines.append(json.dumps(record, default=str))
+            except Exception:
+                pass
+        if lines:
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            if self._should_rotate(now):
                 try:
-                    file.write(json.dumps(self.queue.get_nowait(), default=str) + "\n")
-                    self.written += 1
-                except Exception:
-                    break
-            file.flush()
+                    self._rotate()
+                except OSError as exc:
+                    # The batch is already on disk; rotation is retried after the next one
+                    get_logger().warn("Log rotation failed", error=exc, path=self.path)
+        return len(lines)
+
+    def _should_rotate(self, now):
+        if self.max_bytes and self._size >= self.max_bytes:
+            return True
+        return bool(self.rotate_interval) and now - self._opened_at >= self.rotate_interval
+
+    def _rotate(self):
+        """Swap in a fresh file and hand the old segment to the compressor."""
+        suffix = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        segment = f"{self.path}.{suffix}"
+        self._file.close()
+        try:
+            os.replace(self.path, segment)
         finally:
-            file.close()
+            self._open()
+        self.rotations += 1
+
+        if self._compressor is None:
+            self._compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-compress")
+        with self._compress_lock:
+            self._compress_pending += 1
+        self._compressor.submit(self._finish_segment, segment)
+
+    def _finish_segment(self, segment):
+        """Compress a rotated segment and prune old ones. Runs on the compressor thread."""
+        try:
+            if self.compress:
+                with open(segment, "rb") as src, gzip.open(segment + ".gz", "wb", compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+                os.remove(segment)
+            self._prune()
+        except FileNotFoundError:
+            pass  # already pruned by a newer rotation
+        except Exception as exc:
+            get_logger().warn("Log segment compression failed", error=exc, path=segment)
+        finally:
+            with self._compress_lock:
+                self._compress_pending -= 1
+
+    def _prune(self):
+        # Segment suffixes are UTC timestamps, so name order is age order
+        segments = sorted(glob.glob(glob.escape(self.path) + ".*"), reverse=True)
+        total = 0
+        for index, segment in enumerate(segments):
+            total += os.path.getsize(segment)
+            over_count = self.backup_count and index >= self.backup_count
+            over_size = self.max_total_bytes and total > self.max_total_bytes
+            if over_count or over_size:
+                os.remove(segment)
+
+    def _same_file(self):
+        try:
+            path_stat = os.stat(self.path)
+        except OSError:
+            return False
+        file_stat = os.fstat(self._file.fileno())
+        return (path_stat.st_ino, path_stat.st_dev) == (file_stat.st_ino, file_stat.st_dev)
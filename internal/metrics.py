@@ -0,0 +1,177 @@
+"""Process metrics registry with Prometheus text exposition.
+
+Instruments are plain attribute updates, so the hot paths (tick loop, bus
+publish, SSE generators) update them without locks or awaits. Instruments
+built with `fn` are read only at scrape time from counters the component
+already keeps.
+"""
+
+from bisect import bisect_left
+
+from internal.logging import get_logger
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    __slots__ = ("name", "help", "value", "fn")
+    kind = "counter"
+
+    def __init__(self, name, help, fn=None):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.fn = fn
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, "", self.fn() if self.fn else self.value
+
+
+class Gauge:
+    __slots__ = ("name", "help", "value", "fn")
+    kind = "gauge"
+
+    def __init__(self, name, help, fn=None):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.fn = fn
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def samples(self):
+        yield self.name, "", self.fn() if self.fn else self.value
+
+
+class Histogram:
+    __slots__ = ("name", "help", "buckets", "counts", "sum", "count")
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # per bucket, last is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            yield self.name + "_bucket", f'{{le="{_format_value(float(bound))}"}}', cumulative
+        yield self.name + "_sum", "", self.sum
+        yield self.name + "_count", "", self.count
+
+
+class MetricsRegistry:
+    """Get-or-create registry of named instruments."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _get(self, cls, name, *args, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"metric {name} already registered as {metric.kind}")
+        return metric
+
+    def counter(self, name, help="", fn=None):
+        metric = self._get(Counter, name, help, fn)
+        if fn is not None:
+            metric.fn = fn  # latest owner wins, e.g. a recreated bus
+        return metric
+
+    def gauge(self, name, help="", fn=None):
+        metric = self._get(Gauge, name, help, fn)
+        if fn is not None:
+            metric.fn = fn
+        return metric
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                continue  # a broken callback must not fail the whole scrape
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+_registry = None
+
+
+def get_registry():
+    global _registry
+    if not _registry:
+        _registry = MetricsRegistry()
+    return _registry
+
+
+# Scrape-time views over counters components already keep
+def register_engine_metrics(registry, engine):
+    status = engine.status
+    registry.gauge("sim_engine_tick", "Current simulation tick", fn=lambda: status.tick)
+    registry.gauge("sim_engine_time_seconds", "Simulated time", fn=lambda: status.sim_time)
+    registry.gauge("sim_engine_particles", "Live particles", fn=lambda: status.particle_count)
+    registry.gauge("sim_engine_running", "1 while the engine is advancing",
+                   fn=lambda: int(status.state == "running"))
+    registry.gauge("sim_engine_last_tick_seconds", "Work time of the last loop iteration",
+                   fn=lambda: status.last_tick_duration)
+    registry.gauge("sim_engine_tick_overrun_seconds", "How late the last tick started",
+                   fn=lambda: engine.tick_overrun)
+    registry.gauge("sim_engine_tick_budget_utilisation", "Busy share of the last tick interval",
+                   fn=lambda: engine.tick_stats.last_utilisation)
+
+
+def register_bus_metrics(registry, bus):
+    registry.gauge("sim_bus_subscribers", "Current bus subscribers", fn=lambda: bus.subscriber_count)
+    registry.counter("sim_bus_published_total", "Items published on the bus", fn=lambda: bus.total_published)
+    registry.counter("sim_bus_delivered_total", "Items delivered to subscriber queues", fn=lambda: bus.total_delivered)
+    registry.counter("sim_bus_dropped_total", "Items dropped on full subscriber queues", fn=lambda: bus.total_dropped)
+
+
+def register_logger_metrics(registry, logger):
+    registry.gauge("sim_log_queue_depth", "Records waiting for the file writer", fn=lambda: logger.queue.qsize())
+    registry.counter("sim_log_written_total", "Records written to the log file", fn=lambda: logger.written)
+    registry.counter("sim_log_dropped_total", "Records dropped on a full log queue", fn=lambda: logger.dropped)
+    registry.counter("sim_log_rotations_total", "Log file rotations", fn=lambda: logger.rotations)
+    registry.counter("sim_stderr_log_dropped_total", "Structured log lines dropped on a full queue",
+                     fn=lambda: get_logger().dropped)
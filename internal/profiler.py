@@ -0,0 +1,87 @@
+"""In-process sampling profiler producing collapsed stacks."""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+MIN_INTERVAL = 0.001
+MAX_DURATION = 60.0
+
+
+def _frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_qualname}"
+
+
+class SamplingProfiler:
+    """Samples thread stacks with `sys._current_frames()` from the calling thread.
+
+    Run `profile()` on a side thread (e.g. `asyncio.to_thread`). Each sample
+    holds the GIL while stacks are walked, so the sampler stretches its own
+    interval to keep that cost under `max_overhead` of wall time.
+    """
+
+    def __init__(self, max_depth=64, max_overhead=0.02):
+        self.max_depth = max_depth
+        self.max_overhead = max_overhead
+        self.last_samples = 0
+        self.last_matched = 0
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self):
+        return self._lock.locked()
+
+    def profile(self, duration, interval=0.005, thread_id=None, within=None):
+        """Sample for `duration` seconds and return a Counter of collapsed stacks.
+
+        `thread_id` restricts sampling to one thread. `within` is a set of code
+        objects; a sample only counts if one of them is on the stack, which is
+        how the engine-tick-only mode is built. Raises RuntimeError when a
+        profile is already running.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("profile already running")
+        try:
+            return self._sample(min(duration, MAX_DURATION), max(interval, MIN_INTERVAL), thread_id, within)
+        finally:
+            self._lock.release()
+
+    def _sample(self, duration, interval, thread_id, within):
+        stacks = Counter()
+        me = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        samples = matched_total = 0
+        deadline = time.perf_counter() + duration
+        while True:
+            started = time.perf_counter()
+            if started >= deadline:
+                break
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == me or (thread_id is not None and ident != thread_id):
+                    continue
+                labels, matched = [], within is None
+                while frame is not None and len(labels) < self.max_depth:
+                    code = frame.f_code
+                    if not matched and code in within:
+                        matched = True
+                    labels.append(_frame_label(code))
+                    frame = frame.f_back
+                if not matched:
+                    continue
+                labels.append(names.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(labels))] += 1
+                matched_total += 1
+            del frames
+            samples += 1
+            cost = time.perf_counter() - started
+            time.sleep(max(interval, cost / self.max_overhead))
+        self.last_samples, self.last_matched = samples, matched_total
+        return stacks
+
+
+def collapse(stacks):
+    """Render a stacks Counter in the collapsed format flamegraph tools read."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,116 @@
+"""Sampling policies for logging state snapshots."""
+
+import math
+
+
+class StateLogMode:
+    FULL = "full"
+    SUMMARY = "summary"
+    DELTA = "delta"
+    EVENTS = "events"
+
+
+class StateLogPolicy:
+    """Decides what, if anything, the logger records for each snapshot.
+
+    - full: the complete snapshot
+    - summary: counts, bounds and mean/max speed instead of the particle list
+    - delta: only particles that moved more than `delta_threshold` since they were last logged
+    - events: no state records at all, only bus events
+
+    Only every `every`-th tick is considered. With a `budget` (0 = unbounded)
+    each mode touches at most that many particles per tick, so both the
+    record size and the work stay flat however large the world is: full
+    records carry the first `budget` particles, summaries aggregate an even
+    stride of `budget` particles (the count stays exact), and delta mode
+    checks a `budget`-sized window that rotates through the snapshot, so
+    every particle is checked once per `count / budget` logged ticks.
+    Forgetting despawned ids is one pass over the baseline, done only once
+    they outnumber the live particles.
+    """
+
+    _KINDS = {StateLogMode.FULL: "state", StateLogMode.SUMMARY: "state_summary",
+              StateLogMode.DELTA: "state_delta"}
+
+    def __init__(self, mode=StateLogMode.FULL, every=1, delta_threshold=1.0, budget=0):
+        if mode not in self._KINDS and mode != StateLogMode.EVENTS:
+            raise ValueError(f"unknown state log mode: {mode}")
+        self.mode = mode
+        self.every = max(1, int(every))
+        self.delta_threshold = delta_threshold
+        self.budget = budget
+        self.kind = self._KINDS.get(mode)
+        self.skipped = 0
+        self._baseline = {}
+        self._offset = 0  # where the next delta scan starts
+        self._last_tick = -1
+
+    def select(self, snapshot):
+        """Return the record to log for `snapshot`, or None to skip it."""
+        if self.mode == StateLogMode.EVENTS or snapshot.tick % self.every:
+            self.skipped += 1
+            return None
+        if self.mode == StateLogMode.SUMMARY:
+            return self._summary(snapshot)
+        if self.mode == StateLogMode.DELTA:
+            return self._delta(snapshot)
+        particles = snapshot.particles
+        truncated = len(particles) - self.budget if self.budget else 0
+        if truncated > 0:
+            particles = particles[:self.budget]
+        record = {"id": snapshot.id, "timestamp": snapshot.timestamp, "tick": snapshot.tick,
+                  "sim_time_s": snapshot.time,
+                  "particles": [{"id": p.id, "x": p.x, "y": p.y, "vx": p.vx, "vy": p.vy} for p in particles]}
+        if truncated > 0:
+            record["truncated"] = truncated
+        return record
+
+    def _summary(self, snapshot):
+        particles = snapshot.particles
+        record = {"id": snapshot.id, "timestamp": snapshot.timestamp, "tick": snapshot.tick,
+                  "sim_time_s": snapshot.time, "count": len(particles)}
+        if not particles:
+            return record
+        if self.budget and len(particles) > self.budget:
+            particles = particles[::-(-len(particles) // self.budget)]
+            record["sampled"] = len(particles)
+        xs = [p.x for p in particles]
+        ys = [p.y for p in particles]
+        speeds = [math.hypot(p.vx, p.vy) for p in particles]
+        record.update({
+            "x": [min(xs), max(xs), sum(xs) / len(xs)],
+            "y": [min(ys), max(ys), sum(ys) / len(ys)],
+            "speed_mean": sum(speeds) / len(speeds),
+            "speed_max": max(speeds),
+        })
+        return record
+
+    def _delta(self, snapshot):
+        if snapshot.tick < self._last_tick:
+            self._baseline.clear()  # engine was reset
+        self._last_tick = snapshot.tick
+        threshold_sq = self.delta_threshold * self.delta_threshold
+        baseline = self._baseline
+        particles = snapshot.particles
+        count = len(particles)
+        if len(baseline) > 2 * count:
+            # Despawned particles leave stale entries; drop them once they outnumber the live ones
+            live = {p.id for p in particles}
+            for pid in [pid for pid in baseline if pid not in live]:
+                del baseline[pid]
+        start = self._offset % count if count else 0
+        window = min(self.budget, count) if self.budget else count
+        self._offset = start + window
+        changed = []
+        for step in range(window):
+            p = particles[(start + step) % count]
+            last = baseline.get(p.id)
+            if last is not None and (p.x - last[0]) ** 2 + (p.y - last[1]) ** 2 < threshold_sq:
+                continue
+            changed.append({"id": p.id, "x": p.x, "y": p.y, "vx": p.vx, "vy": p.vy})
+            baseline[p.id] = (p.x, p.y)
+        return {"id": snapshot.id, "timestamp": snapshot.timestamp, "tick": snapshot.tick,
+                "sim_time_s": snapshot.time, "particles": changed}
+
+    def get_stats(self):
+        return {"mode": self.mode, "every": self.every, "skipped": self.skipped}
@@ -0,0 +1,44 @@
+"""Vectorised world boundaries, applied to the (4, n) block after each step.
+
+Each boundary takes the block and the world size and returns the slots
+to remove, or None when it never removes any.
+"""
+
+import numpy as np
+
+from simulation.store import VX, VY, X, Y
+
+
+def reflect(data, width, height):
+    """Clamp onto the wall and reverse the velocity across it."""
+    for pos, vel, bound in ((data[X], data[VX], width), (data[Y], data[VY], height)):
+        low, high = pos < 0, pos > bound
+        pos[low] = 0
+        pos[high] = bound
+        vel[low | high] *= -1
+    return None
+
+
+def periodic(data, width, height):
+    """Wrap around: leaving one edge re-enters at the opposite one."""
+    np.mod(data[X], width, out=data[X])
+    np.mod(data[Y], height, out=data[Y])
+    return None
+
+
+def absorb(data, width, height):
+    """Particles that leave the world are removed."""
+    x, y = data[X], data[Y]
+    outside = (x < 0) | (x > width) | (y < 0) | (y > height)
+    return np.flatnonzero(outside)
+
+
+BOUNDARIES = {"reflect": reflect, "periodic": periodic, "absorb": absorb}
+
+
+def get_boundary(name):
+    """Boundary function by name. Raises ValueError for an unknown name."""
+    try:
+        return BOUNDARIES[name]
+    except KeyError:
+        raise ValueError(f"unknown boundary: {name}") from None
@@ -0,0 +1,156 @@
+"""Control commands applied by the engine at tick boundaries."""
+
+import asyncio
+import threading
+
+from simulation.store import parse_id
+
+
+class CommandKind:
+    RESET = "reset"
+    PAUSE = "pause"
+    RESUME = "resume"
+    SPAWN = "spawn"
+    DESPAWN = "despawn"
+    PARAMS = "params"
+    FORCE = "force"
+
+
+# SimulationConfig fields that can change while the engine runs
+PARAMS = ("tick_interval", "world_width", "world_height", "particle_count")
+
+
+class Command:
+    __slots__ = ("kind", "args", "future")
+
+    def __init__(self, kind, args, future):
+        self.kind = kind
+        self.args = args
+        self.future = future
+
+
+class CommandPlan:
+    """What a batch of commands amounts to once coalesced.
+
+    Params merge (last value wins), resets collapse into one, spawns and
+    despawns issued before the last reset are dropped since the reset would
+    wipe them (they resolve with no ids and `dropped`), and only the final
+    pause/resume matters. The engine applies the plan in the order params,
+    reset (or the resize a new `particle_count` asks for), force field
+    changes, spawns/despawns (in submission order), pause/resume state.
+    """
+
+    __slots__ = ("commands", "params", "forces", "reset", "population", "dropped", "state")
+
+    def __init__(self, commands):
+        self.commands = commands
+        self.params = {}
+        self.forces = []  # force commands, in submission order
+        self.reset = False
+        self.population = []  # spawn and despawn commands applied after the reset
+        self.dropped = []  # spawn and despawn commands a later reset made pointless
+        self.state = None
+        for command in commands:
+            if command.kind == CommandKind.PARAMS:
+                self.params.update(command.args)
+            elif command.kind == CommandKind.RESET:
+                self.reset = True
+                self.dropped.extend(self.population)
+                self.population = []
+            elif command.kind in (CommandKind.SPAWN, CommandKind.DESPAWN):
+                self.population.append(command)
+            elif command.kind == CommandKind.FORCE:
+                self.forces.append(command)
+            else:
+                self.state = command.kind
+
+
+def validate(kind, args):
+    """Raise ValueError for a command the engine could not apply."""
+    if kind in (CommandKind.SPAWN, CommandKind.DESPAWN):
+        listed = "particles" if kind == CommandKind.SPAWN else "ids"
+        if set(args) - {"count", listed} or len(args) != 1:
+            raise ValueError(f"{kind} takes either count or {listed}")
+        if "count" in args:
+            count = args["count"]
+            if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+                raise ValueError(f"{kind} count must be a positive integer")
+        elif not isinstance(args[listed], (list, tuple)):
+            raise ValueError(f"{listed} must be a list")
+        elif listed == "particles" and any(
+                not isinstance(row, (list, tuple)) or len(row) != 4 for row in args[listed]):
+            raise ValueError("particles must be [x, y, vx, vy] rows")
+        elif listed == "ids":
+            for pid in args["ids"]:
+                parse_id(pid)
+    elif kind == CommandKind.PARAMS:
+        unknown = set(args) - set(PARAMS)
+        if unknown:
+            raise ValueError(f"unknown params: {', '.join(sorted(unknown))}")
+        for name, value in args.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+                raise ValueError(f"{name} must be a positive number")
+        if "particle_count" in args and not isinstance(args["particle_count"], int):
+            raise ValueError("particle_count must be an integer")
+    elif kind == CommandKind.FORCE:
+        if set(args) - {"name", "enabled", "params"} or not isinstance(args.get("name"), str):
+            raise ValueError("force takes a name, and enabled and/or params")
+        if not isinstance(args.get("enabled", False), bool):
+            raise ValueError("enabled must be true or false")
+        if not isinstance(args.get("params", {}), dict):
+            raise ValueError("params must be an object")
+    elif kind not in (CommandKind.RESET, CommandKind.PAUSE, CommandKind.RESUME):
+        raise ValueError(f"unknown command: {kind}")
+
+
+def settle(future, result=None, error=None):
+    """Resolve a command's future unless the caller already gave up waiting."""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class CommandQueue:
+    """Commands waiting for the next tick boundary, each with a future.
+
+    Submitting and draining may happen on different threads.
+    """
+
+    def __init__(self):
+        self._pending = []
+        self._mutex = threading.Lock()
+        self.submitted = 0
+        self.batches = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, kind, args=None):
+        args = args or {}
+        validate(kind, args)
+        future = asyncio.get_running_loop().create_future()
+        with self._mutex:
+            self._pending.append(Command(kind, args, future))
+            self.submitted += 1
+        return future
+
+    def drain(self):
+        """Take everything queued so far as one plan, or None if nothing is queued."""
+        with self._mutex:
+            if not self._pending:
+                return None
+            commands, self._pending = self._pending, []
+            self.batches += 1
+        return CommandPlan(commands)
+
+    def hold(self, plan):
+        """Put a drained plan back in front of anything queued since, to be drained again later."""
+        with self._mutex:
+            self._pending[:0] = plan.commands
+            self.batches -= 1
+
+    def get_stats(self):
+        return {"pending": len(self._pending), "submitted": self.submitted, "batches": self.batches}
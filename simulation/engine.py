@@ -1,10 +1,21 @@
 import asyncio
-import random
+import threading
 import time
+from contextlib import nullcontext
+import numpy as np
+from communication.bus import STATE_TOPIC
 from config import load_config
 from internal.logging import get_logger
-from simulation.entities import Particle
-from simulation.state import StateSnapshot
+from internal.metrics import get_registry
+from simulation.boundaries import get_boundary
+from simulation.commands import PARAMS, CommandKind, CommandQueue, settle, validate
+from simulation.forces import ForceFields
+from simulation.history import FrameRing
+from simulation.initializers import populate
+from simulation.instrumentation import TickStats
+from simulation.integrators import get_integrator
+from simulation.state import EngineCheckpoint, EngineStatus, ParticleState, StateSnapshot
+from simulation.store import FREE, X, Y, ParticleStore, format_id, parse_id
 from simulation.world import World
 
 class EngineState:
@@ -13,6 +24,11 @@ class EngineState:
     PAUSED = "paused"
 
 class SimulationEngine:
+    mode = "asyncio"  # ticks run as a task on the event loop
+    coalesced = 0  # frames replaced before they were published; see ThreadedEngine
+    compact_budget = 4096  # particles moved per tick while the store has holes
+    offload_reset = 100_000  # a running engine builds larger reset populations on a worker thread
+
     def __init__(self, bus, config=None):
         self.bus = bus
         self.config = config or load_config().simulation
@@ -22,10 +38,29 @@ class SimulationEngine:
         self.tick = 0
         self.sim_time = 0.0
         self._state = EngineState.STOPPED
-        self.particles = []
+        self.status = EngineStatus(self._state)
+        self.store = ParticleStore(self.config.particle_count)
+        self.integrator = get_integrator(self.config.integrator)
+        self.boundary = get_boundary(self.config.boundary)
+        self.forces = ForceFields.from_config(self.config.forces)
+        self.absorbed = 0
+        self.seed = self.config.seed if self.config.seed is not None else np.random.SeedSequence().entropy
+        self._rng = np.random.default_rng(self.seed)
+        self._prepared = None  # (population key, future of a store being built off the loop)
+        self._id_strings = (None, None, [])  # (store, store layout, formatted live ids)
         self._task = None
         self._stop = asyncio.Event()
         self._last_publish_tick = -1
+        self._snapshot = None  # built on demand, at most once per tick
+        self._wake = asyncio.Event()  # parks the loop while paused
+        self.commands = CommandQueue()
+        self.scheduler = None  # TickScheduler shared with the other worlds of a WorldRegistry
+        self.tick_overrun = 0.0  # how late the last tick started, in seconds
+        self.history = FrameRing(int(self.config.history_mb * 1024 * 1024))
+        self.tick_stats = TickStats(self.config.tick_interval)
+        metrics = get_registry()
+        self._ticks_metric = metrics.counter("sim_engine_ticks_total", "Ticks advanced")
+        self._tick_seconds = metrics.histogram("sim_engine_tick_seconds", "Busy time per tick, excluding sleep")
         self.reset()
 
     @property
@@ -36,51 +71,363 @@ class SimulationEngine:
     def state(self):
         return self._state
 
+    @property
+    def particles(self):
+        """Copies of the live particles. Allocates per call; not for hot paths."""
+        x, y, vx, vy = self.store.columns().tolist()
+        return [ParticleState(*values) for values in zip(self._live_id_strings(), x, y, vx, vy)]
+
+    def _live_id_strings(self):
+        store, layout, ids = self._id_strings
+        if store is not self.store or layout != self.store.layout:
+            ids = self.store.live_names()
+            self._id_strings = (self.store, self.store.layout, ids)
+        return ids
+
     def reset(self):
+        """Restart from tick 0 with a fresh population from `config.initializer`.
+
+        Swaps in the store built off the loop for these settings if there is
+        one ready, otherwise builds it here.
+        """
+        key = self._population_key()
+        prepared, self._prepared = self._prepared, None
+        if prepared is not None and prepared[0] == key and prepared[1].done():
+            store = prepared[1].result()  # re-raises a failed build
+        else:
+            store = self._new_store(self._rng, *key)
         self.tick = 0
         self.sim_time = 0.0
         self._last_publish_tick = -1
-        width, height = self.world.width, self.world.height
-        self.particles = [Particle(f"p{i:02d}", random.uniform(0, width), random.uniform(0, height),
-                                   random.uniform(-10, 10), random.uniform(-10, 10))
-                          for i in range(self.config.particle_count)]
+        self._snapshot = None
+        self._wake.set()  # a paused loop publishes the reset frame
+        self.history.clear()
+        self.store = store
+        self._sync_status()
+
+    def capture(self):
+        """Copy the engine state into an EngineCheckpoint. Call at a tick boundary."""
+        store = self.store
+        live = store.live()
+        ids, data = store.ids[live], store.data[:, live]
+        if isinstance(live, slice):  # views into the store; fancy indexing already copied
+            ids, data = ids.copy(), data.copy()
+        return EngineCheckpoint(self.tick, self.sim_time, store.next_id, ids, data,
+                                self._rng.bit_generator.state,
+                                {name: getattr(self.config, name) for name in PARAMS},
+                                self.forces.to_list(), self.absorbed)
+
+    async def checkpoint(self):
+        """Capture the state between two ticks."""
+        return await self.between_ticks(self.capture)
+
+    def load(self, checkpoint):
+        """Replace the engine state with `checkpoint`, adopting its arrays. Call at a tick boundary."""
+        self._apply_params(checkpoint.params)
+        self._rng.bit_generator.state = checkpoint.rng_state
+        if checkpoint.forces is not None:
+            self.forces = ForceFields.from_config(checkpoint.forces)
+        self.absorbed = checkpoint.absorbed
+        self._prepared = None
+        self.store = ParticleStore.from_arrays(checkpoint.ids, checkpoint.data, checkpoint.next_id)
+        self.tick = checkpoint.tick
+        self.sim_time = checkpoint.sim_time
+        self._last_publish_tick = -1
+        self._snapshot = None
+        self._wake.set()  # a paused loop publishes the restored frame
+        self.history.clear()
+        self._sync_status()
+
+    async def restore(self, checkpoint):
+        """Load `checkpoint` between two ticks."""
+        await self.between_ticks(self.load, checkpoint)
+
+    def _population_key(self, params=None):
+        """What a reset population depends on, with pending `params` applied."""
+        params = params or {}
+        return tuple(params.get(name, getattr(self.config, name)) for name in
+                     ("particle_count", "world_width", "world_height", "initializer", "initializer_options"))
+
+    @staticmethod
+    def _new_store(rng, count, width, height, initializer, options):
+        store = ParticleStore(max(64, count))
+        populate(store, count, rng, width, height, initializer, options)
+        return store
+
+    def _reset_ready(self, params):
+        """Whether a reset with `params` can be applied now.
+
+        A running engine builds large populations on a worker thread and
+        holds the reset until the build is done; if the settings changed
+        meanwhile the build is discarded and started again.
+        """
+        key = self._population_key(params)
+        if self._task is None or key[0] <= self.offload_reset:
+            return True
+        prepared = self._prepared
+        if prepared is not None and prepared[0] == key:
+            return prepared[1].done()
+        rng = self._rng.spawn(1)[0]  # Generators aren't thread-safe; the loop keeps its own
+        future = asyncio.get_running_loop().run_in_executor(None, self._new_store, rng, *key)
+        future.add_done_callback(self._prepared_done)
+        self._prepared = (key, future)
+        return False
+
+    def _prepared_done(self, future):
+        if not future.cancelled():
+            future.exception()  # a failure is raised by reset(), or dropped with a stale build
+        self._wake.set()
+
+    def _population_changed(self):
+        self._snapshot = None
+        self._last_publish_tick = -1  # a paused engine still publishes the change
+        self._sync_status()
+
+    def _spawn(self, count=None, particles=None):
+        if particles is not None:
+            ids = self.store.add(*np.asarray(particles, dtype=np.float64).reshape(-1, 4).T)
+        else:
+            config = self.config
+            ids = populate(self.store, count, self._rng, self.world.width, self.world.height,
+                           config.initializer, config.initializer_options).tolist()
+        self._population_changed()
+        return [format_id(pid) for pid in ids]
+
+    def _despawn(self, ids=None, count=None):
+        if ids is None:
+            live = self.store.live_ids()
+            ids = self._rng.choice(live, min(count, len(live)), replace=False)
+        else:
+            ids = [parse_id(pid) for pid in ids]
+        removed = self.store.remove(ids)
+        self._population_changed()
+        return [format_id(pid) for pid in removed]
+
+    def _apply_params(self, params):
+        for name, value in params.items():
+            setattr(self.config, name, value)
+        if "world_width" in params or "world_height" in params:
+            self.world = World(self.config.world_width, self.config.world_height)
+            # Pull particles left outside a shrunken world back onto its edge
+            data = self.store.data[:, :self.store.high]
+            np.clip(data[X], 0, self.world.width, out=data[X])
+            np.clip(data[Y], 0, self.world.height, out=data[Y])
+            self._snapshot = None
+        self.tick_stats.tick_interval = self.config.tick_interval
+        self._log.info("engine params %s", params)
+
+    def _resize_population(self, count):
+        """Spawn or despawn towards `count` particles, keeping the oldest ones."""
+        excess = self.store.count - count
+        if excess > 0:
+            live = self.store.live_ids()
+            self.store.remove(np.partition(live, len(live) - excess)[-excess:])
+            self._population_changed()
+        elif excess < 0:
+            self._spawn(-excess)
+
+    def _set_state(self, state):
+        self._state = state
+        self.status.state = state
+
+    def _sync_status(self):
+        status = self.status
+        status.tick = self.tick
+        status.sim_time = self.sim_time
+        status.particle_count = self.store.count
 
     async def start(self):
         if self._task:
             return
         self._stop.clear()
-        self._state = EngineState.RUNNING
+        self._set_state(EngineState.RUNNING)
         self._task = asyncio.create_task(self._loop())
 
     async def stop(self):
         self._stop.set()
+        self._wake.set()
         if self._task:
             await self._task
             self._task = None
-        self._state = EngineState.STOPPED
+        self._apply_commands()  # nothing left to wait for a tick boundary
+        self._set_state(EngineState.STOPPED)
         # Notify subscribers of shutdown
         await self.bus.publish({"kind": "engine_stopped", "tick": self.tick})
 
+    def submit(self, kind, /, **args):
+        """Queue a control command for the next tick boundary.
+
+        Returns a future resolved with {"tick", "state"} (plus "ids" for a
+        spawn or despawn, "field" for a force) once the command has been applied.
+        A spawn or despawn wiped out by a reset in the same batch resolves with
+        empty "ids" and "dropped": True. Everything queued between
+        two ticks is coalesced and applied together. With no loop running
+        the command is applied immediately. Raises ValueError for an invalid
+        command.
+        """
+        if kind == CommandKind.FORCE:  # the field must exist now, not just at the next tick
+            validate(kind, args)
+            self.forces.check(args["name"], args.get("params"))
+        future = self.commands.submit(kind, args)
+        if self._task is None:
+            self._apply_commands()
+        else:
+            self._wake.set()
+        return future
+
     async def pause(self):
-        async with self._lock:
-            self._state = EngineState.PAUSED
-            self._log.info(f"engine paused tick={self.tick}")
+        return await self.submit(CommandKind.PAUSE)
 
     async def resume(self):
+        return await self.submit(CommandKind.RESUME)
+
+    def _apply_commands(self):
+        plan = self.commands.drain()
+        if plan is None:
+            return
+        try:
+            if plan.reset and not self._reset_ready(plan.params):
+                self.commands.hold(plan)  # the whole batch waits for the new population
+                return
+            if plan.params:
+                self._apply_params(plan.params)
+            if plan.reset:
+                self.reset()
+                self._log.info("engine reset")
+            elif "particle_count" in plan.params:
+                self._resize_population(plan.params["particle_count"])
+            changed = {}
+            for command in plan.forces:
+                field = self.forces.update(**command.args)
+                changed[id(command)] = {"field": field.to_dict()}
+                self._log.info("force %s enabled=%s", field.name, field.enabled)
+            for command in plan.dropped:
+                changed[id(command)] = {"ids": [], "dropped": True}
+            for command in plan.population:
+                apply = self._spawn if command.kind == CommandKind.SPAWN else self._despawn
+                changed[id(command)] = {"ids": apply(**command.args)}
+            if plan.state == CommandKind.PAUSE:
+                self._set_state(EngineState.PAUSED)
+                self._log.info("engine paused tick=%d", self.tick)
+            elif plan.state == CommandKind.RESUME:
+                self._set_state(EngineState.RUNNING)
+                self._log.info("engine resumed tick=%d", self.tick)
+        except Exception as exc:
+            self._log.error("command fail", err=exc)
+            for command in plan.commands:
+                self._settle(command.future, error=exc)
+            return
+
+        for command in plan.commands:
+            result = {"tick": self.tick, "state": self._state}
+            result.update(changed.get(id(command), ()))
+            self._settle(command.future, result)
+
+    def _settle(self, future, result=None, error=None):
+        settle(future, result, error)
+
+    def _step(self, dt):
+        """Integrate every slot, then apply the boundary. Dead slots are stepped too; they are never read."""
+        store = self.store
+        data = store.data[:, :store.high]
+        self.integrator.step(data, dt, self.forces if self.forces.active else None)
+        outside = self.boundary(data, self.world.width, self.world.height)
+        if outside is not None and len(outside):
+            ids = store.ids[outside]
+            removed = store.remove(ids[ids != FREE])
+            if removed:
+                self.absorbed += len(removed)
+                self._population_changed()
+
+    def _build_snapshot(self):
+        """Snapshot of the current tick, built once and shared by every consumer."""
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.tick != self.tick:
+            snapshot = StateSnapshot(self.tick, self.sim_time, self.particles)
+            self._snapshot = snapshot
+        return snapshot
+
+    async def between_ticks(self, fn, *args):
+        """Call `fn(*args)` while no tick is running and return its result."""
         async with self._lock:
-            self._state = EngineState.RUNNING
-            self._log.info(f"engine resumed tick={self.tick}")
+            return fn(*args)
 
     async def get_snapshot(self):
-        async with self._lock:
-            return StateSnapshot(self.tick, self.sim_time, [particle.to_state() for particle in self.particles])
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.tick == self.tick:
+            return snapshot
+        return await self.between_ticks(self._build_snapshot)
+
+    def _idle(self):
+        """Whether the loop can sleep until woken: paused with its frame published, or parked."""
+        if self.commands:
+            return False
+        if self._state == EngineState.PAUSED and self.tick == self._last_publish_tick:
+            return True
+        return self.scheduler is not None and self.scheduler.parks_now(self)
+
+    def profile_target(self):
+        """(thread id, code objects) that mark a profiler sample as taken inside a tick.
+
+        Call on the event loop thread; that is where the ticks run.
+        """
+        return threading.get_ident(), {type(self)._loop.__code__}
+
+    def wake(self):
+        """Wake a paused or parked loop to look at its state again."""
+        self._wake.set()
+
+    def _turn(self):
+        return self.scheduler.turn(self) if self.scheduler is not None else nullcontext()
+
+    def _advance(self, tick_interval):
+        """One tick's work, under the engine lock: commands, compaction, physics, history, snapshot.
+
+        Returns the phase timestamps, whether the clock advanced, and the
+        snapshot to publish (None when nobody needs one).
+        """
+        locked = time.perf_counter()
+        self._apply_commands()
+        if self.store.needs_compaction:
+            self.store.compact_step(self.compact_budget)
+        advanced = self._state == EngineState.RUNNING
+        if advanced:
+            self._step(tick_interval)
+            self.tick += 1
+            self.sim_time += tick_interval
+        stepped = time.perf_counter()
+        if advanced and self.history.fits(self.store.count):
+            self.history.record(self.tick, self.sim_time, self._live_id_strings(), self.store.columns())
+        # Only build a snapshot if the state changed and someone is listening
+        publish = self.tick != self._last_publish_tick and self.bus.wants(STATE_TOPIC)
+        snapshot = self._build_snapshot() if publish else None
+        return locked, stepped, time.perf_counter(), advanced, snapshot
+
+    def _account(self, started, wait_time, locked, stepped, built, advanced):
+        """Record a finished tick in status, stats and metrics."""
+        self._last_publish_tick = self.tick
+        finished = time.perf_counter()
+        self._sync_status()
+        self.status.last_tick_duration = finished - started
+        self.tick_stats.record(locked - started, stepped - locked, built - stepped,
+                               finished - built, max(0.0, wait_time), late=self.tick_overrun)
+        self._tick_seconds.observe(finished - started)
+        if advanced:
+            self._ticks_metric.inc()
 
     async def _loop(self):
-        tick_interval = self.config.tick_interval
         next_tick_time = time.perf_counter()
-        self._log.info(f"engine start dt={tick_interval}")
+        self._log.info("engine start dt=%s seed=%s", self.config.tick_interval, self.seed)
 
         while not self._stop.is_set():
+            tick_interval = self.config.tick_interval
+            if self._idle():
+                # Nothing changes until a command, a subscriber or stop; sleep until one of them
+                self._wake.clear()
+                await self._wake.wait()
+                next_tick_time = time.perf_counter()
+                continue
+
             wait_time = next_tick_time - time.perf_counter()
             if wait_time > 0:
                 try:
@@ -88,26 +435,26 @@ class SimulationEngine:
                     break
                 except asyncio.TimeoutError:
                     pass
+            else:
+                await asyncio.sleep(0)  # a late tick still lets requests and streams run
+            started = time.perf_counter()
+            self.tick_overrun = max(0.0, started - next_tick_time)
             next_tick_time += tick_interval
 
             try:
-                async with self._lock:
-                    if self._state == EngineState.RUNNING:
-                        for particle in self.particles:
-                            particle.step(tick_interval, self.world)
-                        self.tick += 1
-                        self.sim_time += tick_interval
-                    snapshot = StateSnapshot(self.tick, self.sim_time, [particle.to_state() for particle in self.particles])
+                async with self._turn():
+                    async with self._lock:
+                        locked, stepped, built, advanced, snapshot = self._advance(tick_interval)
             except Exception as exc:
                 self._log.error("tick fail", err=exc)
                 continue
 
-            # Only publish if state changed (avoid flooding when paused)
-            if self.tick != self._last_publish_tick:
+            if snapshot is not None:
                 try:
-                    await self.bus.publish(snapshot)
-                    self._last_publish_tick = self.tick
+                    await self.bus.publish(snapshot, topic=STATE_TOPIC)
+                    self.status.last_publish_time = time.time()
                 except Exception:
                     pass
+            self._account(started, wait_time, locked, stepped, built, advanced)
 
-        self._log.info(f"engine stop tick={self.tick}")
+        self._log.info("engine stop tick=%d", self.tick)
@@ -0,0 +1,161 @@
+"""Bounded in-memory history of recent frames."""
+
+import numpy as np
+
+from simulation.state import ParticleState, StateSnapshot
+
+_FRAME_OVERHEAD = 32  # tick, time, count and id-list reference per slot
+_COLUMNS = ("x", "y", "vx", "vy")
+
+
+class FrameRing:
+    """Ring buffer of the last K frames stored as float32 columns.
+
+    K is derived from `budget_bytes` and the widest frame seen so far, so the
+    memory used stays within the budget as the particle count changes. Id lists
+    are shared between consecutive frames while the particle set is unchanged.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.capacity = 0
+        self.width = 0
+        self._columns = np.empty((0, 4, 0), dtype=np.float32)
+        self._ticks = np.empty(0, dtype=np.int64)
+        self._times = np.empty(0, dtype=np.float64)
+        self._counts = np.empty(0, dtype=np.int32)
+        self._ids = []
+        self._head = 0  # next slot to write
+        self._size = 0
+        self._last_ids = None
+        self.oversized = 0  # frames refused for not fitting the budget
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        return self._columns.nbytes + self._ticks.nbytes + self._times.nbytes + self._counts.nbytes
+
+    @property
+    def oldest_tick(self):
+        return int(self._ticks[self._slot(0)]) if self._size else None
+
+    @property
+    def newest_tick(self):
+        return int(self._ticks[self._slot(self._size - 1)]) if self._size else None
+
+    def clear(self):
+        self._head = self._size = 0
+        self._last_ids = None
+        self._ids = [None] * self.capacity
+
+    def fits(self, count):
+        """Whether a frame of `count` particles fits the budget at all."""
+        return count * 16 + _FRAME_OVERHEAD <= self.budget_bytes
+
+    def push(self, snapshot):
+        particles = snapshot.particles
+        columns = np.array([[getattr(p, name) for p in particles] for name in _COLUMNS], dtype=np.float64)
+        self.record(snapshot.tick, snapshot.time, [p.id for p in particles], columns.reshape(4, len(particles)))
+
+    def record(self, tick, sim_time, ids, columns):
+        """Store one frame: `ids` and an array of shape (4, n) with rows x, y, vx, vy."""
+        count = len(ids)
+        if not self.fits(count):
+            self.oversized += 1
+            return
+        if count > self.width or not self.capacity:
+            # Grow the width by at least 25% so steady spawning doesn't re-layout every tick,
+            # but never past what leaves room for one frame
+            limit = (self.budget_bytes - _FRAME_OVERHEAD) // 16
+            self._resize(min(limit, max(count, self.width + self.width // 4)))
+
+        if ids is not self._last_ids and ids == self._last_ids:
+            ids = self._last_ids
+        self._last_ids = ids
+
+        slot = self._head
+        self._columns[slot, :, :count] = columns
+        self._ticks[slot] = tick
+        self._times[slot] = sim_time
+        self._counts[slot] = count
+        self._ids[slot] = ids
+        self._head = (slot + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def _resize(self, width):
+        """Re-layout for a wider frame, keeping the newest frames that still fit the budget."""
+        capacity = max(0, self.budget_bytes // (width * 16 + _FRAME_OVERHEAD))
+        keep = min(self._size, capacity)
+        order = [self._slot(i) for i in range(self._size - keep, self._size)]
+
+        columns = np.zeros((capacity, 4, width), dtype=np.float32)
+        columns[:keep, :, :self.width] = self._columns[order]
+        self._columns = columns
+        self._ticks = np.resize(self._ticks[order], capacity)
+        self._times = np.resize(self._times[order], capacity)
+        self._counts = np.resize(self._counts[order], capacity)
+        self._ids = [self._ids[i] for i in order] + [None] * (capacity - keep)
+        self.capacity, self.width = capacity, width
+        self._size = keep
+        self._head = keep % capacity if capacity else 0
+
+    def _slot(self, i):
+        """Ring slot of the i-th oldest frame."""
+        return (self._head - self._size + i) % self.capacity
+
+    def _find(self, tick):
+        """Ring position (0 = oldest) of the first frame with tick >= `tick`."""
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._ticks[self._slot(mid)] < tick:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def columns(self, tick):
+        """(ids, float32 array of shape (4, n)) for `tick`, copied out of the ring, or None."""
+        position = self._find(tick)
+        if position >= self._size:
+            return None
+        slot = self._slot(position)
+        if self._ticks[slot] != tick:
+            return None
+        return self._ids[slot], self._columns[slot, :, :self._counts[slot]].copy()
+
+    def get(self, tick):
+        """Snapshot of the frame at `tick`, or None if it is not in the ring."""
+        position = self._find(tick)
+        if position < self._size and self._ticks[self._slot(position)] == tick:
+            return self._snapshot(self._slot(position))
+        return None
+
+    def window(self, start_tick, end_tick, limit=None):
+        """Snapshots with start_tick <= tick <= end_tick, oldest first."""
+        frames = []
+        for position in range(self._find(start_tick), self._size):
+            slot = self._slot(position)
+            if self._ticks[slot] > end_tick or (limit and len(frames) >= limit):
+                break
+            frames.append(self._snapshot(slot))
+        return frames
+
+    def _snapshot(self, slot):
+        count = self._counts[slot]
+        x, y, vx, vy = self._columns[slot, :, :count].tolist()
+        particles = [ParticleState(*values) for values in zip(self._ids[slot], x, y, vx, vy)]
+        return StateSnapshot(int(self._ticks[slot]), float(self._times[slot]), particles)
+
+    def get_stats(self):
+        return {
+            "frames": self._size,
+            "capacity": self.capacity,
+            "oldest_tick": self.oldest_tick,
+            "newest_tick": self.newest_tick,
+            "bytes": self.nbytes,
+            "budget_bytes": self.budget_bytes,
+            "oversized": self.oversized,
+        }
@@ -0,0 +1,91 @@
+"""Per-phase timing of the engine tick."""
+
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+PHASES = ("lock_wait", "physics", "snapshot", "publish", "sleep_slack")
+
+# Histogram upper bounds in seconds: 10us .. ~5s, doubling
+BUCKETS = tuple(10e-6 * 2 ** i for i in range(20))
+
+
+class TickStats:
+    """Rolling window plus cumulative histograms of tick phase durations.
+
+    `record()` is on the tick path and only does array stores and a bisect
+    per phase; percentiles are computed when `summary()` is read. Every
+    `_SELF_SAMPLE`-th call also times itself so the instrumentation overhead
+    shows up in the report.
+    """
+
+    _SELF_SAMPLE = 64
+
+    def __init__(self, tick_interval, window=512):
+        self.tick_interval = tick_interval
+        self.window = window
+        self.count = 0
+        self.last_utilisation = 0.0
+        self.work_seconds = 0.0  # physics, snapshot and publish summed over every tick; no waiting
+        self._samples = np.zeros((len(PHASES), window), dtype=np.float64)
+        self._busy = np.zeros(window, dtype=np.float64)
+        self._late = np.zeros(window, dtype=np.float64)  # how late each tick started
+        self._histograms = [[0] * (len(BUCKETS) + 1) for _ in PHASES]
+        self._overhead = 0.0
+
+    def record(self, lock_wait, physics, snapshot, publish, sleep_slack, late=0.0):
+        sampling = self.count % self._SELF_SAMPLE == 0
+        if sampling:
+            started = time.perf_counter()
+        position = self.count % self.window
+        durations = (lock_wait, physics, snapshot, publish, sleep_slack)
+        samples, histograms = self._samples, self._histograms
+        for phase, duration in enumerate(durations):
+            samples[phase, position] = duration
+            histograms[phase][bisect_right(BUCKETS, duration)] += 1
+        busy = lock_wait + physics + snapshot + publish
+        self._busy[position] = busy
+        self._late[position] = late
+        self.work_seconds += physics + snapshot + publish
+        self.last_utilisation = busy / self.tick_interval
+        self.count += 1
+        if sampling:
+            self._overhead = time.perf_counter() - started
+
+    def summary(self):
+        filled = min(self.count, self.window)
+        phases = {}
+        for index, name in enumerate(PHASES):
+            values = self._samples[index, :filled]
+            if filled:
+                p50, p99 = np.percentile(values, (50, 99))
+                phases[name] = {"mean_ms": values.mean() * 1e3, "p50_ms": p50 * 1e3,
+                                "p99_ms": p99 * 1e3, "max_ms": values.max() * 1e3}
+            else:
+                phases[name] = {"mean_ms": 0.0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        busy = self._busy[:filled]
+        late = self._late[:filled]
+        utilisation = busy / self.tick_interval if filled else busy
+        return {
+            "ticks": self.count,
+            "window": filled,
+            "tick_interval_ms": self.tick_interval * 1e3,
+            "budget_utilisation": {
+                "last": self.last_utilisation,
+                "mean": float(utilisation.mean()) if filled else 0.0,
+                "p99": float(np.percentile(utilisation, 99)) if filled else 0.0,
+                "over_budget": int((utilisation > 1.0).sum()),
+            },
+            "phases": phases,
+            "start_jitter": {
+                "p50_ms": float(np.percentile(late, 50)) * 1e3 if filled else 0.0,
+                "p99_ms": float(np.percentile(late, 99)) * 1e3 if filled else 0.0,
+                "max_ms": float(late.max()) * 1e3 if filled else 0.0,
+            },
+            "instrumentation_overhead": self._overhead / self.tick_interval,
+        }
+
+    def histograms(self):
+        """Cumulative per-phase bucket counts; the last bucket is +Inf."""
+        return {name: list(self._histograms[index]) for index, name in enumerate(PHASES)}
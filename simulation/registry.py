@@ -0,0 +1,169 @@
+"""Named simulation worlds hosted in one process."""
+
+import copy
+import re
+
+from communication.bus import EventBus
+from config import SimulationConfig
+from simulation.boundaries import get_boundary
+from simulation.commands import PARAMS, CommandKind, validate
+from simulation.engine import SimulationEngine
+from simulation.forces import ForceFields
+from simulation.initializers import INITIALIZERS
+from simulation.integrators import get_integrator
+from simulation.scheduler import TickScheduler
+from simulation.threaded import ThreadedEngine
+
+_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def check_overrides(overrides):
+    """Raise ValueError unless a world's simulation overrides hold usable values.
+
+    The live fields follow the same rules as a params command; the rest
+    must name an integrator, boundary, initializer or force fields that exist.
+    """
+    validate(CommandKind.PARAMS, {name: value for name, value in overrides.items() if name in PARAMS})
+    if "integrator" in overrides:
+        get_integrator(overrides["integrator"])
+    if "boundary" in overrides:
+        get_boundary(overrides["boundary"])
+    if "initializer" in overrides and overrides["initializer"] not in INITIALIZERS:
+        raise ValueError(f"unknown initializer: {overrides['initializer']}")
+    if "forces" in overrides:
+        if not isinstance(overrides["forces"], list) or not all(isinstance(f, dict) for f in overrides["forces"]):
+            raise ValueError("forces must be a list of objects")
+        ForceFields.from_config(overrides["forces"])
+
+
+class WorldRegistry:
+    """Independent worlds by name, each an engine with its own config and EventBus.
+
+    Every world shares one TickScheduler. The default world is the one the
+    app builds from the simulation section; the others start from a copy of
+    that section with their own overrides.
+    """
+
+    DEFAULT = "default"
+
+    def __init__(self, base_config, scheduler=None, limit=16, queue_size=100):
+        self.base_config = base_config
+        self.scheduler = scheduler or TickScheduler()
+        self.limit = limit
+        self.queue_size = queue_size
+        self._engines = {}
+        self._running = False
+
+    def __contains__(self, name):
+        return name in self._engines
+
+    def __len__(self):
+        return len(self._engines)
+
+    @property
+    def names(self):
+        return list(self._engines)
+
+    @property
+    def engines(self):
+        return list(self._engines.values())
+
+    def get(self, name=None):
+        """The engine of world `name` (the default world when None), or None if there is none."""
+        return self._engines.get(name or self.DEFAULT)
+
+    def new_engine(self, overrides=None):
+        """An engine on its own bus, configured as the simulation section with `overrides` applied.
+
+        Raises ValueError for an unknown field or a value the engine can't run with.
+        """
+        overrides = overrides or {}
+        fields = {name: copy.deepcopy(getattr(self.base_config, name)) for name in SimulationConfig.__slots__}
+        unknown = set(overrides) - set(fields)
+        if unknown:
+            raise ValueError(f"Unknown simulation fields: {', '.join(sorted(unknown))}")
+        check_overrides(overrides)
+        fields.update(overrides)
+        config = SimulationConfig(**fields)
+        engine_class = ThreadedEngine if config.threaded else SimulationEngine
+        return engine_class(bus=EventBus(queue_size=self.queue_size), config=config)
+
+    def add(self, name, engine):
+        """Register `engine` as world `name`. Raises ValueError for a bad or taken name, or past the limit."""
+        if not _NAME.match(name):
+            raise ValueError(f"World names are 1-64 letters, digits, '-' or '_': {name!r}")
+        if name in self._engines:
+            raise ValueError(f"World {name!r} already exists")
+        if len(self._engines) >= self.limit:
+            raise ValueError(f"At most {self.limit} worlds")
+        engine.scheduler = self.scheduler
+        self.scheduler.join(engine)
+        self._engines[name] = engine
+        return engine
+
+    async def create(self, name, overrides=None):
+        """Add a new world and start it if the registry is running."""
+        engine = self.add(name, self.new_engine(overrides))
+        if self._running:
+            await engine.start()
+        return engine
+
+    async def remove(self, name):
+        """Stop world `name`, close its streams and drop it. The default world can't be removed."""
+        if name == self.DEFAULT:
+            raise ValueError("The default world can't be removed")
+        engine = self._engines.pop(name)
+        await engine.stop()
+        await engine.bus.close()  # stream clients of the world stop waiting for frames
+        self.scheduler.forget(engine)
+        return engine
+
+    async def start(self):
+        self._running = True
+        for engine in self._engines.values():
+            await engine.start()
+
+    async def stop(self):
+        self._running = False
+        for engine in self._engines.values():
+            await engine.stop()
+
+    def world_stats(self, name):
+        engine = self._engines[name]
+        scheduler = self.scheduler
+        store_bytes, history_bytes = engine.store.nbytes, engine.history.nbytes
+        tick_stats = engine.tick_stats
+        return {
+            "state": engine.state,
+            "mode": engine.mode,
+            "parked": scheduler.parked(engine),
+            "tick": engine.tick,
+            "particles": engine.store.count,
+            "subscribers": engine.bus.subscriber_count,
+            "tick_interval_s": engine.config.tick_interval,
+            "memory": {
+                "store_bytes": store_bytes,
+                "history_bytes": history_bytes,
+                "total_bytes": store_bytes + history_bytes,
+            },
+            "tick_cost": {
+                "last_ms": engine.status.last_tick_duration * 1e3,
+                "mean_ms": tick_stats.work_seconds / tick_stats.count * 1e3 if tick_stats.count else 0.0,
+                "budget_utilisation": tick_stats.last_utilisation,
+                "cpu_s": tick_stats.work_seconds,
+                "scheduled_ticks": scheduler.ticks(engine),
+            },
+        }
+
+    def get_stats(self):
+        worlds = {name: self.world_stats(name) for name in self._engines}
+        total = sum(world["tick_cost"]["cpu_s"] for world in worlds.values())
+        for world in worlds.values():
+            world["tick_cost"]["cpu_share"] = world["tick_cost"]["cpu_s"] / total if total else 0.0
+        return {
+            "count": len(worlds),
+            "limit": self.limit,
+            "memory_bytes": sum(world["memory"]["total_bytes"] for world in worlds.values()),
+            "scheduler": self.scheduler.get_stats(),
+            "worlds": worlds,
+        }
@@ -0,0 +1,128 @@
+"""Shares the event loop between the ticks of several worlds."""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+
+
+class TickScheduler:
+    """Grants ticks one world at a time, the world that has used the least CPU first.
+
+    Worlds due at about the same time queue in `turn()`; a dispatch
+    scheduled behind them picks the one with the smallest charged runtime,
+    so a world with cheap ticks keeps its rate next to one that overruns
+    instead of waiting a whole expensive tick per turn. A world that joins,
+    or comes back from being parked, starts at the smallest runtime of the
+    others rather than with a lead it never used.
+
+    A running world without subscribers is parked after `park_after`
+    seconds (0 = never) and sleeps until a command or a subscriber wakes it.
+    """
+
+    def __init__(self, park_after=0.0):
+        self.park_after = park_after
+        self._runtime = {}  # engine -> busy seconds charged
+        self._ticks = {}
+        self._idle_since = {}
+        self._parked = set()
+        self._waiting = []  # heap of (runtime, seq, future)
+        self._seq = itertools.count()
+        self._busy = False
+        self._dispatching = False
+        self.waits = 0  # turns that queued behind another world
+        self.parks = 0
+
+    def join(self, engine):
+        self._runtime[engine] = max(self._runtime.get(engine, 0.0), self._floor(engine))
+        self._ticks.setdefault(engine, 0)
+
+    def forget(self, engine):
+        self._runtime.pop(engine, None)
+        self._ticks.pop(engine, None)
+        self._idle_since.pop(engine, None)
+        self._parked.discard(engine)
+
+    def _floor(self, engine):
+        return min((runtime for other, runtime in self._runtime.items() if other is not engine), default=0.0)
+
+    def runtime(self, engine):
+        return self._runtime.get(engine, 0.0)
+
+    def ticks(self, engine):
+        return self._ticks.get(engine, 0)
+
+    def parked(self, engine):
+        return engine in self._parked
+
+    @asynccontextmanager
+    async def turn(self, engine):
+        """Wait for this world's turn to tick and charge it for the time spent inside."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (self.runtime(engine), next(self._seq), future))
+        if self._busy or len(self._waiting) > 1:
+            self.waits += 1
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._done()  # granted just before the cancel; pass the turn on
+            raise
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._runtime[engine] = self.runtime(engine) + time.perf_counter() - started
+            self._ticks[engine] = self.ticks(engine) + 1
+            self._done()
+
+    def _schedule(self):
+        if not self._busy and not self._dispatching:
+            self._dispatching = True
+            # Two hops: past every world woken this iteration, and past the one that just
+            # finished a tick, which yields once before queueing again if it is still behind
+            loop = asyncio.get_running_loop()
+            loop.call_soon(loop.call_soon, self._dispatch)
+
+    def _dispatch(self):
+        self._dispatching = False
+        while self._waiting and not self._busy:
+            _, _, future = heapq.heappop(self._waiting)
+            if not future.done():
+                self._busy = True
+                future.set_result(None)
+
+    def _done(self):
+        self._busy = False
+        if self._waiting:
+            self._schedule()
+
+    def parks_now(self, engine):
+        """Whether `engine` should be parked: running, and without subscribers for `park_after` seconds."""
+        if not self.park_after or engine.state != "running":
+            return False
+        if engine.bus.has_subscribers:
+            self._idle_since.pop(engine, None)
+            if engine in self._parked:
+                self._parked.discard(engine)
+                self.join(engine)
+            return False
+        now = time.monotonic()
+        if now - self._idle_since.setdefault(engine, now) < self.park_after:
+            return False
+        if engine not in self._parked:
+            self._parked.add(engine)
+            self.parks += 1
+        return True
+
+    def get_stats(self):
+        return {
+            "park_after_s": self.park_after,
+            "worlds": len(self._runtime),
+            "parked": len(self._parked),
+            "parks": self.parks,
+            "waits": self.waits,
+            "queued": len(self._waiting),
+        }
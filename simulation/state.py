@@ -30,3 +30,56 @@ class StateSnapshot:
             "sim_time_s": self.time,
             "particles": [{"id": p.id, "x": p.x, "y": p.y, "vx": p.vx, "vy": p.vy} for p in self.particles]
         }
+
+
+class EngineStatus:
+    """Scalar engine status, written by the engine and read without its lock.
+
+    Every field is replaced by a single attribute store, so readers on the
+    same loop never see a torn value and never copy particles.
+    """
+    __slots__ = ("tick", "sim_time", "state", "particle_count", "last_tick_duration", "last_publish_time")
+
+    def __init__(self, state="stopped"):
+        self.tick = 0
+        self.sim_time = 0.0
+        self.state = state
+        self.particle_count = 0
+        self.last_tick_duration = 0.0  # seconds of work in the last loop iteration
+        self.last_publish_time = None  # wall clock of the last published snapshot
+
+    def to_dict(self):
+        return {
+            "tick": self.tick,
+            "sim_time_s": self.sim_time,
+            "state": self.state,
+            "particle_count": self.particle_count,
+            "last_tick_duration_s": self.last_tick_duration,
+            "last_publish_time": self.last_publish_time,
+        }
+
+
+class EngineCheckpoint:
+    """Everything needed to resume the engine: clock, live particles, RNG state, live params and force fields.
+
+    `forces` is the field list as `ForceFields.to_list()` gives it (None
+    leaves the engine's fields as they are) and `absorbed` the count of
+    particles the walls have absorbed so far. `ids` is (count,) int64 and `data` a contiguous (4, count) float64 array,
+    both owned by the checkpoint (a copy, or a mapping of the file it was
+    read from), so the engine can keep running while it is written.
+    """
+    __slots__ = ("tick", "sim_time", "next_id", "ids", "data", "rng_state", "params", "forces", "absorbed")
+
+    def __init__(self, tick, sim_time, next_id, ids, data, rng_state, params, forces=None, absorbed=0):
+        self.tick = tick
+        self.sim_time = sim_time
+        self.next_id = next_id
+        self.ids = ids
+        self.data = data
+        self.rng_state = rng_state
+        self.params = params
+        self.forces = forces
+        self.absorbed = absorbed
+
+    def __len__(self):
+        return len(self.ids)
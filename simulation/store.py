@@ -0,0 +1,334 @@
+"""Pooled struct-of-arrays particle storage."""
+
+import numpy as np
+
+X, Y, VX, VY = range(4)
+FREE = -1
+
+
+def format_id(pid):
+    return f"p{pid:02d}"
+
+
+def parse_id(value):
+    """Integer id from an int or a "pNN" string; ValueError otherwise."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value[:1] == "p" and value[1:].isdigit():
+        return int(value[1:])
+    raise ValueError(f"invalid particle id: {value!r}")
+
+
+class ParticleStore:
+    """Particles as float64 rows x, y, vx, vy over preallocated slots.
+
+    Slots are handed out from a free list first and then from the high-water
+    mark; when both run out the arrays double. Despawned slots go back on
+    the free list, so churn reuses memory instead of growing it. Holes are
+    closed by `compact_step()`, which moves a bounded number of particles
+    from the top slots into the lowest holes per call, so the tick loop can
+    run it every tick without a pause. Ids are stable integers that never
+    depend on the slot. They map back to slots through two parallel arrays
+    sorted by id (`map_ids`, `map_slots`): new ids are always the largest
+    so far and are appended, despawned ids are marked FREE, and once those
+    outnumber the live ones `compact_step()` drops them. The map is sized
+    by live particles, not by how many ids were ever handed out.
+
+    Slots in [0, high) may be dead. Vectorised updates may run over all of
+    them (dead slots hold harmless values); anything that reports particles
+    must go through `live()`.
+
+    `version` changes when the set of live ids changes, `layout` whenever
+    live particles change slots as well. Formatted ids ("p42") are only
+    built once something asks for `live_names()`; from then on they are
+    formatted once per spawn and moved along with their slots.
+    """
+
+    def __init__(self, capacity=64):
+        capacity = max(1, capacity)
+        self.data = np.zeros((4, capacity), dtype=np.float64)
+        self.ids = np.full(capacity, FREE, dtype=np.int64)
+        self.map_ids = np.empty(capacity, dtype=np.int64)
+        self.map_slots = np.empty(capacity, dtype=np.int64)
+        self.mapped = 0  # map entries in use, despawned ones included
+        self.high = 0
+        self.count = 0
+        self.next_id = 0
+        self.version = 0  # bumped whenever the set of live ids changes
+        self.layout = 0  # bumped whenever live slots change, including moves
+        self.moved = 0
+        self._names = None  # formatted id per slot, built on first live_names()
+        self._free = np.empty(0, dtype=np.intp)
+        self._live = None  # cached live slot indices, None when there are no holes
+
+    @classmethod
+    def from_arrays(cls, ids, data, next_id):
+        """A packed store that adopts (count,) `ids` and (4, count) `data` without copying them."""
+        store = cls()
+        count = len(ids)
+        store.next_id = next_id
+        if count:
+            store.data, store.ids = data, ids
+            if count > 1 and np.any(ids[1:] < ids[:-1]):  # compaction moved some ids out of order
+                slots = np.argsort(ids, kind="stable")
+                store.map_ids, store.map_slots = ids[slots], slots
+            else:
+                store.map_ids, store.map_slots = ids.copy(), np.arange(count, dtype=np.int64)
+            store.mapped = store.high = store.count = count
+        return store
+
+    @property
+    def capacity(self):
+        return self.data.shape[1]
+
+    @property
+    def holes(self):
+        return self.high - self.count
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.ids.nbytes + self.map_ids.nbytes + self.map_slots.nbytes
+
+    @property
+    def stale(self):
+        """Map entries of despawned ids, dropped by the next `compact_step()` once they outnumber live ones."""
+        return self.mapped - self.count
+
+    def clear(self):
+        """Drop every particle; ids start again from 0."""
+        self.ids[:self.high] = FREE
+        self.map_ids = np.empty(64, dtype=np.int64)
+        self.map_slots = np.empty(64, dtype=np.int64)
+        self._free = self._free[:0]
+        self.high = self.count = self.next_id = self.mapped = 0
+        self._names = None
+        self._changed()
+
+    def slot(self, pid):
+        """Slot of particle `pid`, or None if it doesn't exist."""
+        at = int(np.searchsorted(self.map_ids[:self.mapped], pid))
+        if at < self.mapped and self.map_ids[at] == pid and self.map_slots[at] != FREE:
+            return int(self.map_slots[at])
+        return None
+
+    def _find(self, ids):
+        """Map positions of `ids` and whether each one is live."""
+        at = np.searchsorted(self.map_ids[:self.mapped], ids)
+        if not self.mapped:
+            return at, np.zeros(len(at), dtype=bool)
+        at[at == self.mapped] = self.mapped - 1
+        return at, (self.map_ids[at] == ids) & (self.map_slots[at] != FREE)
+
+    def _map_append(self, ids, slots):
+        end = self.mapped + len(ids)
+        if end > len(self.map_ids):
+            size = len(self.map_ids)
+            while size < end:
+                size *= 2
+            self._map_resize(size)
+        self.map_ids[self.mapped:end] = ids
+        self.map_slots[self.mapped:end] = slots
+        self.mapped = end
+
+    def _map_resize(self, size):
+        map_ids = np.empty(size, dtype=np.int64)
+        map_slots = np.empty(size, dtype=np.int64)
+        map_ids[:self.mapped] = self.map_ids[:self.mapped]
+        map_slots[:self.mapped] = self.map_slots[:self.mapped]
+        self.map_ids, self.map_slots = map_ids, map_slots
+
+    def _prune(self):
+        """Drop the map entries of despawned ids and give back map memory."""
+        live = self.map_slots[:self.mapped] != FREE
+        map_ids, map_slots = self.map_ids[:self.mapped][live], self.map_slots[:self.mapped][live]
+        self.mapped = len(map_ids)
+        size = 64
+        while size < self.mapped:
+            size *= 2
+        self.map_ids = np.empty(size, dtype=np.int64)
+        self.map_slots = np.empty(size, dtype=np.int64)
+        self.map_ids[:self.mapped] = map_ids
+        self.map_slots[:self.mapped] = map_slots
+
+    def _changed(self, ids=True):
+        if ids:
+            self.version += 1
+        self.layout += 1
+        self._live = None
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        self._resize(capacity)
+
+    def _resize(self, capacity):
+        data = np.zeros((4, capacity), dtype=np.float64)
+        ids = np.full(capacity, FREE, dtype=np.int64)
+        data[:, :self.high] = self.data[:, :self.high]
+        ids[:self.high] = self.ids[:self.high]
+        self.data, self.ids = data, ids
+        if self._names is not None:
+            names = np.empty(capacity, dtype=object)
+            names[:self.high] = self._names[:self.high]
+            self._names = names
+
+    def allocate(self, count, reuse=True):
+        """Reserve `count` slots with fresh ids. Returns the slot indices.
+
+        With `reuse=False` the free list is left alone and the slots are the
+        contiguous range from the old high-water mark.
+        """
+        split = max(0, len(self._free) - count) if reuse else len(self._free)
+        reused, self._free = self._free[split:], self._free[:split]
+        fresh = count - len(reused)
+        if self.high + fresh > self.capacity:
+            self._grow(self.high + fresh)
+        start, self.high = self.high, self.high + fresh
+        slots = np.arange(start, self.high, dtype=np.intp)
+        if len(reused):
+            slots = np.concatenate([reused, slots])
+        new_ids = np.arange(self.next_id, self.next_id + count, dtype=np.int64)
+        self.next_id += count
+        if len(reused):
+            self.ids[slots] = new_ids
+        elif count:  # contiguous slots: slice assignment, no fancy indexing
+            self.ids[start:self.high] = new_ids
+        self._map_append(new_ids, slots)  # fresh ids are the largest yet, so the map stays sorted
+        if self._names is not None:
+            self._names[slots] = [format_id(pid) for pid in new_ids.tolist()]
+        self.count += count
+        self._changed()
+        return slots
+
+    def append(self, count):
+        """Allocate `count` slots past the high-water mark. Returns their (4, count) view to fill in place."""
+        start = self.high
+        self.allocate(count, reuse=False)
+        return self.data[:, start:start + count]
+
+    def add(self, x, y, vx, vy):
+        """Append particles from equal-length arrays. Returns their new ids."""
+        slots = self.allocate(len(x))
+        self.data[X, slots] = x
+        self.data[Y, slots] = y
+        self.data[VX, slots] = vx
+        self.data[VY, slots] = vy
+        return self.ids[slots].tolist()
+
+    def remove(self, ids):
+        """Free the slots of `ids`. Unknown ids are ignored; returns the ids removed."""
+        ids = np.sort(np.asarray(ids, dtype=np.int64))
+        ids = ids[(ids >= 0) & (ids < self.next_id)]
+        if len(ids) > 1:
+            ids = ids[np.concatenate([[True], ids[1:] != ids[:-1]])]
+        at, found = self._find(ids)
+        ids, at = ids[found], at[found]
+        if len(ids):
+            slots = self.map_slots[at]
+            self.ids[slots] = FREE
+            self.data[:, slots] = 0.0
+            self.map_slots[at] = FREE
+            self._free = np.concatenate([self._free, slots])
+            self.count -= len(ids)
+            self._trim()
+            self._changed()
+        return ids.tolist()
+
+    def _trim(self):
+        """Lower the high-water mark past trailing free slots."""
+        if not self.high or self.ids[self.high - 1] != FREE:
+            return
+        occupied = np.flatnonzero(self.ids[:self.high] != FREE)
+        self.high = int(occupied[-1]) + 1 if len(occupied) else 0
+        self._free = self._free[self._free < self.high]
+
+    def compact_step(self, budget=4096):
+        """Move up to `budget` particles from the top slots into the lowest holes.
+
+        Returns the number moved. Once there are no holes left and the store
+        is under a quarter full, capacity is halved. When despawned ids
+        outnumber live ones in the id map, it drops them first (one pass over
+        the map, paid for by at least as many despawns).
+        """
+        if self._map_stale:
+            self._prune()
+        if not self.holes:
+            if self.capacity > 64 and self.high < self.capacity // 4:
+                self._resize(max(64, self.capacity // 2))
+            return 0
+        moves = min(budget, self.holes)
+        if moves < len(self._free):
+            lowest = np.argpartition(self._free, moves - 1)
+            holes, rest = self._free[lowest[:moves]], self._free[lowest[moves:]]
+        else:
+            holes, rest = self._free, self._free[:0]
+        holes = np.sort(holes)
+        # Top `moves` live slots, scanning down from the high-water mark
+        window = moves
+        while True:
+            start = max(0, self.high - window)
+            occupied = np.flatnonzero(self.ids[start:self.high] != FREE)[::-1][:moves] + start
+            if len(occupied) == moves or not start:
+                break
+            window *= 2
+        keep = occupied > holes[:len(occupied)]
+        sources, targets = occupied[keep], holes[:len(occupied)][keep]
+        self.data[:, targets] = self.data[:, sources]
+        self.ids[targets] = self.ids[sources]
+        self.ids[sources] = FREE
+        if self._names is not None:
+            self._names[targets] = self._names[sources]
+        self.data[:, sources] = 0.0
+        at, _ = self._find(self.ids[targets])
+        self.map_slots[at] = targets
+        self._free = np.concatenate([rest, holes[len(targets):], sources])
+        self.moved += len(sources)
+        self._trim()
+        self._changed(ids=False)
+        return len(sources)
+
+    def live(self):
+        """Slot indices of live particles, in slot order; a slice when there are no holes."""
+        if not self.holes:
+            return slice(0, self.high)
+        if self._live is None:
+            self._live = np.flatnonzero(self.ids[:self.high] != FREE)
+        return self._live
+
+    def columns(self):
+        """float64 array (4, count) of live particles. A view when there are no holes."""
+        return self.data[:, self.live()]
+
+    def live_ids(self):
+        return self.ids[self.live()]
+
+    def live_names(self):
+        """Formatted ids of live particles, in slot order (matching `columns()`)."""
+        if self._names is None:
+            names = np.empty(self.capacity, dtype=object)
+            live = self.live()
+            names[live] = [format_id(pid) for pid in self.ids[live].tolist()]
+            self._names = names
+        return self._names[self.live()].tolist()
+
+    @property
+    def needs_compaction(self):
+        """Whether `compact_step()` has work: holes to close, capacity to give back or the id map to prune."""
+        return (bool(self.holes) or (self.capacity > 64 and self.high < self.capacity // 4)
+                or self._map_stale)
+
+    @property
+    def _map_stale(self):
+        return self.stale > max(64, self.count)
+
+    def get_stats(self):
+        return {
+            "count": self.count,
+            "capacity": self.capacity,
+            "high_water": self.high,
+            "holes": self.holes,
+            "stale_ids": self.stale,
+            "bytes": self.nbytes,
+            "moved": self.moved,
+        }
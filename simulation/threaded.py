@@ -0,0 +1,149 @@
+"""Engine mode that ticks on its own OS thread instead of the event loop."""
+
+import asyncio
+import threading
+import time
+from collections import deque
+
+from communication.bus import STATE_TOPIC
+from simulation.commands import settle
+from simulation.engine import EngineState, SimulationEngine
+
+
+class ThreadedEngine(SimulationEngine):
+    """SimulationEngine whose ticks run on a dedicated thread with its own clock.
+
+    HTTP handlers and stream generators no longer delay ticks: the thread
+    sleeps until each deadline on its own and only needs the GIL while it
+    computes. Snapshots go back to the event loop through a one-slot outbox
+    drained by a pump task, so a loop that falls behind skips to the newest
+    frame instead of queueing old ones. Command futures are resolved on the
+    loop with `call_soon_threadsafe`.
+
+    With a scheduler the engine can still be parked, but its ticks don't
+    take turns with the loop's worlds; they don't run on the loop.
+    """
+
+    mode = "thread"
+
+    def __init__(self, bus, config=None):
+        super().__init__(bus, config)
+        self._tick_lock = threading.Lock()  # held by the thread for a whole tick
+        self._wake = threading.Event()
+        self._halt = threading.Event()
+        self._thread = None
+        self._loop_ref = None
+        self._outbox = deque(maxlen=1)
+        self._outbox_ready = None
+        self._pump_task = None
+        self.coalesced = 0  # frames replaced in the outbox before the loop published them
+
+    async def start(self):
+        if self._thread:
+            return
+        self._loop_ref = asyncio.get_running_loop()
+        self._outbox_ready = asyncio.Event()
+        self._pump_task = asyncio.create_task(self._pump())
+        self._halt.clear()
+        self._set_state(EngineState.RUNNING)
+        self._thread = threading.Thread(target=self._run, name="sim-engine", daemon=True)
+        self._task = self._thread  # submit() queues for the next tick instead of applying now
+        self._thread.start()
+
+    async def stop(self):
+        self._halt.set()
+        self._wake.set()
+        if self._thread:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = self._task = None
+        if self._pump_task:
+            self._pump_task.cancel()
+            try:
+                await self._pump_task
+            except asyncio.CancelledError:
+                pass
+            self._pump_task = None
+        while self._outbox:  # the last frames handed off before the thread stopped
+            await self.bus.publish(self._outbox.popleft(), topic=STATE_TOPIC)
+        self._apply_commands()  # nothing left to wait for a tick boundary
+        self._set_state(EngineState.STOPPED)
+        await self.bus.publish({"kind": "engine_stopped", "tick": self.tick})
+
+    async def between_ticks(self, fn, *args):
+        """Call `fn(*args)` on a worker thread while the engine thread is between ticks."""
+        return await asyncio.to_thread(self._call_locked, fn, *args)
+
+    def _call_locked(self, fn, *args):
+        with self._tick_lock:
+            return fn(*args)
+
+    def profile_target(self):
+        # _run is on the engine thread's stack even while it sleeps, so match the tick itself
+        thread_id = self._thread.ident if self._thread else None
+        return thread_id, {type(self)._advance.__code__, type(self)._account.__code__,
+                           type(self)._hand_off.__code__}
+
+    def _reset_ready(self, params):
+        return True  # a large population is built on the engine thread, off the loop already
+
+    def _settle(self, future, result=None, error=None):
+        if threading.current_thread() is self._thread:
+            self._loop_ref.call_soon_threadsafe(settle, future, result, error)
+        else:
+            settle(future, result, error)
+
+    def _run(self):
+        next_tick_time = time.perf_counter()
+        self._log.info("engine thread start dt=%s seed=%s", self.config.tick_interval, self.seed)
+
+        while not self._halt.is_set():
+            tick_interval = self.config.tick_interval
+            if self._idle():
+                # Clear before re-checking so a command submitted in between still wakes us
+                self._wake.clear()
+                if self._idle():
+                    self._wake.wait()
+                next_tick_time = time.perf_counter()
+                continue
+
+            wait_time = next_tick_time - time.perf_counter()
+            if wait_time > 0 and self._halt.wait(wait_time):
+                break
+            started = time.perf_counter()
+            self.tick_overrun = max(0.0, started - next_tick_time)
+            next_tick_time += tick_interval
+
+            try:
+                with self._tick_lock:
+                    locked, stepped, built, advanced, snapshot = self._advance(tick_interval)
+            except Exception as exc:
+                self._log.error("tick fail", err=exc)
+                continue
+
+            if snapshot is not None:
+                self._hand_off(snapshot)
+            self._account(started, wait_time, locked, stepped, built, advanced)
+
+        self._log.info("engine thread stop tick=%d", self.tick)
+
+    def _hand_off(self, snapshot):
+        if self._outbox:
+            self.coalesced += 1
+        self._outbox.append(snapshot)
+        try:
+            self._loop_ref.call_soon_threadsafe(self._outbox_ready.set)
+        except RuntimeError:
+            pass  # the loop is closing
+
+    async def _pump(self):
+        """Publish frames handed off by the engine thread to the bus."""
+        while True:
+            await self._outbox_ready.wait()
+            self._outbox_ready.clear()
+            while self._outbox:
+                snapshot = self._outbox.popleft()
+                try:
+                    await self.bus.publish(snapshot, topic=STATE_TOPIC)
+                    self.status.last_publish_time = time.time()
+                except Exception:
+                    pass
@@ -0,0 +1,188 @@
+"""Binary engine checkpoints.
+
+Layout of `<path>` (little-endian):
+
+    header   64 bytes       magic, version, header size, tick, sim_time, count, next_id, meta_len
+    meta     meta_len       JSON: RNG state, live params, force fields and absorbed count, padded to 8 bytes
+    ids      count int64
+    data     count float64 per row, rows x | y | vx | vy
+
+Only live particles are written, packed. `read_checkpoint()` maps the file
+copy-on-write and returns numpy views into the mapping, so restoring even a
+large world costs no read or copy up front: pages come in as the physics
+first touches them, and writes stay private to the process.
+"""
+
+import asyncio
+import json
+import mmap
+import os
+import struct
+from datetime import datetime, timezone
+
+import numpy as np
+
+from internal.logging import get_logger
+from simulation.state import EngineCheckpoint
+
+MAGIC = b"PCKP"
+VERSION = 1
+HEADER = struct.Struct("<4sIIQdQQQ12x")  # 64 bytes
+SUFFIX = ".ckpt"
+
+
+def _pad(n):
+    return -n % 8
+
+
+class CheckpointError(Exception):
+    """Malformed or incompatible checkpoint file."""
+
+
+def write_checkpoint(path, checkpoint):
+    """Write `checkpoint` to `path` atomically (temp file, then rename). Blocking."""
+    path = str(path)
+    dir_path = os.path.dirname(path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    meta = json.dumps({"rng": checkpoint.rng_state, "params": checkpoint.params,
+                       "forces": checkpoint.forces, "absorbed": checkpoint.absorbed}).encode()
+    ids = np.ascontiguousarray(checkpoint.ids, dtype="<i8")
+    data = np.ascontiguousarray(checkpoint.data, dtype="<f8")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, HEADER.size, checkpoint.tick, checkpoint.sim_time,
+                               len(ids), checkpoint.next_id, len(meta)))
+        file.write(meta + b"\0" * _pad(len(meta)))
+        file.write(ids.data)
+        file.write(data.data)
+    os.replace(tmp, path)
+    return path
+
+
+def read_checkpoint(path):
+    """Map a checkpoint file. The arrays are writable, copy-on-write views of the mapping."""
+    path = str(path)
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size < HEADER.size:
+            raise CheckpointError(f"truncated header: {path}")
+        mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+    magic, version, header_size, tick, sim_time, count, next_id, meta_len = HEADER.unpack_from(mm)
+    if magic != MAGIC or version != VERSION:
+        raise CheckpointError(f"not a v{VERSION} checkpoint: {path}")
+    offset = header_size + meta_len + _pad(meta_len)
+    if size < offset + count * 5 * 8:
+        raise CheckpointError(f"truncated checkpoint: {path}")
+    meta = json.loads(mm[header_size:header_size + meta_len])
+    ids = np.frombuffer(mm, dtype="<i8", count=count, offset=offset)
+    data = np.frombuffer(mm, dtype="<f8", count=4 * count, offset=offset + count * 8).reshape(4, count)
+    return EngineCheckpoint(tick, sim_time, next_id, ids, data, meta["rng"], meta["params"],
+                            meta.get("forces"), meta.get("absorbed", 0))
+
+
+def list_checkpoints(directory):
+    """Checkpoint files in `directory`, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(SUFFIX))
+
+
+class Checkpointer:
+    """Saves engine checkpoints to `directory`, every `interval` seconds if it is > 0.
+
+    The engine state is captured at a tick boundary, which copies the live
+    arrays once, and written on a worker thread, so the tick never waits for
+    the disk. Only the newest `keep` files are kept.
+    """
+
+    def __init__(self, engine, directory, interval=0.0, keep=3):
+        self.engine = engine
+        self.directory = str(directory)
+        self.interval = interval
+        self.keep = keep
+        self.path = None
+        self.saved = 0
+        self.errors = 0
+        self.last_capture_s = 0.0
+        self.last_write_s = 0.0
+        self._task = None
+        self._stop = asyncio.Event()
+        self._log = get_logger()
+
+    async def start(self):
+        if self._task or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+    async def _run(self):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.interval)
+                break
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.save()
+            except Exception as exc:
+                self._log.error("checkpoint fail", err=exc, dir=self.directory)
+
+    async def save(self):
+        """Capture the engine now and write it out. Returns the file path."""
+        started = asyncio.get_running_loop().time()
+        checkpoint = await self.engine.checkpoint()
+        captured = asyncio.get_running_loop().time()
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        path = os.path.join(self.directory, f"ckpt-{stamp}{SUFFIX}")
+        try:
+            await asyncio.to_thread(self._write, path, checkpoint)
+        except Exception:
+            self.errors += 1
+            raise
+        self.last_capture_s = captured - started
+        self.last_write_s = asyncio.get_running_loop().time() - captured
+        self.path = path
+        self.saved += 1
+        self._log.info("checkpoint tick=%d %s", checkpoint.tick, path)
+        return path
+
+    def _write(self, path, checkpoint):
+        write_checkpoint(path, checkpoint)
+        for old in list_checkpoints(self.directory)[:-self.keep] if self.keep > 0 else []:
+            os.remove(old)
+
+    def checkpoints(self):
+        return [os.path.basename(path) for path in list_checkpoints(self.directory)]
+
+    def resolve(self, name):
+        """Path of checkpoint `name`, confined to the checkpoint directory."""
+        name = os.path.basename(name)
+        if not name.endswith(SUFFIX):
+            name += SUFFIX
+        path = os.path.join(self.directory, name)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(name)
+        return path
+
+    async def restore(self, name):
+        """Restore the engine from checkpoint `name`. Returns the restored tick."""
+        checkpoint = await asyncio.to_thread(read_checkpoint, self.resolve(name))
+        await self.engine.restore(checkpoint)
+        self._log.info("restored tick=%d from %s", checkpoint.tick, name)
+        return checkpoint.tick
+
+    def get_stats(self):
+        return {
+            "path": self.path,
+            "saved": self.saved,
+            "errors": self.errors,
+            "last_capture_s": self.last_capture_s,
+            "last_write_s": self.last_write_s,
+        }
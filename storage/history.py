@@ -0,0 +1,223 @@
+"""Indexed queries over recorded trajectories."""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from storage.trajectory import TrajectoryReader, list_recordings
+
+INDEX_VERSION = 1
+
+
+class HistoryIndex:
+    """Per-particle time index and per-chunk spatial index for one recording.
+
+    Frames are grouped into chunks of `chunk_frames`. For each chunk the index
+    keeps the particle bounding box and a `grid` x `grid` occupancy map over
+    the world, so box queries skip chunks that cannot match. The particle
+    index maps an id to the (first frame, last frame, slot) runs where it
+    appears, so a track query reads one value per frame and nothing else.
+
+    Building reads the recording once; the spatial part is saved next to it
+    as `<path>.hidx.npz` and extended incrementally as the recording grows.
+    """
+
+    def __init__(self, path, chunk_frames=256, grid=16):
+        self.path = str(path)
+        self.chunk_frames = chunk_frames
+        self.grid = grid
+        self.reader = TrajectoryReader(path)
+        self.frame_ids = np.empty(0, dtype=np.uint64)  # id table offset per frame
+        self.bounds = np.empty((0, 4), dtype=np.float32)  # x0, y0, x1, y1 per chunk
+        self.occupancy = np.empty((0, grid, grid), dtype=bool)
+        self.particles = {}
+        self._particles_frames = -1
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def sidecar(self):
+        return self.path + ".hidx.npz"
+
+    @property
+    def frames(self):
+        return len(self.frame_ids)
+
+    def _load(self):
+        try:
+            with np.load(self.sidecar) as saved:
+                if int(saved["version"]) != INDEX_VERSION or int(saved["chunk_frames"]) != self.chunk_frames \
+                        or int(saved["grid"]) != self.grid:
+                    return
+                self.frame_ids = saved["frame_ids"]
+                self.bounds = saved["bounds"]
+                self.occupancy = saved["occupancy"]
+        except (OSError, KeyError, ValueError):
+            pass
+
+    def _save(self):
+        tmp = self.path + ".hidx.tmp.npz"
+        np.savez(tmp, version=INDEX_VERSION, chunk_frames=self.chunk_frames, grid=self.grid,
+                 frame_ids=self.frame_ids, bounds=self.bounds, occupancy=self.occupancy)
+        os.replace(tmp, self.sidecar)
+
+    def update(self):
+        """Index frames appended since the last update. Blocking; call off the event loop."""
+        with self._lock:
+            self.reader.refresh()
+            total = len(self.reader)
+            if total < self.frames:
+                self.frame_ids = self.frame_ids[:0]  # recording was replaced
+                self.bounds, self.occupancy = self.bounds[:0], self.occupancy[:0]
+            if total > self.frames:
+                self._index_frames(self.frames, total)
+                # Re-index the last chunk, it may have been partial before
+                self._index_chunks(max(0, len(self.bounds) - 1))
+                self._save()
+            if self._particles_frames != self.frames:
+                self._index_particles()
+        return self
+
+    def _index_frames(self, start, stop):
+        ids = np.fromiter((self.reader.header_at(position)[3] for position in range(start, stop)),
+                          dtype=np.uint64, count=stop - start)
+        self.frame_ids = np.concatenate([self.frame_ids, ids])
+
+    def _index_chunks(self, first_chunk):
+        chunks = -(-self.frames // self.chunk_frames)
+        bounds = np.empty((chunks - first_chunk, 4), dtype=np.float32)
+        occupancy = np.zeros((chunks - first_chunk, self.grid, self.grid), dtype=bool)
+        width = self.reader.world_width or None
+        height = self.reader.world_height or None
+        for row, chunk in enumerate(range(first_chunk, chunks)):
+            xs, ys = [], []
+            for position in range(chunk * self.chunk_frames, min(self.frames, (chunk + 1) * self.chunk_frames)):
+                frame = self.reader.frame_at(position)
+                xs.append(frame.x)
+                ys.append(frame.y)
+            x, y = np.concatenate(xs), np.concatenate(ys)
+            if not len(x):
+                bounds[row] = (np.inf, np.inf, -np.inf, -np.inf)
+                continue
+            bounds[row] = (x.min(), y.min(), x.max(), y.max())
+            occupancy[row][self._cell(y, height), self._cell(x, width)] = True
+        self.bounds = np.concatenate([self.bounds[:first_chunk], bounds])
+        self.occupancy = np.concatenate([self.occupancy[:first_chunk], occupancy])
+
+    def _cell(self, values, extent):
+        if not extent:
+            return np.zeros(len(values), dtype=np.intp)
+        return np.clip((values * (self.grid / extent)).astype(np.intp), 0, self.grid - 1)
+
+    def _index_particles(self):
+        particles = {}
+        if self.frames:
+            # Runs of frames sharing one id table
+            changes = np.flatnonzero(np.diff(self.frame_ids)) + 1
+            starts = np.concatenate([[0], changes])
+            stops = np.concatenate([changes, [self.frames]]) - 1
+            for first, last in zip(starts.tolist(), stops.tolist()):
+                ids = self.reader.ids_at(int(self.frame_ids[first]))
+                for slot, pid in enumerate(ids):
+                    runs = particles.setdefault(pid, [])
+                    if runs and runs[-1][1] == first - 1 and runs[-1][2] == slot:
+                        runs[-1][1] = last
+                    else:
+                        runs.append([first, last, slot])
+        self.particles = particles
+        self._particles_frames = self.frames
+
+    def _positions(self, start_tick, end_tick):
+        ticks = self.reader.ticks[:self.frames]
+        first = int(np.searchsorted(ticks, start_tick, side="left"))
+        last = int(np.searchsorted(ticks, end_tick, side="right")) - 1
+        return first, last
+
+    def track(self, pid, start_tick=0, end_tick=2 ** 63 - 1):
+        """Yield [tick, x, y, vx, vy] for one particle over a tick range."""
+        first, last = self._positions(start_tick, end_tick)
+        for run_first, run_last, slot in self.particles.get(pid, ()):
+            for position in range(max(first, run_first), min(last, run_last) + 1):
+                frame = self.reader.frame_at(position)
+                yield [frame.tick, float(frame.x[slot]), float(frame.y[slot]),
+                       float(frame.vx[slot]), float(frame.vy[slot])]
+
+    def box(self, x0, y0, x1, y1, start_tick=0, end_tick=2 ** 63 - 1):
+        """Yield (tick, rows) for each frame with particles inside the box.
+
+        Chunks whose bounding box or occupancy grid cannot intersect the box are skipped.
+        """
+        first, last = self._positions(start_tick, end_tick)
+        if first > last:
+            return
+        width, height = self.reader.world_width or None, self.reader.world_height or None
+        cx0, cx1 = self._cell(np.array([x0, x1]), width)
+        cy0, cy1 = self._cell(np.array([y0, y1]), height)
+        for chunk in range(first // self.chunk_frames, last // self.chunk_frames + 1):
+            bx0, by0, bx1, by1 = self.bounds[chunk]
+            if bx0 > x1 or bx1 < x0 or by0 > y1 or by1 < y0:
+                continue
+            if not self.occupancy[chunk, cy0:cy1 + 1, cx0:cx1 + 1].any():
+                continue
+            chunk_first = max(first, chunk * self.chunk_frames)
+            chunk_last = min(last, (chunk + 1) * self.chunk_frames - 1)
+            for position in range(chunk_first, chunk_last + 1):
+                frame = self.reader.frame_at(position)
+                hits = np.flatnonzero((frame.x >= x0) & (frame.x <= x1) & (frame.y >= y0) & (frame.y <= y1))
+                if len(hits):
+                    yield frame.tick, [[frame.ids[i], float(frame.x[i]), float(frame.y[i]),
+                                        float(frame.vx[i]), float(frame.vy[i])] for i in hits.tolist()]
+
+    def release(self):
+        """Drop the lease taken by `HistoryService.get()`."""
+        self.reader.unpin()
+
+    def close(self):
+        self.reader.close()
+
+
+class HistoryService:
+    """Keeps HistoryIndex instances for recent recordings in a small LRU cache.
+
+    `get()` hands out a leased index; callers `release()` it when their query
+    is done. An index evicted while leased stays mapped until then.
+    """
+
+    def __init__(self, directory, max_open=8, chunk_frames=256, grid=16):
+        self.directory = directory
+        self.max_open = max_open
+        self.chunk_frames = chunk_frames
+        self.grid = grid
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def recordings(self):
+        return [os.path.basename(path) for path in list_recordings(self.directory)]
+
+    def get(self, name):
+        """Up-to-date, leased index for recording `name`. Blocking; call off the event loop."""
+        name = os.path.basename(name)
+        path = os.path.join(self.directory, name)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(name)
+        with self._lock:
+            index = self._indexes.pop(path, None)
+            if index is None:
+                index = HistoryIndex(path, self.chunk_frames, self.grid)
+            self._indexes[path] = index
+            index.reader.pin()
+            while len(self._indexes) > self.max_open:
+                self._indexes.popitem(last=False)[1].close()
+        try:
+            return index.update()
+        except Exception:
+            index.release()
+            raise
+
+    def close(self):
+        with self._lock:
+            for index in self._indexes.values():
+                index.close()
+            self._indexes.clear()
@@ -0,0 +1,262 @@
+"""Replay of recorded runs through an EventBus."""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+from communication.bus import STATE_TOPIC
+from internal.logging import get_logger
+from simulation.engine import EngineState
+from storage.trajectory import SUFFIX, TrajectoryReader, list_recordings
+
+MIN_SPEED = 0.25
+MAX_SPEED = 100.0
+
+
+class ReplaySource:
+    """Streams a recording onto a bus with the engine's interface.
+
+    Frames are read from the memory-mapped recording in chunks on a worker
+    thread, `read_ahead` frames ahead of playback, so only the window being
+    played is ever materialised. Past `max_fps` published frames per second
+    (high speeds), frames are skipped rather than flooding subscribers.
+    """
+
+    def __init__(self, bus, path, speed=1.0, read_ahead=64, max_fps=30):
+        self.bus = bus
+        self.path = str(path)
+        self.reader = TrajectoryReader(path)
+        self.read_ahead = read_ahead
+        self.max_fps = max_fps
+        self.speed = 1.0
+        self.tick = 0
+        self.sim_time = 0.0
+        self._state = EngineState.STOPPED
+        self._position = 0  # next frame to publish
+        self._ended = False  # replay_end already published for the current position
+        self._buffer = deque()
+        self._fetch = None
+        self._generation = 0
+        self._current = None
+        self._anchor = (0.0, 0.0)  # (wall clock, sim time) playback is measured from
+        self._task = None
+        self._stop = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._log = get_logger()
+        self.published = 0
+        self.set_speed(speed)
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def paused(self):
+        return self._state == EngineState.PAUSED
+
+    @property
+    def finished(self):
+        return self._position >= len(self.reader)
+
+    @property
+    def stride(self):
+        """Frames advanced per publish, so the publish rate stays under max_fps."""
+        interval = self.reader.tick_interval
+        if not interval or not self.max_fps:
+            return 1
+        return max(1, math.ceil(self.speed / (interval * self.max_fps)))
+
+    def set_speed(self, speed):
+        self.speed = min(MAX_SPEED, max(MIN_SPEED, float(speed)))
+        self._reanchor()
+        self._invalidate()
+
+    async def get_snapshot(self):
+        if self._current is None and len(self.reader):
+            frames = await asyncio.to_thread(self._read, min(self._position, len(self.reader) - 1), 1, 1)
+            self._current = frames[0]
+        return self._current
+
+    async def start(self):
+        if self._task:
+            return
+        self._stop.clear()
+        self._state = EngineState.RUNNING
+        self._reanchor()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._task:
+            await self._task
+            self._task = None
+        self._state = EngineState.STOPPED
+        self.reader.close()
+
+    async def pause(self):
+        self._state = EngineState.PAUSED
+
+    async def resume(self):
+        self._state = EngineState.RUNNING
+        self._reanchor()
+        self._wake.set()
+
+    async def seek(self, tick):
+        """Jump to the first recorded frame at or after `tick`."""
+        self._position = min(self.reader.find(tick), len(self.reader))
+        self._ended = False
+        self._invalidate()
+        # Playback clock restarts from the target frame, not from where we were
+        self._current = None
+        self._reanchor()
+        self._wake.set()
+
+    def _reanchor(self):
+        if self._current is not None:
+            sim_time = self._current.time
+        elif not self.finished:
+            sim_time = self.reader.frame_at(self._position).time
+        else:
+            sim_time = self.sim_time
+        self._anchor = (time.perf_counter(), sim_time)
+
+    def _invalidate(self):
+        self._generation += 1
+        self._buffer.clear()
+
+    def _read(self, position, count, stride):
+        """Materialise up to `count` frames from `position`. Runs on a worker thread."""
+        stop = min(len(self.reader), position + count * stride)
+        return [self.reader.frame_at(i).to_snapshot() for i in range(position, stop, stride)]
+
+    def _prefetch(self):
+        if self._fetch is not None or len(self._buffer) >= self.read_ahead // 2:
+            return
+        stride = self.stride
+        start = self._position + len(self._buffer) * stride
+        if start >= len(self.reader):
+            return
+        generation = self._generation
+
+        async def fetch():
+            try:
+                frames = await asyncio.to_thread(self._read, start, self.read_ahead, stride)
+                if generation == self._generation:
+                    self._buffer.extend(frames)
+            finally:
+                self._fetch = None
+
+        self._fetch = asyncio.create_task(fetch())
+
+    async def _next(self):
+        while not self._buffer and not self.finished:
+            self._prefetch()
+            if self._fetch is None:
+                return None
+            await self._fetch
+        if not self._buffer:
+            return None
+        snapshot = self._buffer.popleft()
+        self._position += self.stride
+        self._prefetch()
+        return snapshot
+
+    async def _park(self, timeout=None):
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _loop(self):
+        self._log.info("replay start %s frames=%d", os.path.basename(self.path), len(self.reader))
+        while not self._stop.is_set():
+            if self.finished and not self._ended:
+                self._ended = True
+                await self.bus.publish({"kind": "replay_end", "tick": self.tick})
+            if self._state == EngineState.PAUSED or self.finished:
+                await self._park()
+                continue
+
+            generation = self._generation
+            try:
+                snapshot = await self._next()
+            except Exception as exc:
+                self._log.error("replay read fail", err=exc)
+                await self._park(1.0)
+                continue
+            if generation != self._generation:
+                continue  # seek or speed change while reading
+            if snapshot is None:
+                continue  # reached the end; announced at the top of the loop
+
+            anchor_wall, anchor_sim = self._anchor
+            delay = anchor_wall + (snapshot.time - anchor_sim) / self.speed - time.perf_counter()
+            if delay > 0:
+                await self._park(delay)
+                if generation != self._generation or self._stop.is_set():
+                    continue  # seek or speed change while waiting
+            if self._state != EngineState.RUNNING:
+                continue
+
+            self._current = snapshot
+            self.tick, self.sim_time = snapshot.tick, snapshot.time
+            await self.bus.publish(snapshot, topic=STATE_TOPIC)
+            self.published += 1
+
+        if self._fetch:
+            await asyncio.gather(self._fetch, return_exceptions=True)
+        self._log.info("replay stop tick=%d", self.tick)
+
+    def get_status(self):
+        return {
+            "recording": os.path.basename(self.path),
+            "state": self._state,
+            "speed": self.speed,
+            "tick": self.tick,
+            "sim_time_s": self.sim_time,
+            "frames": len(self.reader),
+            "position": self._position,
+            "finished": self.finished,
+            "published": self.published,
+        }
+
+
+class ReplayManager:
+    """Owns the replay bus and at most one active ReplaySource."""
+
+    def __init__(self, bus, directory):
+        self.bus = bus
+        self.directory = directory
+        self.source = None
+
+    def recordings(self):
+        return [os.path.basename(path) for path in list_recordings(self.directory)]
+
+    def resolve(self, name):
+        """Path of recording `name`, confined to the recordings directory."""
+        name = os.path.basename(name)
+        if not name.endswith(SUFFIX):
+            name += SUFFIX
+        path = os.path.join(self.directory, name)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(name)
+        return path
+
+    async def load(self, name, speed=1.0):
+        path = self.resolve(name)
+        await self.unload()
+        self.source = ReplaySource(self.bus, path, speed=speed)
+        await self.source.start()
+        return self.source
+
+    async def unload(self):
+        if self.source:
+            source, self.source = self.source, None
+            await source.stop()
+            await self.bus.publish({"kind": "replay_stopped", "tick": source.tick})
+            # Stream clients of this replay have nothing left to wait for
+            await self.bus.evict(self.bus.subscriber_count)
@@ -0,0 +1,393 @@
+"""Append-only columnar trajectory recordings.
+
+Layout of `<path>` (little-endian):
+
+    header   64 bytes   magic, version, created_us, world size, tick_interval
+    blocks   ...        ID tables and frames, 8-byte aligned
+
+    IDS block: tag, count, payload_len, newline-joined particle ids
+    FRM block: tag, count, tick, sim_time, ids_offset, then float32 columns x | y | vx | vy
+
+An ID table is only written when the particle set changes; frames point at
+the table they use. `<path>.idx` is the per-tick index, one (tick, offset)
+entry per frame, appended after the frame itself is flushed so it never
+points past the data. The reader memory-maps both files and hands out numpy
+views straight into the mapping.
+"""
+
+import asyncio
+import mmap
+import os
+import struct
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from internal.logging import get_logger
+from simulation.state import ParticleState, StateSnapshot
+from utils.timestamp import now_micros
+
+MAGIC = b"PTRJ"
+VERSION = 1
+HEADER = struct.Struct("<4sIIQddd20x")  # 64 bytes
+IDS_HEAD = struct.Struct("<4sII")
+FRAME_HEAD = struct.Struct("<4sIQdQ")
+INDEX_DTYPE = np.dtype([("tick", "<u8"), ("offset", "<u8")])
+COLUMNS = ("x", "y", "vx", "vy")
+SUFFIX = ".trj"
+
+_IDS_TAG = b"IDS\0"
+_FRAME_TAG = b"FRM\0"
+
+
+def _pad(n):
+    return -n % 8
+
+
+class TrajectoryError(Exception):
+    """Malformed or incompatible trajectory file."""
+
+
+class TrajectoryWriter:
+    """Appends frames to a trajectory file. Blocking; call off the event loop."""
+
+    def __init__(self, path, world_width=0.0, world_height=0.0, tick_interval=0.0):
+        self.path = str(path)
+        dir_path = os.path.dirname(self.path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        self._data = open(self.path, "ab")
+        self._index = open(self.path + ".idx", "ab")
+        if self._data.tell() == 0:
+            self._data.write(HEADER.pack(MAGIC, VERSION, HEADER.size, now_micros(),
+                                         world_width, world_height, tick_interval))
+        self._offset = self._data.tell()
+        self._ids = None
+        self._ids_offset = 0
+        self.frames = 0
+
+    def append(self, snapshot):
+        self.append_many([snapshot])
+
+    def append_many(self, snapshots):
+        """Write frames, flush them, then publish their index entries."""
+        entries = [self._append_frame(snapshot) for snapshot in snapshots]
+        self._data.flush()
+        if entries:
+            self._index.write(np.array(entries, dtype=INDEX_DTYPE).tobytes())
+            self._index.flush()
+
+    def _append_frame(self, snapshot):
+        particles = snapshot.particles
+        count = len(particles)
+        ids = [p.id for p in particles]
+        if ids != self._ids:
+            self._write_ids(ids)
+
+        columns = np.empty((4, count), dtype=np.float32)
+        for row, name in enumerate(COLUMNS):
+            columns[row] = np.fromiter((getattr(p, name) for p in particles), dtype=np.float64, count=count)
+
+        frame_offset = self._offset
+        head = FRAME_HEAD.pack(_FRAME_TAG, count, snapshot.tick, snapshot.time, self._ids_offset)
+        body = columns.tobytes()
+        self._write(head + body + b"\0" * _pad(len(head) + len(body)))
+        self.frames += 1
+        return snapshot.tick, frame_offset
+
+    def _write_ids(self, ids):
+        payload = "\n".join(ids).encode()
+        self._ids_offset = self._offset
+        head = IDS_HEAD.pack(_IDS_TAG, len(ids), len(payload))
+        self._write(head + payload + b"\0" * _pad(len(head) + len(payload)))
+        self._ids = ids
+
+    def _write(self, data):
+        self._data.write(data)
+        self._offset += len(data)
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+
+class Frame:
+    """One recorded tick. Column attributes are zero-copy float32 views."""
+
+    __slots__ = ("tick", "time", "ids", "x", "y", "vx", "vy")
+
+    def __init__(self, tick, time, ids, x, y, vx, vy):
+        self.tick, self.time, self.ids = tick, time, ids
+        self.x, self.y, self.vx, self.vy = x, y, vx, vy
+
+    def __len__(self):
+        return len(self.ids)
+
+    def slice(self, start, stop):
+        return Frame(self.tick, self.time, self.ids[start:stop], self.x[start:stop],
+                     self.y[start:stop], self.vx[start:stop], self.vy[start:stop])
+
+    def to_snapshot(self):
+        particles = [ParticleState(pid, x, y, vx, vy) for pid, x, y, vx, vy in
+                     zip(self.ids, self.x.tolist(), self.y.tolist(), self.vx.tolist(), self.vy.tolist())]
+        return StateSnapshot(self.tick, self.time, particles)
+
+
+class TrajectoryReader:
+    """Random access to a trajectory file through a read-only memory map.
+
+    Threads streaming from the reader `pin()` it first. While it is pinned,
+    maps replaced by `refresh()` and a `close()` are deferred until the last
+    `unpin()`, so a query running on a worker thread never sees its mapping
+    disappear.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._data_mm = None
+        self._index_mm = None
+        self._stamp = None  # (size, mtime) of the data and index files when last mapped
+        self._pins = 0
+        self._retired = []
+        self._closing = False
+        self._pin_lock = threading.Lock()
+        self._ids_cache = {}
+        self.index = np.empty(0, dtype=INDEX_DTYPE)
+        with open(self.path, "rb") as file:
+            head = file.read(HEADER.size)
+        if len(head) < HEADER.size:
+            raise TrajectoryError(f"truncated header: {self.path}")
+        magic, version, _, self.created_us, self.world_width, self.world_height, self.tick_interval = \
+            HEADER.unpack(head)
+        if magic != MAGIC or version != VERSION:
+            raise TrajectoryError(f"not a v{VERSION} trajectory: {self.path}")
+        self.refresh()
+
+    def refresh(self):
+        """Re-map the files if they changed since the last call. Returns True if they did."""
+        stamp = (self._stat(self.path), self._stat(self.path + ".idx"))
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        replaced = [mm for mm in (self._data_mm, self._index_mm) if mm is not None]
+        # Index first: every entry in it refers to a frame already flushed to the data file
+        self._index_mm = self._map(self.path + ".idx")
+        self._data_mm = self._map(self.path)
+        if self._index_mm is None:
+            self.index = np.empty(0, dtype=INDEX_DTYPE)
+        else:
+            entries = len(self._index_mm) // INDEX_DTYPE.itemsize
+            self.index = np.frombuffer(self._index_mm, dtype=INDEX_DTYPE, count=entries)
+        with self._pin_lock:
+            self._retired.extend(replaced)
+            if not self._pins:
+                self._release()
+        return True
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def pin(self):
+        with self._pin_lock:
+            self._pins += 1
+
+    def unpin(self):
+        with self._pin_lock:
+            self._pins -= 1
+            if not self._pins:
+                self._release()
+
+    def _release(self):
+        """Close retired maps, and everything if a close was deferred. Called with _pin_lock held."""
+        maps, self._retired = self._retired, []
+        if self._closing:
+            self.index = np.empty(0, dtype=INDEX_DTYPE)
+            maps += [mm for mm in (self._data_mm, self._index_mm) if mm is not None]
+            self._data_mm = self._index_mm = None
+        for mm in maps:
+            try:
+                mm.close()
+            except BufferError:
+                pass  # frames still reference the mapping; it closes when they are collected
+
+    @staticmethod
+    def _map(path):
+        try:
+            with open(path, "rb") as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return None
+                return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def ticks(self):
+        return self.index["tick"]
+
+    def find(self, tick):
+        """Position of the first frame with tick >= `tick`."""
+        return int(np.searchsorted(self.index["tick"], tick))
+
+    def frame(self, tick):
+        """Frame recorded at exactly `tick`, or None."""
+        position = self.find(tick)
+        if position < len(self.index) and self.index["tick"][position] == tick:
+            return self.frame_at(position)
+        return None
+
+    def header_at(self, position):
+        """(count, tick, sim_time, ids_offset) of a frame, without touching its columns."""
+        offset = int(self.index["offset"][position])
+        tag, count, tick, sim_time, ids_offset = FRAME_HEAD.unpack_from(self._data_mm, offset)
+        if tag != _FRAME_TAG:
+            raise TrajectoryError(f"bad frame at offset {offset}")
+        return count, tick, sim_time, ids_offset
+
+    def frame_at(self, position):
+        count, tick, sim_time, ids_offset = self.header_at(position)
+        offset = int(self.index["offset"][position]) + FRAME_HEAD.size
+        columns = np.frombuffer(self._data_mm, dtype=np.float32, count=4 * count, offset=offset).reshape(4, count)
+        return Frame(tick, sim_time, self.ids_at(ids_offset), *columns)
+
+    def particles(self, tick, start=0, stop=None):
+        """Columns for particle slots [start, stop) at `tick`, without copying."""
+        frame = self.frame(tick)
+        return frame.slice(start, stop) if frame else None
+
+    def ids_at(self, offset):
+        ids = self._ids_cache.get(offset)
+        if ids is None:
+            tag, count, length = IDS_HEAD.unpack_from(self._data_mm, offset)
+            if tag != _IDS_TAG:
+                raise TrajectoryError(f"bad id table at offset {offset}")
+            start = offset + IDS_HEAD.size
+            ids = self._data_mm[start:start + length].decode().split("\n") if count else []
+            self._ids_cache[offset] = ids
+        return ids
+
+    def close(self):
+        """Unmap the files, or once the last pin is released if the reader is pinned."""
+        with self._pin_lock:
+            self._closing = True
+            if not self._pins:
+                self._release()
+
+
+def list_recordings(directory):
+    """Recording files in `directory`, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(SUFFIX))
+
+
+class TrajectoryRecorder:
+    """Bus subscriber that records every snapshot to trajectory files in `directory`.
+
+    Each run gets its own file; a tick going backwards (engine reset) starts a new one.
+    """
+
+    def __init__(self, bus, directory, world_width=0.0, world_height=0.0, tick_interval=0.0,
+                 queue_size=500, name="recorder"):
+        self.bus = bus
+        self.directory = str(directory)
+        self.name = name
+        self.path = None
+        self._queue_size = queue_size
+        self._world = (world_width, world_height, tick_interval)
+        self._writer = None
+        self._last_tick = -1
+        self._sub = None
+        self._task = None
+        self._stop = asyncio.Event()
+        self._log = get_logger()
+        self.recorded = 0
+
+    async def start(self):
+        if self._task:
+            return
+        self._sub = await self.bus.subscribe(self.name, max_queue_size=self._queue_size, priority=10)
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            await self._task
+            self._task = None
+        await self.bus.unsubscribe(self.name)
+        if self._writer:
+            await asyncio.to_thread(self._writer.close)
+            self._writer = None
+
+    def _drain(self, batch):
+        while True:
+            try:
+                item = self._sub.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return batch
+            if isinstance(item, StateSnapshot):
+                batch.append(item)
+
+    async def _record(self, batch):
+        if not batch:
+            return
+        try:
+            self.recorded += await asyncio.to_thread(self._write, batch)
+        except Exception as exc:
+            self._log.error("record fail", err=exc, path=self.path)
+
+    async def _run(self):
+        while not self._stop.is_set():
+            try:
+                item = await asyncio.wait_for(self._sub.queue.get(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            await self._record(self._drain([item] if isinstance(item, StateSnapshot) else []))
+        await self._record(self._drain([]))
+
+    def _write(self, batch):
+        """Append a batch, rolling to a new file on tick regression. Runs on a worker thread.
+
+        A frame repeating the last tick (a paused engine republishing it) is
+        skipped. Returns the number of frames written.
+        """
+        run = []
+        written = 0
+        for snapshot in batch:
+            if self._writer is not None and snapshot.tick == self._last_tick:
+                continue
+            if self._writer is None or snapshot.tick < self._last_tick:
+                if run:
+                    self._writer.append_many(run)
+                    run = []
+                self._open_run()
+            run.append(snapshot)
+            written += 1
+            self._last_tick = snapshot.tick
+        if run:
+            self._writer.append_many(run)
+        return written
+
+    def _open_run(self):
+        if self._writer:
+            self._writer.close()
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        self.path = os.path.join(self.directory, f"run-{stamp}{SUFFIX}")
+        self._writer = TrajectoryWriter(self.path, *self._world)
+        self._log.info("recording to %s", self.path)
+
+    def get_stats(self):
+        return {
+            "path": self.path,
+            "recorded": self.recorded,
+            "dropped": self._sub.dropped if self._sub else 0,
+        }
@@ -1,7 +1,11 @@
 """Unit tests for EventBus."""
 
 import asyncio
+from collections import deque
+from types import SimpleNamespace
+
 import pytest
+from communication.admission import AdmissionController, LoadShedder, ShedLevel
 from communication.bus import EventBus
 
 
@@ -30,6 +34,19 @@ class TestEventBus:
         sub = await bus.subscribe("test-client", max_queue_size=50)
         assert sub.queue.maxsize == 50
 
+    @pytest.mark.asyncio
+    async def test_wants_follows_subscriber_topics(self):
+        """wants() reports whether any subscriber would receive a topic."""
+        bus = EventBus()
+        assert not bus.wants("state")
+        await bus.subscribe("events", topics={""})
+        assert bus.wants("")
+        assert not bus.wants("state")
+        await bus.subscribe("ui")
+        assert bus.wants("state")
+        await bus.unsubscribe("ui")
+        assert not bus.wants("state")
+
     @pytest.mark.asyncio
     async def test_unsubscribe(self):
         """Subscriber is removed from bus."""
@@ -122,3 +139,133 @@ class TestEventBus:
         assert info[0]["name"] == "client-1"
         assert "received" in info[0]
         assert "dropped" in info[0]
+
+    @pytest.mark.asyncio
+    async def test_evict_lowest_priority_newest_first(self):
+        """Eviction removes low-priority subscribers and marks them closed."""
+        bus = EventBus(queue_size=10)
+        logger_sub = await bus.subscribe("logger", priority=10)
+        old = await bus.subscribe("ui-old")
+        new = await bus.subscribe("ui-new")
+        new.created_at = old.created_at + 1
+
+        evicted = await bus.evict(1)
+
+        assert evicted == ["ui-new"]
+        assert new.closed is True
+        assert old.closed is False
+        assert "logger" in bus._subscribers
+        assert not logger_sub.closed
+
+    @pytest.mark.asyncio
+    async def test_close_closes_every_subscriber(self):
+        """close() drops all subscribers and marks them closed."""
+        bus = EventBus(queue_size=10)
+        subs = [await bus.subscribe("logger", priority=10), await bus.subscribe("ui")]
+        assert await bus.close() == ["logger", "ui"]
+        assert all(sub.closed for sub in subs)
+        assert not bus.has_subscribers
+
+
+class TestAdmissionController:
+    """Tests for AdmissionController class."""
+
+    def test_global_cap(self):
+        """Clients beyond the global cap are rejected."""
+        admission = AdmissionController(max_clients=2, max_per_ip=5)
+        assert admission.try_acquire("10.0.0.1")
+        assert admission.try_acquire("10.0.0.2")
+        assert not admission.try_acquire("10.0.0.3")
+        assert admission.rejected == 1
+
+    def test_per_ip_cap(self):
+        """One IP cannot take more than its share."""
+        admission = AdmissionController(max_clients=10, max_per_ip=1)
+        assert admission.try_acquire("10.0.0.1")
+        assert not admission.try_acquire("10.0.0.1")
+        assert admission.try_acquire("10.0.0.2")
+
+    def test_release_frees_slot(self):
+        """Released slots can be reused."""
+        admission = AdmissionController(max_clients=1, max_per_ip=1)
+        assert admission.try_acquire("10.0.0.1")
+        admission.release("10.0.0.1")
+        assert admission.active == 0
+        assert admission.try_acquire("10.0.0.1")
+
+
+class TestLoadShedder:
+    """Tests for staged load shedding."""
+
+    def _engine(self, overrun=0.0):
+        return SimpleNamespace(tick_overrun=overrun, config=SimpleNamespace(tick_interval=0.1))
+
+    @pytest.mark.asyncio
+    async def test_escalates_in_stages(self):
+        """Overload lowers the stream rate first, then sheds subscribers."""
+        bus = EventBus(queue_size=10)
+        await bus.subscribe("ui-1")
+        shedder = LoadShedder(bus, self._engine(), lag_threshold=0.05, reduced_stride=3)
+
+        await shedder.sample(0.2)
+        assert shedder.level == ShedLevel.REDUCED
+        assert shedder.stream_stride == 3
+        assert shedder.accepting
+
+        await shedder.sample(0.2)
+        assert shedder.level == ShedLevel.SHEDDING
+        assert not shedder.accepting
+
+        await shedder.sample(0.2)
+        assert shedder.shed_total == 1
+        assert "ui-1" not in bus._subscribers
+
+    def test_reads_lag_from_loop_monitor(self):
+        """Loop lag comes from the monitor's samples since the previous read."""
+        monitor = SimpleNamespace(samples=3, recent=deque([0.01, 0.3, 0.02]), last_lag=0.02)
+        shedder = LoadShedder(EventBus(queue_size=10), self._engine(), loop_monitor=monitor)
+        assert shedder._loop_lag() == 0.3
+        monitor.recent.append(0.05)
+        monitor.samples, monitor.last_lag = 4, 0.05
+        assert shedder._loop_lag() == 0.05
+        assert shedder._loop_lag() == 0.05
+        assert LoadShedder(EventBus(queue_size=10), self._engine())._loop_lag() == 0.0
+
+    @pytest.mark.asyncio
+    async def test_tick_overrun_triggers_and_recovers(self):
+        """Tick overrun counts as overload; calm samples step back down."""
+        bus = EventBus(queue_size=10)
+        engine = self._engine(overrun=0.05)
+        shedder = LoadShedder(bus, engine, overrun_threshold=0.25, recover_after=2)
+
+        await shedder.sample(0.0)
+        assert shedder.level == ShedLevel.REDUCED
+
+        engine.tick_overrun = 0.0
+        await shedder.sample(0.0)
+        assert shedder.level == ShedLevel.REDUCED
+        await shedder.sample(0.0)
+        assert shedder.level == ShedLevel.NORMAL
+
+    @pytest.mark.asyncio
+    async def test_watches_every_world(self):
+        """Overrun and backlog in any world count, and shedding evicts from that world's bus."""
+        bus, lab_bus = EventBus(queue_size=10), EventBus(queue_size=10)
+        default = SimpleNamespace(bus=bus, tick_overrun=0.0, config=SimpleNamespace(tick_interval=0.1))
+        lab = SimpleNamespace(bus=lab_bus, tick_overrun=0.05, config=SimpleNamespace(tick_interval=0.1))
+        worlds = SimpleNamespace(engines=[default, lab])
+        shedder = LoadShedder(bus, default, overrun_threshold=0.25, worlds=worlds)
+        await shedder.sample(0.0)
+        assert shedder.tick_overrun == pytest.approx(0.5)
+        assert shedder.level == ShedLevel.REDUCED
+
+        lab.tick_overrun = 0.0
+        viewer = await lab_bus.subscribe("ui-lab", max_queue_size=2)
+        await lab_bus.publish("frame")
+        await lab_bus.publish("frame")
+        await shedder.sample(0.0)
+        assert shedder.backlog == 1.0
+        assert shedder.level == ShedLevel.SHEDDING
+        await shedder.sample(0.0)
+        assert viewer.closed
+        assert shedder.shed_total == 1
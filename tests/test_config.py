@@ -1,8 +1,13 @@
 """Unit tests for configuration loading."""
 
+import asyncio
+import json
+
 import pytest
 from config import (
     Config,
+    ConfigWatcher,
+    changed_fields,
     SimulationConfig,
     ServerConfig,
     LoggingConfig,
@@ -103,6 +108,14 @@ class TestConfig:
         assert config.simulation.particle_count == 5
         assert config.server.port == 8080  # Default
 
+    def test_from_dict_worlds(self):
+        """The worlds section holds per-world simulation overrides."""
+        data = {"worlds": {"park_after": 5, "configs": {"lab": {"particle_count": 3}}}}
+        config = Config.from_dict(data)
+        assert config.worlds.park_after == 5
+        assert config.worlds.limit == 16
+        assert config.worlds.configs == {"lab": {"particle_count": 3}}
+
 
 class TestLoadConfig:
     """Tests for load_config function."""
@@ -124,3 +137,63 @@ class TestLoadConfig:
         config = load_config(tmp_path / "nonexistent.json")
         assert isinstance(config, Config)
         assert config.simulation.tick_interval == 0.5  # Default
+
+
+class TestConfigWatcher:
+    """Tests for ConfigWatcher class."""
+
+    def _write(self, path, **simulation):
+        path.write_text(json.dumps({"simulation": simulation}))
+
+    def test_poll_skips_unchanged_file(self, tmp_path):
+        """poll parses only when mtime or size changed."""
+        path = tmp_path / "config.json"
+        self._write(path, particle_count=5)
+        watcher = ConfigWatcher(path)
+        assert watcher.poll() is None
+        assert watcher.skipped == 1
+
+        self._write(path, particle_count=500)
+        assert watcher.poll().simulation.particle_count == 500
+        assert watcher.poll() is None
+        assert watcher.poll(force=True).simulation.particle_count == 500
+        assert watcher.reloads == 2
+
+    def test_poll_rejects_invalid_file_once(self, tmp_path):
+        """A broken file raises ValueError once, then is skipped until it changes."""
+        path = tmp_path / "config.json"
+        self._write(path, particle_count=5)
+        watcher = ConfigWatcher(path)
+        path.write_text('{"simulation": {"gravity": 1}}')
+        with pytest.raises(ValueError):
+            watcher.poll()
+        assert watcher.poll() is None
+        assert watcher.errors == 1
+
+    def test_poll_reports_changed_fields(self, tmp_path):
+        """changes names every field that differs from the previous config."""
+        path = tmp_path / "config.json"
+        self._write(path, particle_count=5)
+        watcher = ConfigWatcher(path)
+        path.write_text(json.dumps({"simulation": {"particle_count": 6, "history_mb": 1},
+                                    "server": {"port": 9000}}))
+        watcher.poll()
+        assert watcher.changes == ["simulation.particle_count", "simulation.history_mb", "server.port"]
+        assert changed_fields(watcher.config, watcher.config) == []
+
+    @pytest.mark.asyncio
+    async def test_background_reload_calls_on_change(self, tmp_path):
+        """The watcher task hands changed configs to on_change."""
+        path = tmp_path / "config.json"
+        self._write(path, particle_count=5)
+        watcher = ConfigWatcher(path, interval=0.01)
+        seen = []
+
+        async def on_change(config):
+            seen.append(config.simulation.tick_interval)
+
+        await watcher.start(on_change)
+        self._write(path, particle_count=5, tick_interval=0.25)
+        await asyncio.sleep(0.1)
+        await watcher.stop()
+        assert seen == [0.25]
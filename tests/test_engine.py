@@ -1,10 +1,18 @@
 """Unit tests for SimulationEngine."""
 
 import asyncio
+import threading
+
+import numpy as np
 import pytest
 from communication.bus import EventBus
+from internal.profiler import SamplingProfiler
 from simulation.engine import SimulationEngine
+from simulation.registry import WorldRegistry
+from simulation.scheduler import TickScheduler
 from simulation.state import StateSnapshot
+from simulation.threaded import ThreadedEngine
+from storage.checkpoint import read_checkpoint, write_checkpoint
 from config import SimulationConfig
 
 
@@ -143,3 +151,545 @@ class TestSimulationEngine:
         # At least some particles should have moved
         moved = sum(1 for i, f in zip(initial_positions, final_positions) if i != f)
         assert moved > 0
+
+    @pytest.mark.asyncio
+    async def test_engine_keeps_frame_history(self):
+        """Ticks are recorded into the in-memory history ring."""
+        bus = EventBus(queue_size=10)
+        config = SimulationConfig(tick_interval=0.02, particle_count=3, history_mb=1)
+        engine = SimulationEngine(bus=bus, config=config)
+
+        await engine.start()
+        await asyncio.sleep(0.1)
+        await engine.stop()
+
+        assert len(engine.history) == engine.tick
+        assert engine.history.newest_tick == engine.tick
+        assert len(engine.history.get(1).particles) == 3
+
+    @pytest.mark.asyncio
+    async def test_engine_records_tick_phases(self):
+        """Each tick feeds the per-phase timing stats."""
+        bus = EventBus(queue_size=10)
+        config = SimulationConfig(tick_interval=0.02, particle_count=3)
+        engine = SimulationEngine(bus=bus, config=config)
+
+        await engine.start()
+        await asyncio.sleep(0.1)
+        await engine.stop()
+
+        summary = engine.tick_stats.summary()
+        assert summary["ticks"] >= engine.tick
+        assert summary["budget_utilisation"]["mean"] < 1.0
+        assert summary["instrumentation_overhead"] < 0.01
+
+    @pytest.mark.asyncio
+    async def test_engine_status_tracks_loop(self):
+        """The lock-free status view follows tick, state and publishes."""
+        bus = EventBus(queue_size=10)
+        config = SimulationConfig(tick_interval=0.02, particle_count=3)
+        engine = SimulationEngine(bus=bus, config=config)
+        assert engine.status.state == "stopped"
+        assert engine.status.particle_count == 3
+        await bus.subscribe("test")
+
+        await engine.start()
+        await asyncio.sleep(0.1)
+        await engine.pause()
+        assert engine.status.state == "paused"
+        assert engine.status.tick == engine.tick > 0
+        assert engine.status.last_publish_time is not None
+        assert engine.status.last_tick_duration > 0
+        await engine.stop()
+        assert engine.status.state == "stopped"
+
+    @pytest.mark.asyncio
+    async def test_engine_skips_snapshots_without_subscribers(self):
+        """No snapshot subscriber means no snapshot is built; the first consumer gets one built on demand."""
+        bus = EventBus(queue_size=10)
+        config = SimulationConfig(tick_interval=0.02, particle_count=3)
+        engine = SimulationEngine(bus=bus, config=config)
+
+        await bus.subscribe("events-only", topics={""})
+        await engine.start()
+        await asyncio.sleep(0.1)
+        assert engine._snapshot is None
+        assert engine.status.last_publish_time is None
+        first = await engine.get_snapshot()
+        assert await engine.get_snapshot() is first
+        await engine.stop()
+        assert len(engine.history) == engine.tick
+
+    @pytest.mark.asyncio
+    async def test_paused_engine_parks(self):
+        """A paused engine stops iterating until resumed."""
+        bus = EventBus(queue_size=10)
+        config = SimulationConfig(tick_interval=0.01, particle_count=3)
+        engine = SimulationEngine(bus=bus, config=config)
+
+        await engine.start()
+        await asyncio.sleep(0.05)
+        await engine.pause()
+        await asyncio.sleep(0.03)
+        iterations = engine.tick_stats.count
+        await asyncio.sleep(0.1)
+        assert engine.tick_stats.count == iterations
+
+        tick = engine.tick
+        await engine.resume()
+        await asyncio.sleep(0.05)
+        assert engine.tick > tick
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_reset_while_paused_publishes(self):
+        """Resetting a paused engine still publishes the reset frame."""
+        bus = EventBus(queue_size=10)
+        config = SimulationConfig(tick_interval=0.01, particle_count=3)
+        engine = SimulationEngine(bus=bus, config=config)
+        sub = await bus.subscribe("test")
+
+        await engine.start()
+        await asyncio.sleep(0.05)
+        await engine.pause()
+        await asyncio.sleep(0.03)
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        engine.reset()
+        msg = await asyncio.wait_for(sub.queue.get(), timeout=1.0)
+        await engine.stop()
+        assert msg.tick == 0
+
+    @pytest.mark.asyncio
+    async def test_commands_apply_together_at_tick_boundary(self):
+        """A burst of commands resolves in one batch, after it took effect."""
+        bus = EventBus(queue_size=10)
+        config = SimulationConfig(tick_interval=0.02, particle_count=3)
+        engine = SimulationEngine(bus=bus, config=config)
+
+        await engine.start()
+        await asyncio.sleep(0.05)
+        batches = engine.commands.batches
+        futures = [engine.submit("spawn", count=2), engine.submit("pause"),
+                   engine.submit("params", tick_interval=0.01), engine.submit("spawn", count=1)]
+        results = await asyncio.gather(*futures)
+        assert engine.commands.batches == batches + 1
+        assert len(engine.particles) == 6
+        assert results[0]["ids"] == ["p03", "p04"]
+        assert results[3]["ids"] == ["p05"]
+        assert all(result["state"] == "paused" for result in results)
+        assert engine.config.tick_interval == 0.01
+
+        result = await engine.submit("reset")
+        assert result["tick"] == 0
+        assert len(engine.particles) == 3
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_commands_wake_paused_engine(self):
+        """Commands are applied promptly even while the loop is parked."""
+        bus = EventBus(queue_size=10)
+        config = SimulationConfig(tick_interval=0.02, particle_count=3)
+        engine = SimulationEngine(bus=bus, config=config)
+
+        await engine.start()
+        await engine.pause()
+        await asyncio.sleep(0.05)
+        result = await asyncio.wait_for(engine.submit("spawn", count=4), timeout=1.0)
+        assert len(result["ids"]) == 4
+        assert engine.status.particle_count == 7
+        await engine.stop()
+
+    def test_invalid_command_raises(self):
+        """Invalid commands fail at submit time."""
+        async def submit():
+            engine = SimulationEngine(bus=EventBus(), config=SimulationConfig(particle_count=1))
+            engine.submit("params", nope=1)
+        with pytest.raises(ValueError):
+            asyncio.run(submit())
+
+    @pytest.mark.asyncio
+    async def test_despawn_and_compaction(self):
+        """Despawned particles disappear from snapshots and holes are compacted away."""
+        bus = EventBus(queue_size=10)
+        config = SimulationConfig(tick_interval=0.01, particle_count=100)
+        engine = SimulationEngine(bus=bus, config=config)
+
+        await engine.start()
+        result = await engine.submit("despawn", ids=[f"p{i:02d}" for i in range(0, 100, 2)])
+        assert len(result["ids"]) == 50
+        snapshot = await engine.get_snapshot()
+        assert len(snapshot.particles) == 50
+        assert "p00" not in {p.id for p in snapshot.particles}
+        await asyncio.sleep(0.05)
+        assert engine.store.holes == 0
+        assert sorted(p.id for p in engine.particles) == [f"p{i:02d}" for i in range(1, 100, 2)]
+
+        result = await engine.submit("spawn", particles=[[1, 2, 3, 4]])
+        assert result["ids"] == ["p100"]
+        result = await engine.submit("despawn", count=10)
+        assert engine.status.particle_count == 41
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_store_shrinks_after_mass_despawn(self):
+        """The loop keeps compacting until a mostly empty store gives capacity back."""
+        bus = EventBus(queue_size=10)
+        config = SimulationConfig(tick_interval=0.005, particle_count=10_000)
+        engine = SimulationEngine(bus=bus, config=config)
+
+        await engine.start()
+        await engine.submit("despawn", count=9_900)
+        await asyncio.sleep(0.1)
+        await engine.stop()
+        assert engine.store.count == 100
+        assert engine.store.capacity <= 512
+
+    @pytest.mark.asyncio
+    async def test_params_resize_world_and_population_live(self):
+        """Params apply while running: population resizes in place and particles stay in bounds."""
+        bus = EventBus(queue_size=10)
+        config = SimulationConfig(tick_interval=0.01, particle_count=10)
+        engine = SimulationEngine(bus=bus, config=config)
+
+        await engine.start()
+        await engine.submit("params", particle_count=15)
+        ids = {p.id for p in engine.particles}
+        assert len(ids) == 15
+        assert {f"p{i:02d}" for i in range(10)} <= ids
+
+        await engine.submit("params", particle_count=4, world_width=5, world_height=5)
+        particles = engine.particles
+        assert sorted(p.id for p in particles) == ["p00", "p01", "p02", "p03"]
+        assert all(0 <= p.x <= 5 and 0 <= p.y <= 5 for p in particles)
+        assert engine.tick > 0
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_spawn_and_reset_use_initializer(self):
+        """Resets and spawns both come from config.initializer."""
+        bus = EventBus(queue_size=10)
+        config = SimulationConfig(particle_count=9, initializer="lattice")
+        engine = SimulationEngine(bus=bus, config=config)
+        result = await engine.submit("spawn", count=4)
+        assert len(result["ids"]) == 4
+        assert not engine.store.columns()[2:].any()
+
+    @pytest.mark.asyncio
+    async def test_large_reset_is_built_off_the_loop(self):
+        """A large reset builds on a worker thread while ticks go on, restarting if settings change."""
+        bus = EventBus(queue_size=10)
+        config = SimulationConfig(tick_interval=0.01, particle_count=100)
+        engine = SimulationEngine(bus=bus, config=config)
+        engine.offload_reset = 50
+        gate, builds = threading.Event(), []
+
+        def build(rng, count, *args):
+            builds.append(count)
+            gate.wait(5)
+            return SimulationEngine._new_store(rng, count, *args)
+
+        engine._new_store = build
+        await engine.start()
+        reset = engine.submit("reset")
+        await asyncio.sleep(0.05)
+        assert builds == [100] and not reset.done()
+        tick = engine.tick
+        assert tick > 0
+
+        params = engine.submit("params", particle_count=120)
+        await asyncio.sleep(0.05)
+        assert builds == [100, 120]
+        gate.set()
+        await reset
+        await params
+        assert engine.store.count == 120
+        assert engine.tick < tick + 5
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_failed_offloaded_reset_reaches_caller(self):
+        """A reset build failing on the worker thread fails the caller's future and keeps the old store."""
+        bus = EventBus(queue_size=10)
+        config = SimulationConfig(tick_interval=0.01, particle_count=100)
+        engine = SimulationEngine(bus=bus, config=config)
+        engine.offload_reset = 50
+        store = engine.store
+
+        await engine.start()
+        engine.config.initializer = "spiral"
+        with pytest.raises(ValueError):
+            await engine.submit("reset")
+        assert engine.store is store
+        assert engine.state == "running"
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_seed_makes_runs_repeatable(self):
+        """Two engines with the same seed start and evolve identically."""
+        engines = [SimulationEngine(bus=EventBus(queue_size=10), config=SimulationConfig(particle_count=50, seed=3))
+                   for _ in range(2)]
+        for engine in engines:
+            await engine.submit("despawn", count=10)
+            await engine.submit("spawn", count=5)
+            engine._step(0.1)
+        np.testing.assert_array_equal(engines[0].store.columns(), engines[1].store.columns())
+        assert [p.id for p in engines[0].particles] == [p.id for p in engines[1].particles]
+
+    @pytest.mark.asyncio
+    async def test_checkpoint_restore_resumes_exactly(self, tmp_path):
+        """A restored engine continues exactly as the original would have, force fields included."""
+        config = SimulationConfig(particle_count=40, seed=5, tick_interval=0.1,
+                                  forces=[{"name": "down", "type": "gravity", "y": 9.8},
+                                          {"name": "sun", "type": "attractor", "x": 50, "y": 30}])
+        engine = SimulationEngine(bus=EventBus(queue_size=10), config=config)
+        await engine.submit("despawn", count=7)
+        await engine.submit("force", name="down", enabled=False)
+        await engine.submit("force", name="sun", params={"strength": 300.0})
+        engine.tick, engine.sim_time, engine.absorbed = 12, 1.2, 4
+        path = write_checkpoint(tmp_path / "a.ckpt", await engine.checkpoint())
+
+        other = SimulationEngine(bus=EventBus(queue_size=10),
+                                 config=SimulationConfig(particle_count=3, world_width=10, tick_interval=1.0))
+        await other.restore(read_checkpoint(path))
+        assert (other.tick, other.sim_time, other.config.tick_interval) == (12, 1.2, 0.1)
+        assert other.world.width == engine.world.width
+        assert other.forces.to_list() == engine.forces.to_list()
+        assert other.absorbed == 4
+        for each in (engine, other):
+            await each.submit("despawn", count=3)
+            await each.submit("spawn", count=2)
+            each._step(0.1)
+        assert [p.id for p in other.particles] == [p.id for p in engine.particles]
+        np.testing.assert_array_equal(other.store.columns(), engine.store.columns())
+
+    @pytest.mark.asyncio
+    async def test_spawn_dropped_by_reset_in_same_tick(self):
+        """A spawn and despawn coalesced with a later reset resolve as dropped, with no ids."""
+        engine = SimulationEngine(bus=EventBus(queue_size=10),
+                                  config=SimulationConfig(tick_interval=0.2, particle_count=3))
+        await engine.start()
+        await asyncio.sleep(0.01)  # past the first tick
+        spawn = engine.submit("spawn", count=2)
+        despawn = engine.submit("despawn", count=1)
+        reset = engine.submit("reset")
+        results = await asyncio.wait_for(asyncio.gather(spawn, despawn, reset), timeout=2.0)
+        await engine.stop()
+        assert results[0]["ids"] == [] and results[0]["dropped"] is True
+        assert results[1]["ids"] == [] and results[1]["dropped"] is True
+        assert "dropped" not in results[2]
+        assert engine.store.count == 3
+
+    @pytest.mark.asyncio
+    async def test_absorbing_boundary_removes_particles(self):
+        """With boundary=absorb particles leaving the world are despawned."""
+        config = SimulationConfig(particle_count=0, boundary="absorb", integrator="semi_implicit")
+        engine = SimulationEngine(bus=EventBus(queue_size=10), config=config)
+        result = await engine.submit("spawn", particles=[[1, 1, -20, 0], [50, 30, 0, 0], [99, 59, 0, 20]])
+        engine._step(0.1)
+        assert [p.id for p in engine.particles] == [result["ids"][1]]
+        assert engine.absorbed == 2
+        assert engine.status.particle_count == 1
+
+    @pytest.mark.asyncio
+    async def test_force_fields_toggle_at_tick_boundary(self):
+        """Configured fields act on velocities and are toggled through the command queue."""
+        config = SimulationConfig(particle_count=0, world_height=1000, integrator="semi_implicit",
+                                  forces=[{"name": "down", "type": "gravity", "y": 10.0}])
+        engine = SimulationEngine(bus=EventBus(queue_size=10), config=config)
+        await engine.submit("spawn", particles=[[50, 50, 0, 0]])
+        engine._step(0.1)
+        assert engine.particles[0].vy == pytest.approx(1.0)
+
+        result = await engine.submit("force", name="down", enabled=False)
+        assert result["field"]["enabled"] is False
+        engine._step(0.1)
+        assert engine.particles[0].vy == pytest.approx(1.0)
+        with pytest.raises(ValueError):
+            engine.submit("force", name="sideways", enabled=True)
+
+
+class TestThreadedEngine:
+    """Tests for the engine ticking on its own thread."""
+
+    @pytest.mark.asyncio
+    async def test_ticks_on_its_own_thread(self):
+        """Ticks run on the engine thread and frames reach bus subscribers on the loop."""
+        bus = EventBus(queue_size=10)
+        engine = ThreadedEngine(bus=bus, config=SimulationConfig(tick_interval=0.02, particle_count=3))
+        sub = await bus.subscribe("test-client")
+        await engine.start()
+        assert engine._thread.name == "sim-engine"
+        snapshot = await asyncio.wait_for(sub.queue.get(), timeout=2.0)
+        assert isinstance(snapshot, StateSnapshot)
+        assert len(snapshot.particles) == 3
+        await engine.stop()
+        assert engine._thread is None
+        assert engine.state == "stopped"
+        assert not any(thread.name == "sim-engine" for thread in threading.enumerate())
+
+    @pytest.mark.asyncio
+    async def test_commands_settle_on_the_loop(self):
+        """Command futures resolve on the event loop at the next tick boundary."""
+        engine = ThreadedEngine(bus=EventBus(queue_size=10),
+                                config=SimulationConfig(tick_interval=0.01, particle_count=3))
+        await engine.start()
+        result = await asyncio.wait_for(engine.submit("spawn", count=2), timeout=2.0)
+        assert len(result["ids"]) == 2
+        await engine.pause()
+        paused_at = engine.tick
+        await asyncio.sleep(0.05)
+        assert engine.tick == paused_at
+        await engine.resume()
+        await asyncio.sleep(0.05)
+        assert engine.tick > paused_at
+        await engine.stop()
+        assert engine.store.count == 5
+
+    @pytest.mark.asyncio
+    async def test_between_ticks_and_checkpoints(self):
+        """Snapshots and checkpoints are taken while the thread is between ticks."""
+        engine = ThreadedEngine(bus=EventBus(queue_size=10),
+                                config=SimulationConfig(tick_interval=0.005, particle_count=4, seed=3))
+        await engine.start()
+        await asyncio.sleep(0.05)
+        checkpoint = await engine.checkpoint()
+        snapshot = await engine.get_snapshot()
+        assert len(snapshot.particles) == 4
+        await engine.restore(checkpoint)
+        await engine.stop()
+        assert engine.tick >= checkpoint.tick
+
+    @pytest.mark.asyncio
+    async def test_profile_target_is_the_engine_thread(self):
+        """Engine-only profiles sample the engine thread's ticks, not the loop."""
+        engine = ThreadedEngine(bus=EventBus(queue_size=10),
+                                config=SimulationConfig(tick_interval=0.001, particle_count=100_000))
+        await engine.start()
+        thread_id, within = engine.profile_target()
+        assert thread_id == engine._thread.ident
+        profiler = SamplingProfiler()
+        stacks = await asyncio.to_thread(profiler.profile, 0.3, 0.002, thread_id, within)
+        await engine.stop()
+        assert profiler.last_matched > 0
+        assert all(stack.startswith("sim-engine;") for stack in stacks)
+
+    @pytest.mark.asyncio
+    async def test_slow_loop_does_not_delay_ticks(self):
+        """A blocked event loop doesn't hold back ticks; undelivered frames are coalesced."""
+        engine = ThreadedEngine(bus=EventBus(queue_size=10),
+                                config=SimulationConfig(tick_interval=0.01, particle_count=3))
+        await engine.bus.subscribe("test-client")
+        await engine.start()
+        await asyncio.sleep(0.02)
+        started = engine.tick
+        threading.Event().wait(0.2)  # blocks the loop, not the engine thread
+        assert engine.tick - started >= 10
+        assert engine.coalesced >= 1
+        await engine.stop()
+
+
+class TestTickScheduler:
+    """Tests for sharing the loop between worlds."""
+
+    @pytest.mark.asyncio
+    async def test_cheap_world_keeps_its_rate_next_to_an_overrunning_one(self):
+        """Least-runtime-first lets a cheap world catch up between expensive ticks."""
+        scheduler = TickScheduler()
+        heavy = SimulationEngine(EventBus(queue_size=10), SimulationConfig(tick_interval=0.01, particle_count=1))
+        light = SimulationEngine(EventBus(queue_size=10), SimulationConfig(tick_interval=0.01, particle_count=1))
+        step = heavy._step
+        heavy._step = lambda dt: (threading.Event().wait(0.03), step(dt))  # every tick overruns 3x
+        for engine in (heavy, light):
+            engine.scheduler = scheduler
+            scheduler.join(engine)
+            await engine.start()
+        await asyncio.sleep(0.5)
+        for engine in (heavy, light):
+            await engine.stop()
+        assert heavy.tick <= 20
+        assert light.tick >= 35  # ~50 due; plain round-robin gives it one tick per heavy tick
+        assert scheduler.runtime(heavy) > scheduler.runtime(light)
+        assert scheduler.waits > 0
+
+    @pytest.mark.asyncio
+    async def test_parks_unwatched_world_until_a_subscriber_arrives(self):
+        """A running world without subscribers stops ticking after park_after, and commands still apply."""
+        scheduler = TickScheduler(park_after=0.03)
+        bus = EventBus(queue_size=10)
+        engine = SimulationEngine(bus, SimulationConfig(tick_interval=0.01, particle_count=2))
+        engine.scheduler = scheduler
+        scheduler.join(engine)
+        await engine.start()
+        await asyncio.sleep(0.1)
+        assert scheduler.parked(engine)
+        parked_at = engine.tick
+        await asyncio.sleep(0.05)
+        assert engine.tick == parked_at
+
+        result = await asyncio.wait_for(engine.submit("spawn", count=1), timeout=1.0)
+        assert len(result["ids"]) == 1
+        await bus.subscribe("viewer")
+        engine.wake()
+        await asyncio.sleep(0.05)
+        assert not scheduler.parked(engine)
+        assert engine.tick > parked_at
+        await engine.stop()
+        assert scheduler.parks == 1
+
+
+class TestWorldRegistry:
+    """Tests for WorldRegistry."""
+
+    @pytest.mark.asyncio
+    async def test_worlds_are_independent(self):
+        """Each world has its own config, bus and state."""
+        base = SimulationConfig(particle_count=3, forces=[{"name": "down", "type": "gravity", "y": 1.0}])
+        registry = WorldRegistry(base, limit=3)
+        registry.add(WorldRegistry.DEFAULT, SimulationEngine(EventBus(queue_size=10), base))
+        lab = await registry.create("lab", {"particle_count": 5, "seed": 7})
+        default = registry.get()
+        assert lab.bus is not default.bus
+        assert (lab.store.count, default.store.count) == (5, 3)
+        assert lab.config.forces == base.forces and lab.config.forces is not base.forces
+        assert lab.scheduler is registry.scheduler
+
+        stats = registry.get_stats()
+        assert stats["count"] == 2
+        assert stats["worlds"]["lab"]["memory"]["store_bytes"] == lab.store.nbytes
+        assert stats["memory_bytes"] == sum(world["memory"]["total_bytes"] for world in stats["worlds"].values())
+
+    @pytest.mark.asyncio
+    async def test_rejects_bad_worlds(self):
+        """Unknown fields, bad or taken names, the limit and removing the default world raise ValueError."""
+        base = SimulationConfig(particle_count=1)
+        registry = WorldRegistry(base, limit=2)
+        registry.add(WorldRegistry.DEFAULT, SimulationEngine(EventBus(queue_size=10), base))
+        with pytest.raises(ValueError):
+            await registry.create("lab", {"gravity": 1})
+        with pytest.raises(ValueError):
+            await registry.create("lab", {"tick_interval": 0})
+        with pytest.raises(ValueError):
+            await registry.create("no/slash")
+        await registry.create("lab")
+        with pytest.raises(ValueError):
+            await registry.create("lab2")
+        with pytest.raises(ValueError):
+            await registry.remove(WorldRegistry.DEFAULT)
+        viewer = await registry.get("lab").bus.subscribe("viewer")
+        await registry.remove("lab")
+        assert registry.names == [WorldRegistry.DEFAULT]
+        assert viewer.closed
+
+    @pytest.mark.asyncio
+    async def test_start_and_stop_every_world(self):
+        """Worlds created while running start right away; stop stops them all."""
+        base = SimulationConfig(tick_interval=0.01, particle_count=1)
+        registry = WorldRegistry(base)
+        registry.add(WorldRegistry.DEFAULT, SimulationEngine(EventBus(queue_size=10), base))
+        await registry.start()
+        lab = await registry.create("lab")
+        await asyncio.sleep(0.05)
+        assert lab.tick > 0 and registry.get().tick > 0
+        await registry.stop()
+        assert {registry.get(name).state for name in registry.names} == {"stopped"}
@@ -0,0 +1,149 @@
+"""Tests for the health module."""
+
+import asyncio
+import time
+
+import pytest
+
+from internal.health import CheckResult, HealthChecker, LoopLagMonitor, Status, create_loop_check
+from internal.metrics import MetricsRegistry
+
+
+def _block_loop(seconds):
+    time.sleep(seconds)
+
+
+class TestLoopLagMonitor:
+    """Tests for LoopLagMonitor class."""
+
+    @pytest.mark.asyncio
+    async def test_idle_loop_is_healthy(self):
+        """An idle loop reports small lag and an OK check."""
+        monitor = LoopLagMonitor(interval=0.02, degraded_lag=0.1, registry=MetricsRegistry())
+        await monitor.start()
+        await asyncio.sleep(0.15)
+        await monitor.stop()
+
+        assert monitor.samples >= 3
+        assert monitor.stalls == []
+        result = await create_loop_check(monitor)()
+        assert result.status == Status.OK
+
+    @pytest.mark.asyncio
+    async def test_stall_is_recorded_with_stack(self):
+        """A blocking call shows up as a stall with the blocking frame captured."""
+        monitor = LoopLagMonitor(interval=0.02, degraded_lag=0.05, fail_lag=1.0, registry=MetricsRegistry())
+        await monitor.start()
+        await asyncio.sleep(0.05)
+        _block_loop(0.3)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+        assert monitor.max_lag >= 0.2
+        stall = monitor.stalls[0]
+        assert stall["lag_s"] >= 0.2
+        assert any("_block_loop" in line for line in stall["stack"])
+        assert monitor.histogram.count == monitor.samples
+        result = await create_loop_check(monitor)()
+        assert result.status == Status.DEGRADED
+
+    def test_fail_threshold(self):
+        """Lag past fail_lag fails the check; only the longest stalls are kept."""
+        monitor = LoopLagMonitor(degraded_lag=0.1, fail_lag=0.5, keep_stalls=2, registry=MetricsRegistry())
+        for lag in (0.2, 0.7, 0.3, 0.01):
+            monitor.record(lag)
+        assert [stall["lag_s"] for stall in monitor.stalls] == [0.7, 0.3]
+        result = asyncio.run(create_loop_check(monitor)())
+        assert result.status == Status.FAIL
+
+
+class TestHealthChecker:
+    """Tests for HealthChecker class."""
+
+    @pytest.mark.asyncio
+    async def test_checks_run_concurrently(self):
+        """Slow checks overlap instead of adding up, and report their latency."""
+        checker = HealthChecker()
+
+        def slow(name):
+            async def check():
+                await asyncio.sleep(0.1)
+                return CheckResult(name, Status.OK)
+            return check
+
+        for name in ("a", "b", "c"):
+            checker.register(name, slow(name))
+        started = time.perf_counter()
+        report = await checker.check()
+        assert time.perf_counter() - started < 0.25
+        assert report.status == Status.OK
+        assert all(check.latency_ms >= 90 for check in report.checks)
+
+    @pytest.mark.asyncio
+    async def test_stale_report_served_while_refreshing(self):
+        """After the TTL the cached report is returned at once and refreshed behind it."""
+        checker = HealthChecker(ttl=0.05)
+        calls = []
+
+        async def check():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return CheckResult("x", Status.OK, str(len(calls)))
+
+        checker.register("x", check)
+        first = await checker.check()
+        await asyncio.sleep(0.06)
+        started = time.perf_counter()
+        stale = await checker.check()
+        assert time.perf_counter() - started < 0.01
+        assert stale is first
+        await asyncio.sleep(0.1)
+        fresh = await checker.check()
+        assert fresh.checks[0].msg == "2"
+        await checker.stop()
+
+    @pytest.mark.asyncio
+    async def test_hung_check_does_not_hold_back_others(self):
+        """A check that times out fails alone; the rest of the report keeps updating."""
+        checker = HealthChecker(ttl=0.01, timeout=0.2)
+        state = {"hang": False, "ok": 0}
+
+        async def maybe_hang():
+            if state["hang"]:
+                await asyncio.sleep(10)
+            return CheckResult("slow", Status.OK)
+
+        async def fast():
+            state["ok"] += 1
+            return CheckResult("fast", Status.OK, str(state["ok"]))
+
+        checker.register("slow", maybe_hang, critical=False)
+        checker.register("fast", fast)
+        await checker.check()
+        state["hang"] = True
+        await asyncio.sleep(0.02)
+        await checker.check()  # kicks off a refresh with the hung check
+        await asyncio.sleep(0.05)
+        report = await checker.check()
+        assert report.checks[1].msg == "2"
+        await asyncio.sleep(0.25)
+        report = await checker.check()
+        assert report.checks[0].msg == "timeout"
+        assert report.status == Status.DEGRADED
+        await checker.stop()
+
+    @pytest.mark.asyncio
+    async def test_background_refresh(self):
+        """start() keeps the report fresh without callers triggering it."""
+        checker = HealthChecker(ttl=0.02)
+        calls = []
+
+        async def check():
+            calls.append(1)
+            return CheckResult("x", Status.OK)
+
+        checker.register("x", check)
+        await checker.start()
+        await asyncio.sleep(0.1)
+        await checker.stop()
+        assert len(calls) >= 3
@@ -0,0 +1,192 @@
+"""Unit tests for logging module."""
+
+import asyncio
+import gzip
+import json
+import os
+
+import pytest
+from internal.logging import AsyncFileLogger, LogLevel, StructuredLogger
+from internal.state_log import StateLogPolicy
+from simulation.state import ParticleState, StateSnapshot
+
+
+class TestAsyncFileLogger:
+    """Tests for AsyncFileLogger class."""
+
+    @pytest.mark.asyncio
+    async def test_records_written_in_batches(self, tmp_path):
+        """Queued records are group-committed, not written one by one."""
+        path = tmp_path / "sim.log"
+        logger = AsyncFileLogger(str(path), batch_size=50, flush_interval=0.05)
+        for i in range(120):
+            logger.try_log("state", {"tick": i})
+        await logger.start()
+        await logger.stop()
+
+        lines = path.read_text().splitlines()
+        assert len(lines) == 120
+        assert json.loads(lines[-1])["data"]["tick"] == 119
+        assert logger.written == 120
+        assert logger.batches <= 3
+
+    @pytest.mark.asyncio
+    async def test_deleted_file_drops_records(self, tmp_path):
+        """Once the log file is gone, records are counted as dropped."""
+        path = tmp_path / "sim.log"
+        logger = AsyncFileLogger(str(path), flush_interval=0.01, inode_check_interval=0)
+        await logger.start()
+        logger.try_log("event", {"n": 1})
+        os.remove(path)
+        logger.try_log("event", {"n": 2})
+        await logger.stop()
+
+        assert logger.dropped >= 1
+        assert logger.written + logger.dropped == 2
+
+    @pytest.mark.asyncio
+    async def test_rotation_compresses_and_prunes(self, tmp_path):
+        """Oversized files rotate into gzipped segments capped by backup_count."""
+        path = tmp_path / "sim.log"
+        logger = AsyncFileLogger(str(path), batch_size=10, flush_interval=0.01,
+                                 max_bytes=500, backup_count=2)
+        await logger.start()
+        for i in range(200):
+            logger.try_log("state", {"tick": i, "pad": "x" * 20})
+            if i % 10 == 0:
+                await asyncio.sleep(0.01)
+        await logger.stop()
+
+        segments = sorted(p.name for p in tmp_path.glob("sim.log.*"))
+        assert logger.rotations >= 3
+        assert len(segments) == 2
+        assert all(name.endswith(".gz") for name in segments)
+        with gzip.open(tmp_path / segments[-1], "rt") as f:
+            assert json.loads(f.readline())["kind"] == "state"
+
+
+    @pytest.mark.asyncio
+    async def test_rotation_counts_bytes_and_survives_failure(self, tmp_path, monkeypatch):
+        """Size is tracked in encoded bytes, and a failed rotation doesn't drop the written batch."""
+        path = tmp_path / "sim.log"
+        logger = AsyncFileLogger(str(path), flush_interval=0.01, max_bytes=10_000)
+        await logger.start()
+        logger.try_log("event", {"text": "\u00e9" * 10})
+        await asyncio.sleep(0.05)
+        assert logger._size == path.stat().st_size
+
+        def fail(src, dst):
+            raise OSError("read-only")
+
+        monkeypatch.setattr(os, "replace", fail)
+        logger.max_bytes = 1
+        logger.try_log("event", {"n": 1})
+        await logger.stop()
+        assert logger.written == 2
+        assert logger.dropped == 0
+        assert logger.rotations == 0
+
+
+class TestStateLogPolicy:
+    """Tests for StateLogPolicy class."""
+
+    def _snapshot(self, tick, positions):
+        particles = [ParticleState(f"p{i:02d}", x, y, 1.0, 0.0) for i, (x, y) in enumerate(positions)]
+        return StateSnapshot(tick, tick * 0.5, particles)
+
+    def test_every_nth_tick(self):
+        """Only every Nth tick is logged."""
+        policy = StateLogPolicy(every=3)
+        logged = [t for t in range(1, 10) if policy.select(self._snapshot(t, [(0, 0)]))]
+        assert logged == [3, 6, 9]
+        assert policy.skipped == 6
+
+    def test_events_mode_logs_no_state(self):
+        """Events mode never logs snapshots."""
+        policy = StateLogPolicy(mode="events")
+        assert policy.select(self._snapshot(1, [(0, 0)])) is None
+
+    def test_summary_replaces_particle_list(self):
+        """Summary records carry aggregates, not particles."""
+        policy = StateLogPolicy(mode="summary")
+        record = policy.select(self._snapshot(1, [(0, 0), (10, 20)]))
+        assert policy.kind == "state_summary"
+        assert "particles" not in record
+        assert record["count"] == 2
+        assert record["x"] == [0, 10, 5]
+
+    def test_delta_logs_only_moved_particles(self):
+        """Delta mode logs particles past the threshold since last logged."""
+        policy = StateLogPolicy(mode="delta", delta_threshold=1.0)
+        first = policy.select(self._snapshot(1, [(0, 0), (5, 5)]))
+        assert len(first["particles"]) == 2
+        second = policy.select(self._snapshot(2, [(0.5, 0), (7, 5)]))
+        assert [p["id"] for p in second["particles"]] == ["p01"]
+
+    def test_budget_caps_particles(self):
+        """Full records are truncated to the particle budget."""
+        policy = StateLogPolicy(budget=2)
+        record = policy.select(self._snapshot(1, [(0, 0)] * 5))
+        assert len(record["particles"]) == 2
+        assert record["truncated"] == 3
+
+    def test_delta_budget_rotates_and_prunes(self):
+        """A budgeted delta scan resumes where it stopped, and despawned ids are forgotten."""
+        policy = StateLogPolicy(mode="delta", budget=2)
+        ids = [[p["id"] for p in policy.select(self._snapshot(t, [(t * 10, 0)] * 5))["particles"]]
+               for t in range(1, 4)]
+        assert ids == [["p00", "p01"], ["p02", "p03"], ["p04", "p00"]]
+
+        policy.select(self._snapshot(4, [(0, 0)]))
+        assert set(policy._baseline) == {"p00"}
+
+    def test_budget_bounds_delta_and_summary_work(self):
+        """With a budget, delta checks only its window and summaries aggregate a sample."""
+        policy = StateLogPolicy(mode="delta", delta_threshold=1.0, budget=3)
+        positions = [(i, 0) for i in range(9)]
+        policy.select(self._snapshot(1, positions))
+        assert len(policy._baseline) == 3
+        moved = [(x + 5, y) for x, y in positions]
+        ids = [p["id"] for p in policy.select(self._snapshot(2, moved))["particles"]]
+        assert ids == ["p03", "p04", "p05"]  # p00-p02 moved too, but are checked on a later tick
+
+        policy = StateLogPolicy(mode="summary", budget=3)
+        record = policy.select(self._snapshot(1, positions))
+        assert record["count"] == 9
+        assert record["sampled"] == 3
+        assert record["x"] == [0, 6, 3]
+
+    def test_unknown_mode_rejected(self):
+        """Unknown modes fail fast."""
+        with pytest.raises(ValueError):
+            StateLogPolicy(mode="everything")
+
+
+class TestStructuredLogger:
+    """Tests for the queue-backed StructuredLogger."""
+
+    def test_writes_json_lines_off_thread(self, capsys):
+        """Records are formatted lazily and written as JSON lines."""
+        logger = StructuredLogger(LogLevel.INFO)
+        logger.info("engine paused tick=%d", 42, extra="x")
+        logger.flush()
+
+        record = json.loads(capsys.readouterr().err.strip())
+        assert record["msg"] == "engine paused tick=42"
+        assert record["level"] == "INFO"
+        assert record["extra"] == "x"
+
+    def test_below_level_is_not_queued(self):
+        """Filtered records never reach the queue."""
+        logger = StructuredLogger(LogLevel.WARN)
+        logger.info("ignored %s", object())
+        assert logger.get_stats()["queued"] == 0
+        assert logger._thread is None
+
+    def test_full_queue_drops_and_counts(self):
+        """A full queue drops records instead of blocking."""
+        logger = StructuredLogger(LogLevel.INFO, queue_size=2)
+        logger._thread = object()  # keep the writer from draining
+        for i in range(5):
+            logger.info("msg %d", i)
+        assert logger.dropped == 3
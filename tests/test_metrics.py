@@ -0,0 +1,59 @@
+"""Tests for the metrics registry."""
+
+import pytest
+
+from internal.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry:
+    """Tests for MetricsRegistry class."""
+
+    def test_counter_and_gauge(self):
+        """Counters and gauges render with HELP and TYPE lines."""
+        registry = MetricsRegistry()
+        registry.counter("requests_total", "Requests").inc(3)
+        gauge = registry.gauge("queue_depth", "Depth")
+        gauge.set(5)
+        gauge.dec()
+        text = registry.render()
+        assert "# HELP requests_total Requests" in text
+        assert "# TYPE requests_total counter" in text
+        assert "requests_total 3" in text
+        assert "queue_depth 4" in text
+
+    def test_get_or_create(self):
+        """Registering a name twice returns the same instrument."""
+        registry = MetricsRegistry()
+        assert registry.counter("a_total") is registry.counter("a_total")
+        with pytest.raises(ValueError):
+            registry.gauge("a_total")
+
+    def test_callback_read_at_scrape(self):
+        """Callback instruments read their value only when rendered."""
+        registry = MetricsRegistry()
+        values = [1]
+        registry.gauge("live", fn=lambda: values[-1])
+        values.append(7)
+        assert "live 7" in registry.render()
+
+    def test_broken_callback_is_skipped(self):
+        """A failing callback drops its metric, not the scrape."""
+        registry = MetricsRegistry()
+        registry.gauge("broken", fn=lambda: 1 / 0)
+        registry.counter("ok_total").inc()
+        text = registry.render()
+        assert "broken" not in text
+        assert "ok_total 1" in text
+
+    def test_histogram_buckets(self):
+        """Histogram buckets are cumulative with sum and count."""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe(value)
+        text = registry.render()
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 3' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+        assert "latency_seconds_sum 4.05" in text
+        assert "latency_seconds_count 4" in text
@@ -0,0 +1,63 @@
+"""Tests for the sampling profiler."""
+
+import threading
+import time
+
+import pytest
+
+from internal.profiler import SamplingProfiler, collapse
+
+
+def _spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler:
+    """Tests for SamplingProfiler class."""
+
+    def test_collapsed_stacks(self):
+        """Samples of a busy thread come back as root-first collapsed stacks."""
+        stop = threading.Event()
+        worker = threading.Thread(target=_spin, args=(stop,), name="spinner")
+        worker.start()
+        try:
+            stacks = SamplingProfiler().profile(0.2, interval=0.002, thread_id=worker.ident)
+        finally:
+            stop.set()
+            worker.join()
+
+        assert stacks
+        stack = stacks.most_common(1)[0][0]
+        assert stack.startswith("spinner;")
+        assert stack.split(";")[-1].endswith(":_spin")
+        line = collapse(stacks).splitlines()[0]
+        assert line.rsplit(" ", 1)[1].isdigit()
+
+    def test_within_filters_samples(self):
+        """Only samples with one of the given code objects on the stack count."""
+        stop = threading.Event()
+        worker = threading.Thread(target=_spin, args=(stop,))
+        worker.start()
+        try:
+            profiler = SamplingProfiler()
+            stacks = profiler.profile(0.1, interval=0.002, thread_id=worker.ident, within={collapse.__code__})
+        finally:
+            stop.set()
+            worker.join()
+
+        assert not stacks
+        assert profiler.last_samples > 0
+        assert profiler.last_matched == 0
+
+    def test_one_profile_at_a_time(self):
+        """A second concurrent profile is refused."""
+        profiler = SamplingProfiler()
+        runner = threading.Thread(target=profiler.profile, args=(0.2,))
+        runner.start()
+        time.sleep(0.05)
+        try:
+            with pytest.raises(RuntimeError):
+                profiler.profile(0.01)
+        finally:
+            runner.join()
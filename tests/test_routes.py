@@ -39,6 +39,16 @@ class TestHealthRoutes:
         assert "uptime_s" in data
         assert "timestamp" in data
 
+    @pytest.mark.asyncio
+    async def test_metrics_endpoint(self, client):
+        """GET /metrics returns Prometheus text without auth."""
+        response = await client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE sim_engine_ticks_total counter" in response.text
+        assert "sim_bus_subscribers " in response.text
+        assert 'sim_engine_tick_seconds_bucket{le="+Inf"}' in response.text
+
 
 
 class TestControlRoutes:
@@ -67,6 +77,87 @@ class TestControlRoutes:
         response = await client.post("/api/v1/control/reset")
         assert response.status_code == 401
 
+    @pytest.mark.asyncio
+    async def test_control_spawn_and_params(self, client):
+        """Spawn and params are applied and report the resulting state."""
+        headers = self._auth_header(password="admin123")
+        response = await client.post("/api/v1/control/spawn?count=2", headers=headers)
+        assert response.status_code == 200
+        assert len(response.json()["ids"]) == 2
+
+        response = await client.post("/api/v1/control/params", json={"bogus": 1}, headers=headers)
+        assert response.status_code == 422
+        response = await client.post("/api/v1/control/params", json={"kind": "reset"}, headers=headers)
+        assert response.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_control_params_particle_count_resizes(self, client):
+        """particle_count via /params spawns or despawns at once, without a reset."""
+        headers = self._auth_header(password="admin123")
+        response = await client.post("/api/v1/control/params", json={"particle_count": 25}, headers=headers)
+        assert response.status_code == 200
+        stats = (await client.get("/api/v1/stats", headers=headers)).json()
+        assert stats["simulation"]["store"]["count"] == 25
+
+        response = await client.post("/api/v1/control/params", json={"particle_count": 3}, headers=headers)
+        assert response.status_code == 200
+        stats = (await client.get("/api/v1/stats", headers=headers)).json()
+        assert stats["simulation"]["store"]["count"] == 3
+
+    @pytest.mark.asyncio
+    async def test_control_reload(self, client):
+        """Reload re-reads config.json; an unchanged file changes nothing."""
+        response = await client.post("/api/v1/control/reload")
+        assert response.status_code == 401
+        headers = self._auth_header(password="admin123")
+        response = await client.post("/api/v1/control/reload", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["params"] == {}
+
+    @pytest.mark.asyncio
+    async def test_checkpoint_save_and_restore(self, client, tmp_path):
+        """A saved checkpoint is listed and can be restored; unknown names are 404."""
+        from ui.routes import checkpoint
+        checkpoint._checkpointer.directory = str(tmp_path)
+        headers = self._auth_header(password="admin123")
+        response = await client.post("/api/v1/checkpoint/save")
+        assert response.status_code == 401
+        response = await client.post("/api/v1/checkpoint/save", headers=headers)
+        assert response.status_code == 200
+        name = response.json()["name"]
+        response = await client.get("/api/v1/checkpoint/list", headers=headers)
+        assert response.json()["checkpoints"] == [name]
+        response = await client.post("/api/v1/checkpoint/restore", params={"name": name}, headers=headers)
+        assert response.status_code == 200
+        response = await client.post("/api/v1/checkpoint/restore", params={"name": "nope"}, headers=headers)
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_control_forces(self, client):
+        """Force fields are listed and toggled; unknown names are 422."""
+        from simulation.forces import ForceField, ForceFields
+        from ui.routes import control
+        control._engine.forces = ForceFields([ForceField("down", "gravity", y=9.8)])
+        headers = self._auth_header(password="admin123")
+        response = await client.get("/api/v1/control/forces", headers=headers)
+        assert response.json()["forces"][0]["enabled"] is True
+        response = await client.post("/api/v1/control/forces/down", json={"enabled": False, "params": {"y": 1.0}},
+                                     headers=headers)
+        assert response.status_code == 200
+        assert response.json()["field"] == {"name": "down", "type": "gravity", "enabled": False, "x": 0.0, "y": 1.0}
+        response = await client.post("/api/v1/control/forces/up", json={"enabled": True}, headers=headers)
+        assert response.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_control_despawn(self, client):
+        """Despawn removes listed particles and requires auth."""
+        response = await client.post("/api/v1/control/despawn", json={"ids": ["p00"]})
+        assert response.status_code == 401
+        headers = self._auth_header(password="admin123")
+        response = await client.post("/api/v1/control/despawn", json={"ids": ["p00", "p9999"]}, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["ids"] == ["p00"]
+
 
 class TestAPIRoutes:
     """Tests for API endpoints (require basic auth)."""
@@ -83,6 +174,89 @@ class TestAPIRoutes:
         response = await client.get("/api/v1/subscribers")
         assert response.status_code == 401
 
+    @pytest.mark.asyncio
+    async def test_history_requires_auth(self, client):
+        """GET /history/... requires authentication."""
+        response = await client.get("/api/v1/history/run.trj/particles/p01")
+        assert response.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_replay_requires_auth(self, client):
+        """POST /replay/load requires authentication."""
+        response = await client.post("/api/v1/replay/load", params={"name": "run.trj"})
+        assert response.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_profile_requires_auth(self, client):
+        """GET /profile without auth returns 401."""
+        response = await client.get("/api/v1/profile?seconds=0.1")
+        assert response.status_code == 401
+
+
+class TestWorldRoutes:
+    """Tests for the world registry and per-world control."""
+
+    def _auth_header(self):
+        credentials = base64.b64encode(b"admin:admin123").decode()
+        return {"Authorization": f"Basic {credentials}"}
+
+    @pytest.mark.asyncio
+    async def test_worlds_require_auth(self, client):
+        """GET /worlds requires authentication."""
+        response = await client.get("/api/v1/worlds")
+        assert response.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_create_control_and_remove_world(self, client):
+        """A created world has its own config, is controlled with ?world= and can be removed."""
+        headers = self._auth_header()
+        response = await client.post("/api/v1/worlds/lab", json={"config": {"particle_count": 3}}, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["particles"] == 3
+        response = await client.post("/api/v1/worlds/lab", headers=headers)
+        assert response.status_code == 409
+
+        before = (await client.get("/api/v1/worlds/default", headers=headers)).json()["particles"]
+        response = await client.post("/api/v1/control/spawn?count=2&world=lab", headers=headers)
+        assert response.status_code == 200
+        response = await client.get("/api/v1/worlds", headers=headers)
+        worlds = response.json()["worlds"]
+        assert worlds["lab"]["particles"] == 5
+        assert worlds["default"]["particles"] == before
+        assert worlds["lab"]["memory"]["total_bytes"] > 0
+        assert "cpu_share" in worlds["lab"]["tick_cost"]
+
+        response = await client.post("/api/v1/control/pause?world=nowhere", headers=headers)
+        assert response.status_code == 404
+        response = await client.delete("/api/v1/worlds/lab", headers=headers)
+        assert response.status_code == 200
+        response = await client.get("/api/v1/worlds/lab", headers=headers)
+        assert response.status_code == 404
+        response = await client.delete("/api/v1/worlds/default", headers=headers)
+        assert response.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_create_rejects_bad_config(self, client):
+        """Unknown fields and bad names are 422."""
+        headers = self._auth_header()
+        response = await client.post("/api/v1/worlds/lab", json={"config": {"gravity": 1}}, headers=headers)
+        assert response.status_code == 422
+        response = await client.post("/api/v1/worlds/bad.name", headers=headers)
+        assert response.status_code == 422
+        for config in ({"tick_interval": 0}, {"tick_interval": -1}, {"world_width": -10},
+                       {"particle_count": -5}, {"integrator": "leapfrog"}, {"boundary": "bounce"},
+                       {"initializer": "spiral"}, {"forces": [{"name": "f", "type": "magnet"}]}):
+            response = await client.post("/api/v1/worlds/lab", json={"config": config}, headers=headers)
+            assert response.status_code == 422, config
+        response = await client.get("/api/v1/worlds/lab", headers=headers)
+        assert response.status_code == 404  # nothing half-built was registered
+
+    @pytest.mark.asyncio
+    async def test_events_unknown_world(self, client):
+        """/events?world= for a world that doesn't exist is 404."""
+        response = await client.get("/events?world=nowhere")
+        assert response.status_code == 404
+
 
 class TestUIRoutes:
     """Tests for UI endpoints."""
@@ -109,3 +283,28 @@ class TestUIRoutes:
         #         pass  # OK if no data yet, endpoint works
         # Skip this test - SSE streaming tests hang in pytest
         pytest.skip("SSE streaming test hangs - verify manually with curl")
+
+    @pytest.mark.asyncio
+    async def test_events_releases_client_gone_before_first_chunk(self):
+        """A stream client that disconnects before the body starts frees its slot and subscription."""
+        app = create_app()
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                 "scheme": "http", "path": "/events", "raw_path": b"/events", "root_path": "",
+                 "query_string": b"", "headers": [], "client": ("10.0.0.1", 1234), "server": ("test", 80)}
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            raise OSError("client gone")
+
+        with pytest.raises(Exception):  # the OSError, wrapped in an ExceptionGroup by the task group
+            await app(scope, receive, send)
+
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            auth = base64.b64encode(b"admin:admin123").decode()
+            response = await client.get("/api/v1/stats", headers={"Authorization": f"Basic {auth}"})
+        stats = response.json()
+        assert stats["admission"]["active"] == 0
+        assert stats["bus"]["subscriber_count"] == 0
@@ -1,8 +1,17 @@
 """Unit tests for simulation components."""
 
+import numpy as np
 import pytest
 from simulation.world import World
 from simulation.entities import Particle
+from simulation.boundaries import absorb, periodic, reflect
+from simulation.commands import Command, CommandKind, CommandPlan, validate
+from simulation.forces import ForceField, ForceFields
+from simulation.history import FrameRing
+from simulation.initializers import populate
+from simulation.integrators import INTEGRATORS, get_integrator
+from simulation.store import VX, VY, X, Y, ParticleStore, format_id
+from simulation.instrumentation import TickStats
 from simulation.state import ParticleState, StateSnapshot
 
 
@@ -134,3 +143,490 @@ class TestStateSnapshot:
     def test_snapshot_uses_slots(self):
         """StateSnapshot uses __slots__ for memory efficiency."""
         assert hasattr(StateSnapshot, "__slots__")
+
+
+class TestFrameRing:
+    """Tests for FrameRing class."""
+
+    def _snapshot(self, tick, count=3):
+        return StateSnapshot(tick, tick * 0.5, [ParticleState(f"p{i:02d}", tick, i, 1, -1) for i in range(count)])
+
+    def test_get_and_window(self):
+        """Frames are retrievable by tick and by window."""
+        ring = FrameRing(budget_bytes=1 << 20)
+        for tick in range(1, 11):
+            ring.push(self._snapshot(tick))
+        snap = ring.get(4)
+        assert snap.tick == 4
+        assert snap.time == 2.0
+        assert [p.id for p in snap.particles] == ["p00", "p01", "p02"]
+        assert snap.particles[2].y == 2
+        assert [s.tick for s in ring.window(3, 6)] == [3, 4, 5, 6]
+        assert ring.get(99) is None
+
+    def test_budget_bounds_capacity(self):
+        """Old frames are overwritten once the byte budget is full."""
+        ring = FrameRing(budget_bytes=10 * (3 * 16 + 32))
+        for tick in range(1, 26):
+            ring.push(self._snapshot(tick))
+        assert ring.capacity == 10
+        assert len(ring) == 10
+        assert ring.oldest_tick == 16
+        assert ring.newest_tick == 25
+        assert ring.get(15) is None
+
+    def test_oversized_frames_are_refused(self):
+        """Frames over the whole budget are skipped without growing the ring."""
+        ring = FrameRing(budget_bytes=1000)
+        for tick in range(1, 300):
+            ring.push(self._snapshot(tick, count=100))
+        assert len(ring) == 0
+        assert ring.width == 0
+        assert ring.oversized == 299
+        ring.push(self._snapshot(300, count=3))
+        assert ring.newest_tick == 300
+
+    def test_wider_frames_keep_recent_history(self):
+        """Growing particle count re-lays out the ring without losing recent frames."""
+        ring = FrameRing(budget_bytes=1 << 16)
+        ring.push(self._snapshot(1, count=2))
+        ring.push(self._snapshot(2, count=8))
+        assert len(ring.get(1).particles) == 2
+        assert len(ring.get(2).particles) == 8
+        assert ring.nbytes <= 1 << 16
+
+    def test_disabled_when_budget_zero(self):
+        """A zero budget keeps no history."""
+        ring = FrameRing(budget_bytes=0)
+        ring.push(self._snapshot(1))
+        assert len(ring) == 0
+
+
+class TestTickStats:
+    """Tests for TickStats class."""
+
+    def test_summary_and_utilisation(self):
+        """Phase percentiles and budget utilisation come from recorded ticks."""
+        stats = TickStats(tick_interval=0.1, window=4)
+        for _ in range(6):
+            stats.record(0.001, 0.02, 0.01, 0.004, 0.06)
+        stats.record(0.0, 0.15, 0.0, 0.0, 0.0)
+        summary = stats.summary()
+        assert summary["ticks"] == 7
+        assert summary["window"] == 4
+        assert summary["phases"]["physics"]["max_ms"] == pytest.approx(150)
+        assert summary["phases"]["sleep_slack"]["p50_ms"] == pytest.approx(60)
+        assert summary["budget_utilisation"]["last"] == pytest.approx(1.5)
+        assert summary["budget_utilisation"]["over_budget"] == 1
+
+    def test_histograms_are_cumulative(self):
+        """Histogram counts cover every tick, not just the rolling window."""
+        stats = TickStats(tick_interval=0.1, window=2)
+        for _ in range(5):
+            stats.record(0.0, 0.001, 0.0, 0.0, 0.0)
+        assert sum(stats.histograms()["physics"]) == 5
+
+    def test_empty_summary(self):
+        """A summary before any tick reports zeros."""
+        summary = TickStats(tick_interval=0.1).summary()
+        assert summary["window"] == 0
+        assert summary["phases"]["publish"]["mean_ms"] == 0.0
+
+
+class TestCommandPlan:
+    """Tests for command coalescing."""
+
+    def _command(self, kind, **args):
+        return Command(kind, args, None)
+
+    def test_coalesces_burst(self):
+        """Params merge, the last state wins, spawns before a reset are dropped."""
+        first_spawn = self._command(CommandKind.SPAWN, count=3)
+        last_spawn = self._command(CommandKind.SPAWN, count=2)
+        plan = CommandPlan([
+            self._command(CommandKind.PARAMS, tick_interval=0.1),
+            self._command(CommandKind.PAUSE),
+            first_spawn,
+            self._command(CommandKind.RESET),
+            self._command(CommandKind.RESET),
+            self._command(CommandKind.PARAMS, tick_interval=0.2, world_width=50),
+            last_spawn,
+            self._command(CommandKind.RESUME),
+        ])
+        assert plan.params == {"tick_interval": 0.2, "world_width": 50}
+        assert plan.reset is True
+        assert plan.population == [last_spawn]
+        assert plan.dropped == [first_spawn]
+        assert plan.state == CommandKind.RESUME
+
+    def test_force_commands_keep_order(self):
+        """Force commands are kept in submission order and survive a reset."""
+        first = self._command(CommandKind.FORCE, name="g", enabled=False)
+        second = self._command(CommandKind.FORCE, name="g", enabled=True)
+        plan = CommandPlan([first, self._command(CommandKind.RESET), second])
+        assert plan.forces == [first, second]
+        validate(CommandKind.FORCE, {"name": "g", "params": {"y": 1}})
+        with pytest.raises(ValueError):
+            validate(CommandKind.FORCE, {"enabled": True})
+        with pytest.raises(ValueError):
+            validate(CommandKind.FORCE, {"name": "g", "enabled": "yes"})
+
+    def test_validate(self):
+        """Invalid commands are rejected before they are queued."""
+        validate(CommandKind.PARAMS, {"tick_interval": 0.1})
+        with pytest.raises(ValueError):
+            validate(CommandKind.PARAMS, {"gravity": 1})
+        with pytest.raises(ValueError):
+            validate(CommandKind.PARAMS, {"tick_interval": -1})
+        with pytest.raises(ValueError):
+            validate(CommandKind.SPAWN, {"count": 0})
+        with pytest.raises(ValueError):
+            validate(CommandKind.DESPAWN, {"ids": ["p01", "q2"]})
+        with pytest.raises(ValueError):
+            validate(CommandKind.SPAWN, {"particles": [[1, 2, 3]]})
+        with pytest.raises(ValueError):
+            validate("explode", {})
+
+
+class TestInitializers:
+    """Tests for the vectorised reset initializers."""
+
+    def _populate(self, kind, count=1000, **options):
+        store = ParticleStore(capacity=count)
+        ids = populate(store, count, np.random.default_rng(1), 100, 60, kind, options)
+        assert ids.tolist() == list(range(count))
+        return store.columns()
+
+    def test_uniform_fills_world(self):
+        """Uniform positions cover the world; velocities stay within speed."""
+        data = self._populate("uniform", speed=2.0)
+        assert 0 <= data[X].min() and data[X].max() <= 100
+        assert 0 <= data[Y].min() and data[Y].max() <= 60
+        assert np.abs(data[VX:]).max() <= 2.0
+        assert data[X].max() - data[X].min() > 90
+
+    def test_clusters_are_tight(self):
+        """Each particle lies near one of `count` centres."""
+        data = self._populate("clusters", count=3, spread=0.01, speed=0.0)
+        x = np.sort(data[X])
+        gaps = np.diff(x)
+        assert (gaps > 5).sum() <= 2  # at most three separated groups
+        assert not data[VX:].any()
+
+    def test_lattice_is_regular(self):
+        """Lattice points are distinct, inside the world and at rest by default."""
+        data = self._populate("lattice", count=100)
+        points = set(zip(data[X].tolist(), data[Y].tolist()))
+        assert len(points) == 100
+        assert 0 < data[X].min() and data[X].max() < 100
+        assert 0 < data[Y].min() and data[Y].max() < 60
+        assert not data[VX:].any()
+
+    def test_ring_moves_tangentially(self):
+        """Ring particles sit in the band around the centre and move perpendicular to the radius."""
+        data = self._populate("ring", radius=0.4, thickness=0.1, speed=5.0)
+        dx, dy = data[X] - 50, data[Y] - 30
+        radius = np.hypot(dx, dy)
+        assert radius.min() >= 0.35 * 60 - 1e-3 and radius.max() <= 0.45 * 60 + 1e-3
+        np.testing.assert_allclose(np.hypot(data[VX], data[VY]), 5.0, rtol=1e-5)
+        np.testing.assert_allclose((dx * data[VX] + dy * data[VY]) / radius, 0, atol=1e-3)
+
+    def test_from_file_reads_rows(self, tmp_path):
+        """The file initializer takes the first rows of a .npy file."""
+        path = tmp_path / "start.npy"
+        rows = np.arange(40, dtype=np.float64).reshape(10, 4)
+        np.save(path, rows)
+        data = self._populate("file", count=5, path=str(path))
+        np.testing.assert_array_equal(data, rows[:5].T)
+
+    def test_failures_leave_store_unchanged(self, tmp_path):
+        """Unknown kinds and short files raise ValueError without adding particles."""
+        path = tmp_path / "short.npy"
+        np.save(path, np.zeros((2, 4)))
+        store = ParticleStore()
+        rng = np.random.default_rng()
+        with pytest.raises(ValueError):
+            populate(store, 5, rng, 10, 10, "file", {"path": str(path)})
+        with pytest.raises(ValueError):
+            populate(store, 5, rng, 10, 10, "spiral")
+        assert store.count == 0
+
+    def test_populate_refills_holes(self):
+        """With holes in the store new particles reuse them."""
+        store = ParticleStore(capacity=8)
+        populate(store, 8, np.random.default_rng(), 10, 10)
+        store.remove([1, 2])
+        ids = populate(store, 2, np.random.default_rng(), 10, 10, "lattice")
+        assert ids.tolist() == [8, 9]
+        assert store.high == 8 and store.holes == 0
+
+
+def _spring(state, out):
+    """Harmonic well around the origin with unit stiffness."""
+    np.negative(state[X:VX], out=out)
+
+
+def _energy(data):
+    return 0.5 * (data ** 2).sum()
+
+
+class TestIntegrators:
+    """Tests for the vectorised integrators."""
+
+    def test_no_forces_is_plain_drift(self):
+        """Without accel every integrator moves x by v dt and leaves v alone."""
+        start = np.array([[1.0, 2.0], [3.0, 4.0], [0.5, -1.0], [2.0, 0.0]])
+        for name in INTEGRATORS:
+            data = start.copy()
+            get_integrator(name).step(data, 0.1)
+            np.testing.assert_allclose(data, [[1.05, 1.9], [3.2, 4.0], [0.5, -1.0], [2.0, 0.0]])
+
+    def test_accuracy_follows_order(self):
+        """On a harmonic oscillator the error after one period shrinks with the scheme's order."""
+        errors = {}
+        for name in INTEGRATORS:
+            data = np.array([[1.0], [0.0], [0.0], [1.0]])
+            integrator = get_integrator(name)
+            steps = 200
+            for _ in range(steps):
+                integrator.step(data, 2 * np.pi / steps, _spring)
+            errors[name] = np.abs(data[:, 0] - [1.0, 0.0, 0.0, 1.0]).max()
+        assert errors["rk4"] < errors["verlet"] < errors["semi_implicit"] < errors["euler"]
+        assert errors["rk4"] < 1e-6
+
+    def test_energy_drift(self):
+        """Explicit Euler gains energy in a well; symplectic Euler stays bounded."""
+        drift = {}
+        for name in ("euler", "semi_implicit"):
+            data = np.array([[1.0], [0.0], [0.0], [1.0]])
+            integrator = get_integrator(name)
+            for _ in range(1000):
+                integrator.step(data, 0.05, _spring)
+            drift[name] = _energy(data) - 1.0  # starts at 1
+        assert drift["euler"] > 1.0
+        assert abs(drift["semi_implicit"]) < 0.05
+
+    def test_scratch_is_reused(self):
+        """Steps of the same size reuse the integrator's scratch arrays."""
+        integrator = get_integrator("rk4")
+        data = np.ones((4, 10))
+        integrator.step(data, 0.1, _spring)
+        buffers = dict(integrator._scratch)
+        integrator.step(data[:, :8], 0.1, _spring)
+        assert all(integrator._scratch[key] is buffer for key, buffer in buffers.items())
+
+    def test_unknown_name(self):
+        """Unknown integrator names raise ValueError."""
+        with pytest.raises(ValueError):
+            get_integrator("leapfrog2")
+
+
+class TestForceFields:
+    """Tests for fused force field evaluation."""
+
+    def _state(self):
+        return np.array([[10.0, 0.0, 3.0], [0.0, 10.0, 4.0], [1.0, 2.0, 0.0], [0.0, -1.0, 0.0]])
+
+    def _accel(self, fields, state=None):
+        state = self._state() if state is None else state
+        out = np.full((2, state.shape[1]), np.nan)
+        ForceFields(fields)(state, out)
+        return out
+
+    def test_gravity_and_drag_fold(self):
+        """Several uniform and drag fields add up to one constant and one coefficient."""
+        out = self._accel([ForceField("a", "gravity", y=-2.0), ForceField("b", "gravity", x=1.0, y=-1.0),
+                           ForceField("c", "drag", k=0.25), ForceField("d", "drag", k=0.25)])
+        np.testing.assert_allclose(out, [[0.5, 0.0, 1.0], [-3.0, -2.5, -3.0]])
+
+    def test_point_fields(self):
+        """Attractors pull towards their centre, repellers push away, vortices swirl around it."""
+        pull = self._accel([ForceField("sun", "attractor", strength=2.0, softening=1e-6)])
+        np.testing.assert_allclose(pull[:, 0], [-2.0 / 100, 0.0], rtol=1e-6)
+        push = self._accel([ForceField("sun", "repeller", strength=2.0, softening=1e-6)])
+        np.testing.assert_allclose(push, -pull)
+        swirl = self._accel([ForceField("storm", "vortex", strength=5.0, softening=1e-6)])
+        np.testing.assert_allclose(swirl[:, 2], [-4 * 5.0 / 25, 3 * 5.0 / 25], rtol=1e-6)
+
+    def test_sum_matches_fields_alone(self):
+        """The fused pass equals the sum of each field evaluated on its own, and skips disabled ones."""
+        fields = [ForceField("g", "gravity", y=1.0), ForceField("air", "drag", k=0.5),
+                  ForceField("sun", "attractor", x=1, y=1, strength=3.0), ForceField("storm", "vortex", x=2),
+                  ForceField("off", "repeller", strength=100.0, enabled=False)]
+        state = np.random.default_rng(0).uniform(-5, 5, (4, 50))
+        expected = sum(self._accel([field], state) for field in fields[:4])
+        np.testing.assert_allclose(self._accel(fields, state), expected)
+
+    def test_update_and_active(self):
+        """Toggling recompiles the fused plan; an all-disabled set is inactive."""
+        forces = ForceFields([ForceField("g", "gravity", y=1.0, enabled=False)])
+        assert not forces.active
+        forces.update("g", enabled=True, params={"y": 3.0})
+        assert forces.active
+        out = np.empty((2, 3))
+        forces(self._state(), out)
+        assert out[1].tolist() == [3.0, 3.0, 3.0]
+        with pytest.raises(ValueError):
+            forces.update("nope", enabled=True)
+        with pytest.raises(ValueError):
+            forces.update("g", params={"strength": 1})
+
+    def test_config_validation(self):
+        """Bad field definitions are rejected when the config is read."""
+        for entry in ({"type": "gravity"}, {"name": "a", "type": "magnet"},
+                      {"name": "a", "type": "attractor", "softening": 0},
+                      {"name": "a", "type": "drag", "k": "lots"}):
+            with pytest.raises(ValueError):
+                ForceFields.from_config([entry])
+        with pytest.raises(ValueError):
+            ForceFields.from_config([{"name": "a", "type": "drag"}, {"name": "a", "type": "drag"}])
+
+
+class TestBoundaries:
+    """Tests for world boundaries."""
+
+    def _data(self):
+        return np.array([[-1.0, 5.0, 12.0], [3.0, 11.0, 5.0], [-2.0, 1.0, 2.0], [0.0, 3.0, 1.0]])
+
+    def test_reflect(self):
+        """Reflect clamps onto the wall and flips the velocity across it."""
+        data = self._data()
+        assert reflect(data, 10, 10) is None
+        np.testing.assert_array_equal(data[X], [0, 5, 10])
+        np.testing.assert_array_equal(data[Y], [3, 10, 5])
+        np.testing.assert_array_equal(data[VX], [2, 1, -2])
+        np.testing.assert_array_equal(data[VY], [0, -3, 1])
+
+    def test_periodic(self):
+        """Periodic wraps positions and keeps velocities."""
+        data = self._data()
+        assert periodic(data, 10, 10) is None
+        np.testing.assert_allclose(data[X], [9, 5, 2])
+        np.testing.assert_allclose(data[Y], [3, 1, 5])
+        np.testing.assert_array_equal(data[VX], [-2, 1, 2])
+
+    def test_absorb(self):
+        """Absorb reports the slots outside the world and moves nothing."""
+        data = self._data()
+        assert absorb(data, 10, 10).tolist() == [0, 1, 2]
+        assert absorb(data, 20, 20).tolist() == [0]
+
+
+class TestParticleStore:
+    """Tests for ParticleStore class."""
+
+    def _add(self, store, count, start=0.0):
+        x = np.arange(start, start + count)
+        return store.add(x, x, x, x)
+
+    def test_grows_geometrically(self):
+        """Capacity doubles as particles are added."""
+        store = ParticleStore(capacity=4)
+        ids = self._add(store, 5)
+        assert ids == [0, 1, 2, 3, 4]
+        assert store.capacity == 8
+        self._add(store, 4)
+        assert store.capacity == 16
+        assert store.count == 9
+
+    def test_free_slots_are_reused(self):
+        """Despawned slots are handed out again before the store grows."""
+        store = ParticleStore(capacity=8)
+        self._add(store, 8)
+        assert store.remove([2, 5, 42]) == [2, 5]
+        assert store.holes == 2
+        ids = self._add(store, 2, start=100)
+        assert ids == [8, 9]
+        assert store.capacity == 8
+        assert store.holes == 0
+        assert sorted(store.columns()[0].tolist()) == [0, 1, 3, 4, 6, 7, 100, 101]
+
+    def test_compaction_keeps_ids_stable(self):
+        """Incremental compaction closes holes without changing any particle's id or values."""
+        store = ParticleStore(capacity=64)
+        self._add(store, 64)
+        store.remove(list(range(0, 64, 2)))
+        while store.compact_step(budget=5):
+            pass
+        assert store.holes == 0
+        assert store.high == 32
+        for pid in range(1, 64, 2):
+            assert store.data[0, store.slot(pid)] == pid
+        assert store.slot(0) is None
+        assert isinstance(store.live(), slice)
+
+    def test_shrinks_after_compaction(self):
+        """A mostly empty store gives memory back once compacted."""
+        store = ParticleStore(capacity=64)
+        self._add(store, 1024)
+        store.remove(list(range(1000)))
+        for _ in range(10):
+            store.compact_step()
+        assert store.capacity == 64
+        assert sorted(store.live_ids().tolist()) == list(range(1000, 1024))
+
+    def test_moves_change_layout_not_version(self):
+        """Compaction keeps the id-set version and moves formatted ids with their slots."""
+        store = ParticleStore(capacity=8)
+        self._add(store, 8)
+        assert store.live_names() == [f"p{i:02d}" for i in range(8)]
+        store.remove([0, 1])
+        version, layout = store.version, store.layout
+        store.compact_step()
+        assert store.version == version
+        assert store.layout > layout
+        assert store.live_names() == [format_id(pid) for pid in store.live_ids().tolist()]
+        self._add(store, 1)
+        assert store.live_names()[-1] == "p08"
+
+    def test_allocate_without_reuse_skips_free_list(self):
+        """reuse=False appends past the high-water mark and leaves the holes for later."""
+        store = ParticleStore(capacity=8)
+        self._add(store, 6)
+        store.remove([1, 3])
+        slots = store.allocate(3, reuse=False)
+        assert slots.tolist() == [6, 7, 8]
+        assert store.holes == 2
+        assert [store.slot(pid) for pid in (6, 7, 8)] == [6, 7, 8]
+        view = store.append(2)
+        assert view.shape == (4, 2)
+        view[X] = 7.0
+        assert store.data[X, 9:11].tolist() == [7.0, 7.0]
+        assert store.allocate(2).tolist() == [1, 3]
+
+    def test_needs_compaction_covers_shrinking(self):
+        """A compact but mostly empty store still asks for compaction so it can shrink."""
+        store = ParticleStore(capacity=1024)
+        self._add(store, 1024)
+        store.remove(list(range(100, 1024)))
+        assert not store.holes
+        assert store.needs_compaction
+        while store.needs_compaction:
+            store.compact_step()
+        assert store.capacity == 256
+
+    def test_churn_keeps_memory_bounded(self):
+        """Spawn/despawn cycles next to long-lived particles don't grow the id map."""
+        store = ParticleStore(capacity=64)
+        self._add(store, 100)
+        sizes = []
+        for cycle in range(2000):
+            store.remove(self._add(store, 50, start=1000.0))
+            while store.needs_compaction:
+                store.compact_step()
+            sizes.append(store.nbytes)
+        assert store.next_id == 100 + 2000 * 50
+        assert max(sizes[100:]) <= max(sizes[:100])
+        assert store.mapped <= 2 * 64 + 100
+        assert [store.slot(pid) for pid in (0, 99)] == [0, 99]
+        assert store.slot(store.next_id - 1) is None
+
+    def test_from_arrays_maps_unsorted_ids(self):
+        """A packed store adopts ids in any slot order and still finds each one."""
+        ids = np.array([7, 2, 9, 4], dtype=np.int64)
+        data = np.tile(ids.astype(np.float64), (4, 1))
+        store = ParticleStore.from_arrays(ids, data, next_id=10)
+        assert [store.slot(pid) for pid in (2, 4, 7, 9, 3)] == [1, 3, 0, 2, None]
+        assert store.remove([9, 3]) == [9]
+        assert store.add(*np.ones((4, 1))) == [10]
+        assert store.slot(10) == 2
@@ -0,0 +1,378 @@
+"""Unit tests for trajectory recording and history storage."""
+
+import asyncio
+import os
+
+import numpy as np
+import pytest
+from communication.bus import EventBus
+from simulation.state import EngineCheckpoint, ParticleState, StateSnapshot
+from storage.checkpoint import Checkpointer, CheckpointError, read_checkpoint, write_checkpoint
+from storage.history import HistoryIndex, HistoryService
+from storage.replay import ReplayManager, ReplaySource
+from storage.trajectory import TrajectoryReader, TrajectoryRecorder, TrajectoryWriter, list_recordings
+
+
+def make_snapshot(tick, count=4, ids=None):
+    ids = ids or [f"p{i:02d}" for i in range(count)]
+    particles = [ParticleState(pid, tick + i, 2.0 * i, 1.0, -1.0) for i, pid in enumerate(ids)]
+    return StateSnapshot(tick, tick * 0.5, particles)
+
+
+class TestTrajectoryFile:
+    """Tests for TrajectoryWriter and TrajectoryReader."""
+
+    def test_round_trip(self, tmp_path):
+        """Frames read back with the same ticks, ids and values."""
+        path = tmp_path / "run.trj"
+        writer = TrajectoryWriter(path, world_width=100, world_height=60, tick_interval=0.5)
+        writer.append_many([make_snapshot(t) for t in range(1, 6)])
+        writer.close()
+
+        reader = TrajectoryReader(path)
+        assert len(reader) == 5
+        assert reader.world_width == 100
+        frame = reader.frame(3)
+        assert frame.tick == 3
+        assert frame.time == 1.5
+        assert frame.ids == ["p00", "p01", "p02", "p03"]
+        assert frame.x.dtype == np.float32
+        assert frame.x.tolist() == [3, 4, 5, 6]
+        assert reader.frame(99) is None
+
+    def test_particle_range_is_zero_copy(self, tmp_path):
+        """Particle slices are views into the memory map."""
+        path = tmp_path / "run.trj"
+        writer = TrajectoryWriter(path)
+        writer.append(make_snapshot(1, count=10))
+        writer.close()
+
+        part = TrajectoryReader(path).particles(1, 2, 5)
+        assert part.ids == ["p02", "p03", "p04"]
+        assert part.y.tolist() == [4, 6, 8]
+        assert not part.y.flags.owndata
+
+    def test_id_table_changes(self, tmp_path):
+        """Frames after a particle-set change use the new id table."""
+        path = tmp_path / "run.trj"
+        writer = TrajectoryWriter(path)
+        writer.append(make_snapshot(1, ids=["a", "b"]))
+        writer.append(make_snapshot(2, ids=["a", "b", "c"]))
+        writer.close()
+
+        reader = TrajectoryReader(path)
+        assert reader.frame(1).ids == ["a", "b"]
+        assert reader.frame(2).ids == ["a", "b", "c"]
+
+    def test_refresh_sees_appended_frames(self, tmp_path):
+        """A reader picks up frames appended after it was opened."""
+        path = tmp_path / "run.trj"
+        writer = TrajectoryWriter(path)
+        writer.append(make_snapshot(1))
+        reader = TrajectoryReader(path)
+        writer.append(make_snapshot(2))
+        assert len(reader) == 1
+        reader.refresh()
+        assert reader.ticks.tolist() == [1, 2]
+        writer.close()
+
+    def test_refresh_remaps_only_changed_files(self, tmp_path):
+        """Refresh is a no-op for unchanged files and closes the maps it replaces."""
+        path = tmp_path / "run.trj"
+        writer = TrajectoryWriter(path)
+        writer.append(make_snapshot(1))
+        reader = TrajectoryReader(path)
+        mapped = reader._data_mm
+        assert reader.refresh() is False
+        assert reader._data_mm is mapped
+
+        writer.append(make_snapshot(2))
+        writer.close()
+        assert reader.refresh() is True
+        assert mapped.closed
+        assert len(reader) == 2
+
+
+class TestTrajectoryRecorder:
+    """Tests for the bus-driven recorder."""
+
+    @pytest.mark.asyncio
+    async def test_records_from_bus(self, tmp_path):
+        """Snapshots published on the bus end up in a recording."""
+        bus = EventBus(queue_size=10)
+        recorder = TrajectoryRecorder(bus, tmp_path)
+        await recorder.start()
+        for tick in range(1, 4):
+            await bus.publish(make_snapshot(tick))
+        await bus.publish({"kind": "paused"})
+        await asyncio.sleep(0.05)
+        await recorder.stop()
+
+        paths = list_recordings(str(tmp_path))
+        assert len(paths) == 1
+        assert TrajectoryReader(paths[0]).ticks.tolist() == [1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_reset_starts_new_recording(self, tmp_path):
+        """Tick regression rolls over to a new file."""
+        bus = EventBus(queue_size=10)
+        recorder = TrajectoryRecorder(bus, tmp_path)
+        await recorder.start()
+        for tick in (1, 2, 1):
+            await bus.publish(make_snapshot(tick))
+        await recorder.stop()
+
+        assert len(list_recordings(str(tmp_path))) == 2
+
+    @pytest.mark.asyncio
+    async def test_repeated_tick_is_skipped(self, tmp_path):
+        """A paused engine republishing its tick doesn't start a new recording."""
+        bus = EventBus(queue_size=10)
+        recorder = TrajectoryRecorder(bus, tmp_path)
+        await recorder.start()
+        for tick in (1, 2, 2, 2, 3):
+            await bus.publish(make_snapshot(tick))
+        await asyncio.sleep(0.05)
+        await recorder.stop()
+
+        paths = list_recordings(str(tmp_path))
+        assert len(paths) == 1
+        assert TrajectoryReader(paths[0]).ticks.tolist() == [1, 2, 3]
+        assert recorder.recorded == 3
+
+
+def write_recording(path, ticks, tick_interval=0.5):
+    writer = TrajectoryWriter(path, world_width=100, world_height=60, tick_interval=tick_interval)
+    writer.append_many([make_snapshot(t) for t in ticks])
+    writer.close()
+    return path
+
+
+class TestReplaySource:
+    """Tests for ReplaySource class."""
+
+    @pytest.mark.asyncio
+    async def test_streams_frames_in_order(self, tmp_path):
+        """Replay publishes recorded frames onto the bus."""
+        path = write_recording(tmp_path / "run.trj", range(1, 6))
+        bus = EventBus(queue_size=20)
+        sub = await bus.subscribe("ui")
+        source = ReplaySource(bus, path, speed=10)
+        await source.start()
+        ticks = [(await asyncio.wait_for(sub.queue.get(), timeout=1.0)).tick for _ in range(5)]
+        await source.stop()
+
+        assert ticks == [1, 2, 3, 4, 5]
+        assert source.tick == 5
+
+    @pytest.mark.asyncio
+    async def test_announces_end_once(self, tmp_path):
+        """After the last frame, subscribers get one replay_end event; a seek re-arms it."""
+        path = write_recording(tmp_path / "run.trj", range(1, 4))
+        bus = EventBus(queue_size=20)
+        sub = await bus.subscribe("ui")
+        source = ReplaySource(bus, path, speed=10)
+        await source.start()
+        items = [await asyncio.wait_for(sub.queue.get(), timeout=1.0) for _ in range(4)]
+        assert [item.tick for item in items[:3]] == [1, 2, 3]
+        assert items[3] == {"kind": "replay_end", "tick": 3}
+        await asyncio.sleep(0.05)
+        assert sub.queue.empty()
+
+        await source.seek(3)
+        items = [await asyncio.wait_for(sub.queue.get(), timeout=1.0) for _ in range(2)]
+        await source.stop()
+        assert items[0].tick == 3
+        assert items[1]["kind"] == "replay_end"
+
+    @pytest.mark.asyncio
+    async def test_seek_and_pause(self, tmp_path):
+        """Seek jumps to the requested tick; pause stops publishing."""
+        path = write_recording(tmp_path / "run.trj", range(1, 201))
+        bus = EventBus(queue_size=500)
+        sub = await bus.subscribe("ui")
+        source = ReplaySource(bus, path, speed=20)
+        await source.pause()
+        await source.start()
+        await source.seek(150)
+        await source.resume()
+        first = await asyncio.wait_for(sub.queue.get(), timeout=1.0)
+        await source.pause()
+        await asyncio.sleep(0.05)
+        published = source.published
+        await asyncio.sleep(0.05)
+        await source.stop()
+
+        assert first.tick == 150
+        assert source.published == published
+
+    @pytest.mark.asyncio
+    async def test_high_speed_skips_frames(self, tmp_path):
+        """At high speed the publish stride keeps the frame rate bounded."""
+        path = write_recording(tmp_path / "run.trj", range(1, 11), tick_interval=0.5)
+        source = ReplaySource(EventBus(), path, speed=100, max_fps=30)
+        assert source.stride == 7  # 200 recorded frames/s over a 30 fps cap
+        source.set_speed(1000)
+        assert source.speed == 100
+
+    @pytest.mark.asyncio
+    async def test_manager_confines_names(self, tmp_path):
+        """Recording names cannot escape the recordings directory."""
+        write_recording(tmp_path / "run.trj", [1])
+        manager = ReplayManager(EventBus(), str(tmp_path))
+        assert manager.recordings() == ["run.trj"]
+        assert manager.resolve("run") == str(tmp_path / "run.trj")
+        with pytest.raises(FileNotFoundError):
+            manager.resolve("../../etc/passwd")
+
+
+class TestHistoryIndex:
+    """Tests for HistoryIndex queries."""
+
+    def _record(self, path):
+        writer = TrajectoryWriter(path, world_width=100, world_height=60)
+        for tick in range(1, 41):
+            ids = ["a", "b"] if tick <= 20 else ["b", "c"]
+            particles = [ParticleState(pid, 2.0 * tick + slot, 10.0 * slot, 1.0, 0.0)
+                         for slot, pid in enumerate(ids)]
+            writer.append(StateSnapshot(tick, tick * 0.5, particles))
+        writer.close()
+        return path
+
+    def test_particle_track_follows_slot_changes(self, tmp_path):
+        """Tracks span id-table changes and respect the tick range."""
+        index = HistoryIndex(self._record(tmp_path / "run.trj"), chunk_frames=8).update()
+        rows = list(index.track("b", 18, 23))
+        assert [row[0] for row in rows] == [18, 19, 20, 21, 22, 23]
+        assert rows[0][1:3] == [37.0, 10.0]  # slot 1 before tick 21
+        assert rows[-1][1:3] == [46.0, 0.0]  # slot 0 afterwards
+        assert list(index.track("a", 30, 40)) == []
+
+    def test_box_query_skips_chunks(self, tmp_path):
+        """Box queries only return frames whose particles fall inside."""
+        index = HistoryIndex(self._record(tmp_path / "run.trj"), chunk_frames=8).update()
+        frames = list(index.box(0, 0, 10, 5))
+        assert [tick for tick, _ in frames] == [1, 2, 3, 4, 5]
+        assert frames[0][1] == [["a", 2.0, 0.0, 1.0, 0.0]]
+        assert list(index.box(0, 0, 10, 5, start_tick=9, end_tick=40)) == []
+
+    def test_index_persists_and_extends(self, tmp_path):
+        """The sidecar index is reused and extended when the recording grows."""
+        path = self._record(tmp_path / "run.trj")
+        HistoryIndex(path, chunk_frames=8).update()
+        writer = TrajectoryWriter(path)
+        writer.append(StateSnapshot(41, 20.5, [ParticleState("c", 90.0, 50.0, 0.0, 0.0)]))
+        writer.close()
+
+        index = HistoryIndex(path, chunk_frames=8)
+        assert index.frames == 40
+        index.update()
+        assert index.frames == 41
+        assert [tick for tick, _ in index.box(85, 45, 95, 55)] == [41]
+
+    def test_evicted_index_stays_open_while_leased(self, tmp_path):
+        """LRU eviction of an index with a running query defers the close to release()."""
+        self._record(tmp_path / "a.trj")
+        self._record(tmp_path / "b.trj")
+        service = HistoryService(str(tmp_path), max_open=1, chunk_frames=8)
+        index = service.get("a.trj")
+        rows = index.track("b")
+        next(rows)
+        service.get("b.trj").release()  # evicts a.trj
+        assert len(list(rows)) == 39
+        index.release()
+        assert index.reader._data_mm is None
+        service.close()
+
+
+class TestCheckpointFile:
+    """Tests for the binary checkpoint format."""
+
+    def _checkpoint(self, count=5):
+        ids = np.arange(10, 10 + count, dtype=np.int64)
+        data = np.arange(4 * count, dtype=np.float64).reshape(4, count)
+        rng = np.random.default_rng(7)
+        forces = [{"name": "down", "type": "gravity", "enabled": False, "x": 0.0, "y": 9.8}]
+        return EngineCheckpoint(42, 8.4, 99, ids, data, rng.bit_generator.state, {"tick_interval": 0.1},
+                                forces, 6)
+
+    def test_round_trip(self, tmp_path):
+        """Arrays, clock, RNG state, params, force fields and absorbed count survive a write and read."""
+        path = tmp_path / "a.ckpt"
+        original = self._checkpoint()
+        write_checkpoint(path, original)
+        restored = read_checkpoint(path)
+        assert (restored.tick, restored.sim_time, restored.next_id) == (42, 8.4, 99)
+        np.testing.assert_array_equal(restored.ids, original.ids)
+        np.testing.assert_array_equal(restored.data, original.data)
+        assert restored.rng_state == original.rng_state
+        assert restored.params == {"tick_interval": 0.1}
+        assert restored.forces == original.forces
+        assert restored.absorbed == 6
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_mapped_arrays_are_private(self, tmp_path):
+        """Restored arrays are writable and writes never reach the file."""
+        path = tmp_path / "a.ckpt"
+        write_checkpoint(path, self._checkpoint())
+        restored = read_checkpoint(path)
+        restored.data[0, 0] = -1.0
+        assert read_checkpoint(path).data[0, 0] == 0.0
+
+    def test_rejects_bad_files(self, tmp_path):
+        """Wrong magic and truncated files raise CheckpointError."""
+        path = tmp_path / "a.ckpt"
+        path.write_bytes(b"nope" * 16)
+        with pytest.raises(CheckpointError):
+            read_checkpoint(path)
+        write_checkpoint(path, self._checkpoint())
+        path.write_bytes(path.read_bytes()[:-8])
+        with pytest.raises(CheckpointError):
+            read_checkpoint(path)
+
+
+class _FakeEngine:
+    def __init__(self, checkpoint):
+        self.saved = checkpoint
+        self.restored = None
+
+    async def checkpoint(self):
+        return self.saved
+
+    async def restore(self, checkpoint):
+        self.restored = checkpoint
+
+
+class TestCheckpointer:
+    """Tests for periodic checkpoints."""
+
+    @pytest.mark.asyncio
+    async def test_keeps_newest(self, tmp_path):
+        """Only the newest `keep` checkpoints stay on disk."""
+        engine = _FakeEngine(TestCheckpointFile()._checkpoint())
+        checkpointer = Checkpointer(engine, tmp_path, keep=2)
+        paths = [await checkpointer.save() for _ in range(3)]
+        assert checkpointer.checkpoints() == [os.path.basename(p) for p in paths[1:]]
+        assert checkpointer.get_stats()["saved"] == 3
+
+    @pytest.mark.asyncio
+    async def test_restore_resolves_inside_directory(self, tmp_path):
+        """Names are confined to the checkpoint directory."""
+        engine = _FakeEngine(TestCheckpointFile()._checkpoint())
+        checkpointer = Checkpointer(engine, tmp_path)
+        name = os.path.basename(await checkpointer.save())
+        assert await checkpointer.restore(name[:-len(".ckpt")]) == 42
+        assert engine.restored.tick == 42
+        assert checkpointer.resolve("../../" + name) == os.path.join(str(tmp_path), name)
+        with pytest.raises(FileNotFoundError):
+            await checkpointer.restore("missing")
+
+    @pytest.mark.asyncio
+    async def test_periodic(self, tmp_path):
+        """A positive interval saves in the background."""
+        engine = _FakeEngine(TestCheckpointFile()._checkpoint())
+        checkpointer = Checkpointer(engine, tmp_path, interval=0.01)
+        await checkpointer.start()
+        await asyncio.sleep(0.1)
+        await checkpointer.stop()
+        assert checkpointer.saved >= 2
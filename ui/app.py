@@ -7,23 +7,41 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 
+from communication.admission import LEVELS, AdmissionController, LoadShedder
 from communication.bus import EventBus
-from config import load_config
+from config import ConfigWatcher, load_config
 from internal.health import (
     get_health_checker,
-    check_event_loop,
+    LoopLagMonitor,
     create_bus_check,
     create_engine_check,
     create_logger_check,
+    create_loop_check,
+    create_shedding_check,
 )
 from internal.logging import get_logger, LogLevel, StructuredLogger, AsyncFileLogger
+from internal.metrics import (
+    get_registry,
+    register_bus_metrics,
+    register_engine_metrics,
+    register_logger_metrics,
+)
+from internal.state_log import StateLogMode, StateLogPolicy
 from utils.crash import create_async_handler
 from simulation.engine import SimulationEngine
+from simulation.registry import WorldRegistry
+from simulation.scheduler import TickScheduler
 from simulation.state import StateSnapshot
-from ui.routes import control, api, health
+from simulation.threaded import ThreadedEngine
+from storage.checkpoint import Checkpointer
+from storage.history import HistoryService
+from storage.replay import ReplayManager
+from storage.trajectory import TrajectoryRecorder
+from ui.routes import control, api, checkpoint, health, history, metrics, replay, worlds
+from ui.streaming import ClosingStreamingResponse
 
 
 def create_app():
@@ -37,9 +55,56 @@ def create_app():
 
     # Create core components
     bus = EventBus(queue_size=100)
-    engine = SimulationEngine(bus=bus, config=config.simulation)
-    file_logger = AsyncFileLogger(file_path=config.logging.file)
+    engine_class = ThreadedEngine if config.simulation.threaded else SimulationEngine
+    engine = engine_class(bus=bus, config=config.simulation)
+    world_registry = WorldRegistry(config.simulation, TickScheduler(park_after=config.worlds.park_after),
+                                   limit=config.worlds.limit)
+    world_registry.add(WorldRegistry.DEFAULT, engine)
+    for name, overrides in config.worlds.configs.items():
+        world_registry.add(name, world_registry.new_engine(overrides))
+    file_logger = AsyncFileLogger(file_path=config.logging.file,
+                                  max_bytes=config.logging.max_bytes,
+                                  rotate_interval=config.logging.rotate_interval,
+                                  backup_count=config.logging.backup_count,
+                                  max_total_bytes=config.logging.max_total_bytes,
+                                  compress=config.logging.compress)
+    state_policy = StateLogPolicy(mode=config.logging.state_mode,
+                                  every=config.logging.state_every,
+                                  delta_threshold=config.logging.state_delta_threshold,
+                                  budget=config.logging.state_budget)
+    admission = AdmissionController(max_clients=config.server.max_clients,
+                                    max_per_ip=config.server.max_clients_per_ip,
+                                    retry_after=config.server.retry_after)
+    loop_monitor = LoopLagMonitor(degraded_lag=config.server.lag_threshold,
+                                  fail_lag=config.server.lag_fail_threshold)
+    shedder = LoadShedder(bus, engine, overrun_threshold=config.server.overrun_threshold,
+                          lag_threshold=config.server.lag_threshold, loop_monitor=loop_monitor,
+                          worlds=world_registry)
+    recorder = None
+    if config.recording.enabled:
+        recorder = TrajectoryRecorder(bus, config.recording.dir,
+                                      world_width=config.simulation.world_width,
+                                      world_height=config.simulation.world_height,
+                                      tick_interval=config.simulation.tick_interval,
+                                      queue_size=config.recording.queue_size)
+    replay_manager = ReplayManager(EventBus(queue_size=100), config.recording.dir)
+    history_service = HistoryService(config.recording.dir)
+    checkpointer = Checkpointer(engine, config.checkpoint.dir, interval=config.checkpoint.interval,
+                                keep=config.checkpoint.keep)
     health_checker = get_health_checker()
+    config_watcher = ConfigWatcher(interval=config.server.config_reload_interval, config=config)
+
+    registry = get_registry()
+    register_engine_metrics(registry, engine)
+    register_bus_metrics(registry, bus)
+    register_logger_metrics(registry, file_logger)
+    registry.counter("sim_sse_rejected_total", "Stream clients refused by admission control",
+                     fn=lambda: admission.rejected)
+    registry.gauge("sim_load_level", "Load shedding level (0 normal, 1 reduced rate, 2 shedding)",
+                   fn=lambda: LEVELS.index(shedder.level))
+    sse_clients = registry.gauge("sim_sse_clients", "Connected stream clients")
+    sse_events = registry.counter("sim_sse_events_total", "Events written to stream clients")
+    sse_skipped = registry.counter("sim_sse_frames_skipped_total", "Frames skipped for stream clients under load")
 
     @asynccontextmanager
     async def lifespan(app: FastAPI):
@@ -49,40 +114,61 @@ def create_app():
         loop.set_exception_handler(create_async_handler(logger_instance))
         
         await file_logger.start()
-        log_sub = await bus.subscribe("logger", max_queue_size=200)
+        # In events mode the logger takes no snapshots, so it doesn't keep the engine building them
+        log_topics = {""} if state_policy.mode == StateLogMode.EVENTS else None
+        log_sub = await bus.subscribe("logger", max_queue_size=200, topics=log_topics, priority=10)
 
         async def log_worker():
             while True:
                 try:
                     item = await log_sub.queue.get()
                     if isinstance(item, StateSnapshot):
-                        file_logger.try_log("state", item.to_dict())
+                        record = state_policy.select(item)
+                        if record is not None:
+                            file_logger.try_log(state_policy.kind, record)
                     else:
                         file_logger.try_log("event", item)
                 except Exception as e:
                     logger_instance.warn("Log worker error", error=e)
 
         app.state.log_worker = asyncio.create_task(log_worker())
+        if recorder:
+            await recorder.start()
         
-        health_checker.register("event_loop", check_event_loop, critical=True)
+        await loop_monitor.start()
+        health_checker.register("event_loop", create_loop_check(loop_monitor), critical=True)
         health_checker.register("event_bus", create_bus_check(bus), critical=True)
         health_checker.register("simulation_engine", create_engine_check(engine), critical=True)
         health_checker.register("async_logger", create_logger_check(file_logger), critical=False)
+        health_checker.register("load_shedding", create_shedding_check(shedder), critical=False)
+        await health_checker.start()
         
-        await engine.start()
+        await world_registry.start()
+        await checkpointer.start()
+        await shedder.start()
+        await config_watcher.start(control.apply_config)
         logger_instance.info("Application started successfully")
         
         yield
         
         # Shutdown
         logger_instance.info("Application shutting down")
-        await engine.stop()
+        await health_checker.stop()
+        await config_watcher.stop()
+        await shedder.stop()
+        await replay_manager.unload()
+        await checkpointer.stop()
+        await world_registry.stop()
         if hasattr(app.state, "log_worker"):
             app.state.log_worker.cancel()
             try:
                 await app.state.log_worker
             except asyncio.CancelledError:
                 pass
+        if recorder:
+            await recorder.stop()
+        history_service.close()
+        await loop_monitor.stop()
         await file_logger.stop()
         logger_instance.info("Application shutdown complete")
 
@@ -98,14 +184,25 @@ def create_app():
     app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
     # Initialize route modules with dependencies
-    control.init(engine, bus)
-    api.init(engine, bus, file_logger)
+    control.init(engine, bus, config_watcher, world_registry)
+    api.init(engine, bus, file_logger, admission, shedder, loop_monitor, config_watcher, checkpointer,
+             world_registry)
+    worlds.init(world_registry, bus)
+    checkpoint.init(checkpointer, bus)
     health.init(engine, health_checker)
+    replay.init(replay_manager)
+    history.init(history_service)
+    metrics.init(registry)
 
     # Include routers
     app.include_router(control.router)
     app.include_router(api.router)
     app.include_router(health.router)
+    app.include_router(replay.router)
+    app.include_router(checkpoint.router)
+    app.include_router(worlds.router)
+    app.include_router(history.router)
+    app.include_router(metrics.router)
 
     # ===================================================================
     # WEB UI & Server-Sent Events (SSE) section, just keeping it here for the direct bus access
@@ -118,17 +215,51 @@ def create_app():
         return html_path.read_text(encoding="utf-8")
 
     @app.get("/events")
-    async def events(request: Request):
-        """SSE endpoint - streams state updates to clients."""
+    async def events(request: Request, source: str = "live", world: str | None = None):
+        """SSE endpoint - streams state updates to clients.
+
+        `world` picks a world other than the default one. `source=replay`
+        streams the currently loaded recording instead of the live engine.
+        """
+        stream_bus, stream_source = bus, engine
+        if world is not None and source != "replay":
+            stream_source = world_registry.get(world)
+            if stream_source is None:
+                return JSONResponse(content={"detail": f"Unknown world {world!r}"}, status_code=404)
+            stream_bus = stream_source.bus
+        if source == "replay":
+            if replay_manager.source is None:
+                return JSONResponse(content={"detail": "No replay loaded"}, status_code=404)
+            stream_bus, stream_source = replay_manager.bus, replay_manager.source
+
+        client_ip = request.client.host if request.client else "unknown"
+        if not shedder.accepting or not admission.try_acquire(client_ip):
+            return JSONResponse(content={"detail": "Too many stream clients"}, status_code=503,
+                                headers={"Retry-After": str(admission.retry_after)})
+
         subscriber_name = f"ui-{uuid.uuid4().hex[:8]}"
-        sub = await bus.subscribe(subscriber_name, max_queue_size=10)
+        try:
+            sub = await stream_bus.subscribe(subscriber_name, max_queue_size=10)
+        except Exception:
+            admission.release(client_ip)
+            raise
+        if source != "replay":
+            stream_source.wake()  # a world parked for lack of viewers starts ticking again
+
+        async def release():
+            admission.release(client_ip)
+            await stream_bus.unsubscribe(subscriber_name)
 
         async def event_generator():
+            frames = 0
+            sse_clients.inc()
             try:
-                snapshot = await engine.get_snapshot()
-                yield format_sse("state", snapshot.to_dict())
+                snapshot = await stream_source.get_snapshot()
+                if snapshot is not None:
+                    sse_events.inc()
+                    yield format_sse("state", snapshot.to_dict())
 
-                while True:
+                while not sub.closed:
                     if await request.is_disconnected():
                         break
 
@@ -139,13 +270,20 @@ def create_app():
                         continue
 
                     if isinstance(item, StateSnapshot):
+                        # Under load, only every Nth frame goes out to stream clients
+                        frames += 1
+                        if frames % shedder.stream_stride:
+                            sse_skipped.inc()
+                            continue
+                        sse_events.inc()
                         yield format_sse("state", item.to_dict())
                     else:
+                        sse_events.inc()
                         yield format_sse("event", item)
             finally:
-                await bus.unsubscribe(subscriber_name)
+                sse_clients.dec()
 
-        return StreamingResponse(event_generator(), media_type="text/event-stream")
+        return ClosingStreamingResponse(event_generator(), on_close=release, media_type="text/event-stream")
 
     return app
 
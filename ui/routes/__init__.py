@@ -1,5 +1,5 @@
 """Route modules."""
 
-from ui.routes import control, api, health
+from ui.routes import control, api, health, history, metrics, replay
 
-__all__ = ["control", "api", "health"]
\ No newline at end of file
+__all__ = ["control", "api", "health", "history", "metrics", "replay"]
\ No newline at end of file
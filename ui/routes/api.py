@@ -1,7 +1,11 @@
 """API routes for stats and subscribers."""
 
-from fastapi import APIRouter, Depends
+import asyncio
 
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from internal.profiler import SamplingProfiler, collapse
 from utils.timestamp import format_timestamp
 from ui.auth import verify_basic_auth
 
@@ -11,36 +15,116 @@ router = APIRouter(prefix="/api/v1", tags=["api"])
 _engine = None
 _bus = None
 _file_logger = None
+_admission = None
+_shedder = None
+_loop_monitor = None
+_config_watcher = None
+_checkpointer = None
+_worlds = None
+_profiler = SamplingProfiler()
 
 
-def init(engine, bus, file_logger):
-    """Initialize with engine, bus, and logger references."""
-    global _engine, _bus, _file_logger
+def init(engine, bus, file_logger, admission=None, shedder=None, loop_monitor=None, config_watcher=None,
+         checkpointer=None, worlds=None):
+    """Initialize with engine, bus, logger, load-control and loop monitor references."""
+    global _engine, _bus, _file_logger, _admission, _shedder, _loop_monitor, _config_watcher, _checkpointer
+    global _worlds
     _engine = engine
     _bus = bus
     _file_logger = file_logger
+    _admission = admission
+    _shedder = shedder
+    _loop_monitor = loop_monitor
+    _config_watcher = config_watcher
+    _checkpointer = checkpointer
+    _worlds = worlds
 
 
 @router.get("/stats")
 async def stats(username=Depends(verify_basic_auth)):
     """Return bus and simulation statistics (requires basic auth)."""
     bus_stats = _bus.get_stats()
-    snapshot = await _engine.get_snapshot()
+    status = _engine.status
     logger_stats = _file_logger.get_stats()
-    return {
+    result = {
         "timestamp": format_timestamp(),
         "simulation": {
-            "tick": snapshot.tick,
-            "sim_time_s": snapshot.sim_time_s,
-            "entity_count": len(snapshot.particles),
-            "paused": _engine.paused,
+            "tick": status.tick,
+            "sim_time_s": status.sim_time,
+            "entity_count": status.particle_count,
+            "paused": status.state == "paused",
+            "last_tick_duration_s": status.last_tick_duration,
+            "last_publish_time": status.last_publish_time,
+            "store": _engine.store.get_stats(),
+            "history": _engine.history.get_stats(),
+            "tick_phases": _engine.tick_stats.summary(),
+            "seed": _engine.seed,
+            "integrator": _engine.integrator.name,
+            "boundary": _engine.config.boundary,
+            "absorbed": _engine.absorbed,
+            "mode": _engine.mode,
+            "frames_coalesced": _engine.coalesced,
         },
         "bus": bus_stats,
         "logger": logger_stats,
     }
+    if _admission:
+        result["admission"] = _admission.get_stats()
+    if _shedder:
+        result["load"] = _shedder.get_stats()
+    if _loop_monitor:
+        result["loop"] = _loop_monitor.get_stats()
+    if _config_watcher:
+        result["config"] = _config_watcher.get_stats()
+    if _checkpointer:
+        result["checkpoint"] = _checkpointer.get_stats()
+    if _worlds is not None:
+        result["worlds"] = _worlds.get_stats()
+    return result
 
 
 @router.get("/subscribers")
 async def subscribers(username=Depends(verify_basic_auth)):
     """Return info about all current subscribers (requires basic auth)."""
     return await _bus.get_subscriber_info()
+
+
+@router.get("/frames")
+async def frames(start: int = Query(..., ge=0), end: int = Query(..., ge=0),
+                 limit: int = Query(500, ge=1, le=5000), username=Depends(verify_basic_auth)):
+    """Recent frames between two ticks from the in-memory history (requires basic auth)."""
+    window = await _engine.between_ticks(_engine.history.window, start, end, limit)
+    return {
+        "history": _engine.history.get_stats(),
+        "frames": [snapshot.to_dict() for snapshot in window],
+    }
+
+
+@router.get("/frames/{tick}")
+async def frame(tick: int, username=Depends(verify_basic_auth)):
+    """One recent frame from the in-memory history (requires basic auth)."""
+    snapshot = await _engine.between_ticks(_engine.history.get, tick)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"Tick {tick} is not in history")
+    return snapshot.to_dict()
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(seconds: float = Query(5.0, gt=0, le=60), interval_ms: float = Query(5.0, ge=1, le=1000),
+                  mode: str = Query("all", pattern="^(all|engine)$"), username=Depends(verify_basic_auth)):
+    """Sample stacks for `seconds` and return them collapsed for flamegraph tools (requires basic auth).
+
+    `mode=engine` keeps only samples taken while the engine tick is running, on
+    whichever thread the engine ticks.
+    """
+    thread_id = within = None
+    if mode == "engine":
+        thread_id, within = _engine.profile_target()
+    try:
+        stacks = await asyncio.to_thread(_profiler.profile, seconds, interval_ms / 1000, thread_id, within)
+    except RuntimeError:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    return PlainTextResponse(collapse(stacks), headers={
+        "X-Profile-Samples": str(_profiler.last_samples),
+        "X-Profile-Matched": str(_profiler.last_matched),
+    })
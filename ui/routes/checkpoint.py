@@ -0,0 +1,51 @@
+"""Checkpoint routes: save the engine to disk and restore it."""
+
+import os
+import time
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from storage.checkpoint import CheckpointError
+from ui.auth import verify_basic_auth
+
+router = APIRouter(prefix="/api/v1/checkpoint", tags=["checkpoint"])
+
+# Set by app.py
+_checkpointer = None
+_bus = None
+
+
+def init(checkpointer, bus):
+    """Initialize with the checkpointer and the live bus."""
+    global _checkpointer, _bus
+    _checkpointer = checkpointer
+    _bus = bus
+
+
+@router.get("/list")
+async def checkpoints(username=Depends(verify_basic_auth)):
+    """List saved checkpoints, oldest first (requires basic auth)."""
+    return {"checkpoints": _checkpointer.checkpoints()}
+
+
+@router.post("/save")
+async def save(username=Depends(verify_basic_auth)):
+    """Checkpoint the engine now (requires basic auth)."""
+    try:
+        path = await _checkpointer.save()
+    except OSError as exc:
+        raise HTTPException(status_code=500, detail=f"Checkpoint failed: {exc}")
+    return {"ok": True, "name": os.path.basename(path), **_checkpointer.get_stats()}
+
+
+@router.post("/restore")
+async def restore(name: str, username=Depends(verify_basic_auth)):
+    """Restore the engine from a saved checkpoint (requires basic auth)."""
+    try:
+        tick = await _checkpointer.restore(name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown checkpoint: {name}")
+    except (CheckpointError, ValueError, KeyError) as exc:
+        raise HTTPException(status_code=422, detail=f"Invalid checkpoint: {exc}")
+    await _bus.publish({"kind": "restored", "tick": tick, "name": name, "timestamp": time.time()})
+    return {"ok": True, "tick": tick}
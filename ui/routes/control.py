@@ -1,9 +1,16 @@
-"""Simulation control routes."""
+"""Simulation control routes.
+
+Commands are queued on the engine and applied at the next tick boundary;
+each route answers once its command has taken effect. `?world=` picks the
+world to control; without it the default world is used.
+"""
 
 import time
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 
+from internal.logging import get_logger
+from simulation.commands import PARAMS, CommandKind
 from ui.auth import verify_basic_auth
 
 router = APIRouter(prefix="/api/v1/control", tags=["control"])
@@ -11,34 +18,158 @@ router = APIRouter(prefix="/api/v1/control", tags=["control"])
 # These will be set by app.py
 _engine = None
 _bus = None
+_watcher = None
+_worlds = None
 
 
-def init(engine, bus):
-    """Initialize with engine and bus references."""
-    global _engine, _bus
+def init(engine, bus, watcher=None, worlds=None):
+    """Initialize with engine and bus references, and the world registry if there is one."""
+    global _engine, _bus, _watcher, _worlds
     _engine = engine
     _bus = bus
+    _watcher = watcher
+    _worlds = worlds
+
+
+def world_engine(world: str | None = Query(None)):
+    """The engine of `world`, the default engine when omitted."""
+    if world is None:
+        return _engine
+    engine = _worlds.get(world) if _worlds is not None else None
+    if engine is None:
+        raise HTTPException(status_code=404, detail=f"Unknown world {world!r}")
+    return engine
+
+
+async def _apply(engine, kind, args=None):
+    try:
+        future = engine.submit(kind, **(args or {}))
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return await future
+
+
+def restart_required():
+    """Fields changed by the last config reload that only take effect on restart."""
+    if _watcher is None:
+        return []
+    live = {f"simulation.{name}" for name in PARAMS}
+    return [name for name in _watcher.changes if name not in live]
+
+
+async def apply_config(config):
+    """Apply the live-changeable simulation fields of a reloaded Config.
+
+    Returns the changed params, empty when nothing differs. Other changed
+    fields are logged as needing a restart.
+    """
+    restart = restart_required()
+    if restart:
+        get_logger().warn("config changes need a restart", fields=restart)
+    changed = {name: getattr(config.simulation, name) for name in PARAMS
+               if getattr(config.simulation, name) != getattr(_engine.config, name)}
+    if not changed:
+        return {}
+    await _engine.submit(CommandKind.PARAMS, **changed)
+    await _bus.publish({"kind": "params", "params": changed, "timestamp": time.time()})
+    return changed
 
 
 @router.post("/pause")
-async def pause(username=Depends(verify_basic_auth)):
+async def pause(engine=Depends(world_engine), username=Depends(verify_basic_auth)):
     """Pause simulation (requires basic auth)."""
-    await _engine.pause()
-    await _bus.publish({"kind": "paused", "timestamp": time.time()})
-    return {"ok": True}
+    result = await _apply(engine, CommandKind.PAUSE)
+    await engine.bus.publish({"kind": "paused", "timestamp": time.time()})
+    return {"ok": True, **result}
 
 
 @router.post("/resume")
-async def resume(username=Depends(verify_basic_auth)):
+async def resume(engine=Depends(world_engine), username=Depends(verify_basic_auth)):
     """Resume simulation (requires basic auth)."""
-    await _engine.resume()
-    await _bus.publish({"kind": "resumed", "timestamp": time.time()})
-    return {"ok": True}
+    result = await _apply(engine, CommandKind.RESUME)
+    await engine.bus.publish({"kind": "resumed", "timestamp": time.time()})
+    return {"ok": True, **result}
 
 
 @router.post("/reset")
-async def reset(username=Depends(verify_basic_auth)):
+async def reset(engine=Depends(world_engine), username=Depends(verify_basic_auth)):
     """Reset simulation (requires basic auth)."""
-    _engine.reset()
-    await _bus.publish({"kind": "reset", "timestamp": time.time()})
-    return {"ok": True}
+    result = await _apply(engine, CommandKind.RESET)
+    await engine.bus.publish({"kind": "reset", "timestamp": time.time()})
+    return {"ok": True, **result}
+
+
+@router.post("/spawn")
+async def spawn(count: int = Query(1, ge=1, le=1_000_000), particles: list[list[float]] | None = Body(None, embed=True),
+                engine=Depends(world_engine), username=Depends(verify_basic_auth)):
+    """Add `count` random particles, or the given [x, y, vx, vy] rows (requires basic auth)."""
+    if particles is not None:
+        result = await _apply(engine, CommandKind.SPAWN, {"particles": particles})
+    else:
+        result = await _apply(engine, CommandKind.SPAWN, {"count": count})
+    if not result.get("dropped"):  # a reset in the same tick replaced the population
+        await engine.bus.publish({"kind": "spawned", "count": len(result["ids"]), "timestamp": time.time()})
+    return {"ok": True, **result}
+
+
+@router.post("/despawn")
+async def despawn(count: int | None = Query(None, ge=1), ids: list[str] | None = Body(None, embed=True),
+                  engine=Depends(world_engine), username=Depends(verify_basic_auth)):
+    """Remove the particles in `ids`, or `count` random ones (requires basic auth)."""
+    if ids is not None:
+        result = await _apply(engine, CommandKind.DESPAWN, {"ids": ids})
+    elif count is not None:
+        result = await _apply(engine, CommandKind.DESPAWN, {"count": count})
+    else:
+        raise HTTPException(status_code=422, detail="Pass ids or count")
+    if not result.get("dropped"):  # a reset in the same tick replaced the population
+        await engine.bus.publish({"kind": "despawned", "count": len(result["ids"]), "timestamp": time.time()})
+    return {"ok": True, **result}
+
+
+@router.post("/params")
+async def params(values: dict = Body(...), engine=Depends(world_engine),
+                 username=Depends(verify_basic_auth)):
+    """Change simulation parameters such as tick_interval or world size (requires basic auth)."""
+    result = await _apply(engine, CommandKind.PARAMS, values)
+    await engine.bus.publish({"kind": "params", "params": values, "timestamp": time.time()})
+    return {"ok": True, **result, "params": values}
+
+
+@router.get("/forces")
+async def forces(engine=Depends(world_engine), username=Depends(verify_basic_auth)):
+    """List the force fields and whether each is enabled (requires basic auth)."""
+    return {"forces": engine.forces.to_list()}
+
+
+@router.post("/forces/{name}")
+async def force(name: str, enabled: bool | None = Body(None, embed=True), params: dict | None = Body(None, embed=True),
+                engine=Depends(world_engine), username=Depends(verify_basic_auth)):
+    """Toggle a force field and/or change its parameters (requires basic auth)."""
+    args = {"name": name}
+    if enabled is not None:
+        args["enabled"] = enabled
+    if params:
+        args["params"] = params
+    result = await _apply(engine, CommandKind.FORCE, args)
+    await engine.bus.publish({"kind": "force", "field": result["field"], "timestamp": time.time()})
+    return {"ok": True, **result}
+
+
+@router.post("/reload")
+async def reload(username=Depends(verify_basic_auth)):
+    """Re-read the config file now and apply simulation changes (requires basic auth)."""
+    if _watcher is None:
+        raise HTTPException(status_code=404, detail="Config reload not available")
+    try:
+        config = _watcher.poll(force=True)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    if config is None:
+        raise HTTPException(status_code=404, detail="Config file not found")
+    try:
+        changed = await apply_config(config)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return {"ok": True, "tick": _engine.tick, "state": _engine.state, "params": changed,
+            "restart_required": restart_required()}
@@ -31,13 +31,14 @@ async def health():
 @router.get("/heartbeat")
 async def heartbeat():
     """Lightweight heartbeat for frequent polling."""
-    snapshot = await _engine.get_snapshot()
+    status = _engine.status
     return {
         "status": "ok",
         "timestamp": format_timestamp(),
-        "tick": snapshot.tick,
-        "uptime_s": snapshot.sim_time_s,
-        "engine_state": _engine.state,
+        "tick": status.tick,
+        "uptime_s": status.sim_time,
+        "engine_state": status.state,
+        "last_publish_time": status.last_publish_time,
     }
 
 
@@ -0,0 +1,90 @@
+"""Historical trajectory query routes."""
+
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from storage.trajectory import TrajectoryError
+from ui.auth import verify_basic_auth
+from ui.streaming import ClosingStreamingResponse
+
+router = APIRouter(prefix="/api/v1/history", tags=["history"])
+
+# Set by app.py
+_service = None
+
+_MAX_TICK = 2 ** 63 - 1
+
+
+def init(service):
+    """Initialize with the history query service."""
+    global _service
+    _service = service
+
+
+async def _index(recording):
+    try:
+        return await asyncio.to_thread(_service.get, recording)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown recording: {recording}")
+    except TrajectoryError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
+def _ndjson(index, rows, batch=256):
+    """Stream rows as NDJSON, pulling each batch from disk on a worker thread.
+
+    The index lease is released when the response ends.
+    """
+    iterator = iter(rows)
+
+    def pull():
+        lines = []
+        for row in iterator:
+            lines.append(json.dumps(row))
+            if len(lines) >= batch:
+                break
+        return lines
+
+    async def generate():
+        while True:
+            lines = await asyncio.to_thread(pull)
+            if not lines:
+                break
+            yield "\n".join(lines) + "\n"
+
+    async def release():
+        index.release()
+
+    return ClosingStreamingResponse(generate(), on_close=release, media_type="application/x-ndjson")
+
+
+@router.get("/recordings")
+async def recordings(username=Depends(verify_basic_auth)):
+    """List recordings that can be queried (requires basic auth)."""
+    return {"recordings": _service.recordings()}
+
+
+@router.get("/{recording}/particles/{particle_id}")
+async def particle_track(recording: str, particle_id: str, start: int = Query(0, ge=0),
+                         end: int = Query(_MAX_TICK, ge=0), username=Depends(verify_basic_auth)):
+    """Stream [tick, x, y, vx, vy] rows for one particle between two ticks (requires basic auth)."""
+    index = await _index(recording)
+    if particle_id not in index.particles:
+        index.release()
+        raise HTTPException(status_code=404, detail=f"Unknown particle: {particle_id}")
+    return _ndjson(index, index.track(particle_id, start, end))
+
+
+@router.get("/{recording}/box")
+async def box(recording: str, x0: float, y0: float, x1: float, y1: float,
+              tick: int = Query(None, ge=0), start: int = Query(0, ge=0), end: int = Query(_MAX_TICK, ge=0),
+              username=Depends(verify_basic_auth)):
+    """Stream particles inside a box, one line per tick, at `tick` or over [start, end] (requires basic auth)."""
+    if tick is not None:
+        start = end = tick
+    index = await _index(recording)
+    frames = ({"tick": frame_tick, "particles": rows}
+              for frame_tick, rows in index.box(x0, y0, x1, y1, start, end))
+    return _ndjson(index, frames, batch=16)
@@ -0,0 +1,23 @@
+"""Prometheus scrape endpoint."""
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from internal.metrics import CONTENT_TYPE
+
+router = APIRouter(tags=["metrics"])
+
+# This will be set by app.py
+_registry = None
+
+
+def init(registry):
+    """Initialize with the metrics registry."""
+    global _registry
+    _registry = registry
+
+
+@router.get("/metrics")
+async def metrics():
+    """Metrics in Prometheus text format. Reads counters only; never takes the engine lock."""
+    return Response(content=_registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,86 @@
+"""Replay control routes."""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from storage.replay import MAX_SPEED, MIN_SPEED
+from storage.trajectory import TrajectoryError
+from ui.auth import verify_basic_auth
+
+router = APIRouter(prefix="/api/v1/replay", tags=["replay"])
+
+# Set by app.py
+_manager = None
+
+
+def init(manager):
+    """Initialize with the replay manager."""
+    global _manager
+    _manager = manager
+
+
+def _source():
+    if _manager.source is None:
+        raise HTTPException(status_code=404, detail="No replay loaded")
+    return _manager.source
+
+
+@router.get("/recordings")
+async def recordings(username=Depends(verify_basic_auth)):
+    """List recordings available for replay (requires basic auth)."""
+    return {"recordings": _manager.recordings()}
+
+
+@router.get("/status")
+async def status(username=Depends(verify_basic_auth)):
+    """Current replay position and speed (requires basic auth)."""
+    return _source().get_status()
+
+
+@router.post("/load")
+async def load(name: str, speed: float = Query(1.0, ge=MIN_SPEED, le=MAX_SPEED),
+               username=Depends(verify_basic_auth)):
+    """Load a recording and start streaming it on /events?source=replay (requires basic auth)."""
+    try:
+        source = await _manager.load(name, speed)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown recording: {name}")
+    except TrajectoryError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return source.get_status()
+
+
+@router.post("/pause")
+async def pause(username=Depends(verify_basic_auth)):
+    """Pause replay (requires basic auth)."""
+    await _source().pause()
+    return {"ok": True}
+
+
+@router.post("/resume")
+async def resume(username=Depends(verify_basic_auth)):
+    """Resume replay (requires basic auth)."""
+    await _source().resume()
+    return {"ok": True}
+
+
+@router.post("/seek")
+async def seek(tick: int = Query(..., ge=0), username=Depends(verify_basic_auth)):
+    """Jump to the first recorded frame at or after `tick` (requires basic auth)."""
+    source = _source()
+    await source.seek(tick)
+    return source.get_status()
+
+
+@router.post("/speed")
+async def speed(value: float = Query(..., ge=MIN_SPEED, le=MAX_SPEED), username=Depends(verify_basic_auth)):
+    """Change playback speed (requires basic auth)."""
+    source = _source()
+    source.set_speed(value)
+    return source.get_status()
+
+
+@router.post("/stop")
+async def stop(username=Depends(verify_basic_auth)):
+    """Stop and unload the current replay (requires basic auth)."""
+    await _manager.unload()
+    return {"ok": True}
@@ -0,0 +1,60 @@
+"""World routes: list, create and remove the worlds hosted by this server."""
+
+import time
+
+from fastapi import APIRouter, Body, Depends, HTTPException
+
+from ui.auth import verify_basic_auth
+
+router = APIRouter(prefix="/api/v1/worlds", tags=["worlds"])
+
+# Set by app.py
+_worlds = None
+_bus = None
+
+
+def init(worlds, bus):
+    """Initialize with the world registry and the default world's bus."""
+    global _worlds, _bus
+    _worlds = worlds
+    _bus = bus
+
+
+@router.get("")
+async def worlds(username=Depends(verify_basic_auth)):
+    """List the worlds with their state, memory and tick cost (requires basic auth)."""
+    return _worlds.get_stats()
+
+
+@router.get("/{name}")
+async def world(name: str, username=Depends(verify_basic_auth)):
+    """One world's state, memory and tick cost (requires basic auth)."""
+    if name not in _worlds:
+        raise HTTPException(status_code=404, detail=f"Unknown world {name!r}")
+    return _worlds.world_stats(name)
+
+
+@router.post("/{name}")
+async def create(name: str, config: dict | None = Body(None, embed=True), username=Depends(verify_basic_auth)):
+    """Start a new world; `config` overrides fields of the simulation section (requires basic auth)."""
+    if name in _worlds:
+        raise HTTPException(status_code=409, detail=f"World {name!r} already exists")
+    try:
+        await _worlds.create(name, config)
+    except (TypeError, ValueError) as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    await _bus.publish({"kind": "world_created", "world": name, "timestamp": time.time()})
+    return {"ok": True, "world": name, **_worlds.world_stats(name)}
+
+
+@router.delete("/{name}")
+async def remove(name: str, username=Depends(verify_basic_auth)):
+    """Stop a world and drop it; the default world stays (requires basic auth)."""
+    if name not in _worlds:
+        raise HTTPException(status_code=404, detail=f"Unknown world {name!r}")
+    try:
+        engine = await _worlds.remove(name)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    await _bus.publish({"kind": "world_removed", "world": name, "timestamp": time.time()})
+    return {"ok": True, "world": name, "tick": engine.tick}
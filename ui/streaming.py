@@ -0,0 +1,22 @@
+"""Streaming responses that always clean up."""
+
+from fastapi.responses import StreamingResponse
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """StreamingResponse that runs `on_close` however the response ends.
+
+    A generator's `finally` only runs once iteration has started; a client
+    that is gone before the first chunk would otherwise leak whatever the
+    stream holds (an admission slot, a bus subscription, a pinned reader).
+    """
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self._on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._on_close()